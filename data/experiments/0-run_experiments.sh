@@ -70,14 +70,22 @@ for bset in ${bsets[@]}; do
         fi
 
         RESULT_DIR="${BASE_DIR}/${bset}/${solver}/${n}"
+        RESUME_ARGS=()
         if [ -d "${RESULT_DIR}" ]; then
           # 如果结果目录存在，则检查输出文件是否存在
           if [ -f "${RESULT_DIR}/output.yml" ]; then
             echo "Output file already exists for ${solver} run ${n} on ${bset}, skipping..."
             continue
           fi
-          # 删除结果目录中的所有内容
-          rm -rf "${RESULT_DIR}"
+          if [ -f "${RESULT_DIR}/output.yml.journal.jsonl" ]; then
+            # An interrupted run left a journal of completed results behind.
+            # Only run the benchmarks that are missing from it.
+            echo "Resuming ${solver} run ${n} on ${bset}"
+            RESUME_ARGS=(--resume)
+          else
+            # 删除结果目录中的所有内容
+            rm -rf "${RESULT_DIR}"
+          fi
         fi
         mkdir -p "${RESULT_DIR}"
         if [ "${USE_DISK_CACHE_FLUSH}" -eq 1 ]; then
@@ -97,10 +105,11 @@ for bset in ${bsets[@]}; do
           -j${JOBS} \
           --benchmark-base "${BENCHMARK_BASE}" \
           --log-show-src-locs \
+          "${RESUME_ARGS[@]}" \
           "${solver_config}" \
           "${invocation_info}" \
           "${RESULT_DIR}/wd" \
-          "${RESULT_DIR}/output.yml" 2>&1 | tee -i "${RESULT_DIR}/console.log"
+          "${RESULT_DIR}/output.yml" 2>&1 | tee -i -a "${RESULT_DIR}/console.log"
       done
   done
 done
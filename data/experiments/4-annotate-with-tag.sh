@@ -11,6 +11,8 @@ SCRIPT_DIR="$( cd ${BASH_SOURCE[0]%/*} ; echo $PWD )"
 source ${SCRIPT_DIR}/common.sh
 
 TEST=""
+# Number of processes used to compute event tags for each result file
+JOBS="${JOBS:-$(nproc)}"
 
 mkdir -p "${BASE_DIR}"
 
@@ -29,6 +31,7 @@ for bset in ${bsets[@]}; do
           --timeout 60 \
           --use-dsoes-wallclock-time \
           --wd-base "${RESULT_DIR}/wd" \
+          -j${JOBS} \
           --output ${RESULT_DIR}/output_with_sat_dsoes_tag.yml 2>&1 | \
             tee -i ${RESULT_DIR}/console_annotate_with_event_tag.log
         #git add output_with_sat_dsoes.yml console_extract_dsoes.log
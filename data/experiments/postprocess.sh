@@ -0,0 +1,42 @@
+#!/bin/bash
+# This script does the same as running `1-mars_extract_sat.sh`,
+# `3-extract_dsoes_wallclock_time.sh`, `4-annotate-with-tag.sh` and
+# `5-annotate-with-fuzzing-throughput.sh` in order but only reads and
+# writes each result info file once.
+set -e
+set -x
+set -o pipefail
+
+
+SCRIPT_DIR="$( cd ${BASH_SOURCE[0]%/*} ; echo $PWD )"
+
+source ${SCRIPT_DIR}/common.sh
+
+TEST=""
+# Number of processes used to post-process each result file
+JOBS="${JOBS:-$(nproc)}"
+
+mkdir -p "${BASE_DIR}"
+
+for bset in ${bsets[@]}; do
+  for n in ${ns[@]}; do
+    for solver in ${solvers[@]}; do
+      solver_config=$(get_solver_config "${solver}" "${bset}")
+      if [ "${solver_config}" = "SKIP" ]; then
+        echo "##### SKIPPING #####"
+        continue
+      fi
+      echo "Processing ${solver} run ${n} for ${bset}"
+      RESULT_DIR="${BASE_DIR}/${bset}/${solver}/${n}"
+      ${TEST} python3 ${SMT_RUNNER_ROOT}/tools/result-info-postprocess.py \
+        "${RESULT_DIR}/output.yml" \
+        --timeout 60 \
+        --use-dsoes-wallclock-time \
+        --wd-base "${RESULT_DIR}/wd" \
+        -j${JOBS} \
+        --cache "${RESULT_DIR}/postprocess_cache.json" \
+        -o "${RESULT_DIR}/output_with_sat_dsoes_tag_throughtput.yml" 2>&1 | \
+          tee -i "${RESULT_DIR}/console_postprocess.log"
+    done
+  done
+done
@@ -66,24 +66,28 @@ DIR_PREFIX="${MERGED_DIR}/${bset}"
 
 solverXName="$(get_solver_name "${solverX}")"
 
-for solverY in ${OTHER_NAMES[@]}; do
-    solverYName="$(get_solver_name "${solverY}")"
-    TOOL_OPTS=( \
-    --max-exec-time ${timeout} \
-    --annotate \
-    --true-type-fonts \
-  #  --annotate-use-legacy-values \
-    --title-switch \
-#    --annotate-timeout-point \
-    --output "result/${bset}/scatter_${solverXName}_${solverYName}_${timeout}.pdf"
-  )
-
-  TOOL_OPTS+=(--xlabel "${solverXName}")
-  TOOL_OPTS+=(--ylabel "${solverYName}")
+TOOL_OPTS=( \
+  --max-exec-time ${timeout} \
+  --annotate \
+  --true-type-fonts \
+#  --annotate-use-legacy-values \
+  --title-switch \
+#  --annotate-timeout-point \
+  --jobs "$(nproc)" \
+)
 
-  python3 "${TOOL}" \
-    "${TOOL_OPTS[@]}" \
+# Render all plots from one invocation so each result info is only loaded
+# once.
+for solverY in ${OTHER_NAMES[@]}; do
+  solverYName="$(get_solver_name "${solverY}")"
+  TOOL_OPTS+=( \
+    --plot \
     "${DIR_PREFIX}/${solverX}/output_merged.yml" \
-    "${DIR_PREFIX}/${solverY}/output_merged.yml"
+    "${DIR_PREFIX}/${solverY}/output_merged.yml" \
+    "result/${bset}/scatter_${solverXName}_${solverYName}_${timeout}.pdf" \
+    "${solverXName}" \
+    "${solverYName}" \
+  )
+done
 
-done
\ No newline at end of file
+python3 "${TOOL}" "${TOOL_OPTS[@]}"
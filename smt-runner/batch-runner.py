@@ -5,11 +5,15 @@
 """
 import argparse
 import datetime
+import heapq
+import itertools
 import logging
 import os
+import shutil
 import traceback
 import signal
 import sys
+import threading
 from smtrunner import RunnerFactory
 from smtrunner import DriverUtil
 from smtrunner import ResultInfo
@@ -17,6 +21,8 @@ from smtrunner import RunnerContext
 
 _logger = None
 futureToRunners = None
+# Set when the batch is cancelled so no further runners are submitted.
+_cancelEvent = threading.Event()
 
 
 def handleInterrupt(signum, _):
@@ -27,6 +33,7 @@ def handleInterrupt(signum, _):
 
 def cancel(futureToRunnersMap):
     _logger.warning('Cancelling futures')
+    _cancelEvent.set()
     # Cancel all futures first. If we tried
     # to kill the runner at the same time then
     # other futures would start which we don't want
@@ -57,6 +64,184 @@ def check_paths(invocation_infos, benchmark_base_path):
             return False
     return True
 
+class LazyRunner:
+    """
+    Defers creating the working directory and the runner for an
+    invocation info until the job is run. This means only runners for
+    jobs that are in flight exist at any one time.
+    """
+    def __init__(self, index, invocationInfo, workDirsRoot, rc, RunnerClass, ctx,
+                 removeStaleWorkDir=False):
+        self._index = index
+        self._invocationInfo = invocationInfo
+        self._workDirsRoot = workDirsRoot
+        self._rc = rc
+        self._RunnerClass = RunnerClass
+        self._ctx = ctx
+        self._removeStaleWorkDir = removeStaleWorkDir
+        self._runner = None
+        self._killed = False
+        self._lock = threading.Lock()
+
+    @property
+    def InvocationInfo(self):
+        return self._invocationInfo
+
+    @property
+    def benchmark(self):
+        return self._invocationInfo['benchmark']
+
+    @property
+    def workDir(self):
+        return os.path.join(self._workDirsRoot, 'workdir-{}'.format(self._index))
+
+    @property
+    def programPathArgument(self):
+        if self._runner is None:
+            return self.benchmark
+        return self._runner.programPathArgument
+
+    @property
+    def workingDirectoryWithoutPrefix(self):
+        return self.workDir[len(self._workDirsRoot):]
+
+    def build(self):
+        """
+        Create the working directory and the runner if that has not
+        already happened.
+        """
+        if self._runner is not None:
+            return self._runner
+        # Create working directory for this runner
+        # FIXME: This should be moved into the runner itself
+        workDir = self.workDir
+        if self._removeStaleWorkDir and os.path.exists(workDir):
+            # Left over from a run that did not complete
+            _logger.info('Removing stale working directory "{}"'.format(workDir))
+            shutil.rmtree(workDir)
+        assert not os.path.exists(workDir)
+        os.mkdir(workDir)
+        # Pass in a copy of rc so that if a runner accidently modifies
+        # a config it won't affect other runners.
+        rc_copy = self._rc.copy()
+        self._runner = self._RunnerClass(self._invocationInfo, workDir, rc_copy, self._ctx)
+        return self._runner
+
+    def run(self):
+        with self._lock:
+            if self._killed:
+                raise Exception('Runner for "{}" was killed before it started'.format(
+                    self.benchmark))
+            runner = self.build()
+        runner.run()
+
+    def getResults(self):
+        return self._runner.getResults()
+
+    def kill(self):
+        with self._lock:
+            self._killed = True
+            runner = self._runner
+        if runner is not None:
+            runner.kill()
+
+def get_completed_benchmarks(journal_path):
+    """
+    Returns a dictionary mapping the working directory of every result in
+    the journal at ``journal_path`` that did not hit an error to its
+    benchmark name. The working directory identifies the position of the
+    result in the invocation info so the same benchmark can appear more
+    than once.
+    """
+    completed = dict()
+    for r in DriverUtil.loadResultJournal(journal_path,
+                                          ResultInfo.validateResultInfoRecord):
+        if 'error' in r:
+            continue
+        completed[r['working_directory']] = r['benchmark']
+    return completed
+
+def get_final_results(journal_path):
+    """
+    Generator yielding the results in the journal at ``journal_path``.
+    When a job appears more than once (e.g. an error from an interrupted
+    run followed by a result from a resumed run) only the last record for
+    that job is yielded. Jobs are identified by their working directory.
+    """
+    def get_key(r):
+        if r.get('working_directory') is None:
+            return ('benchmark', r.get('benchmark'))
+        return ('working_directory', r['working_directory'])
+    key_to_last_index = dict()
+    for index, r in enumerate(DriverUtil.loadResultJournal(journal_path)):
+        key_to_last_index[get_key(r)] = index
+    last_indices = set(key_to_last_index.values())
+    key_to_last_index = None
+    for index, r in enumerate(DriverUtil.loadResultJournal(journal_path)):
+        if index in last_indices:
+            yield r
+
+def get_expected_run_times(result_info_paths, max_time=None):
+    """
+    Returns a dictionary mapping benchmark names to their expected run
+    time (in seconds) which is the mean wallclock time of every run of the
+    benchmark in the result info files at ``result_info_paths``. The files
+    can be from any solver. Results that hit an error are ignored and
+    times are capped at ``max_time`` if it is not ``None``.
+    """
+    benchmark_to_times = dict()
+    for path in result_info_paths:
+        with open(path, 'r') as f:
+            result_infos = ResultInfo.loadRawResultInfos(f)
+        for r in result_infos['results']:
+            if 'error' in r or 'wallclock_time' not in r:
+                continue
+            times = r['wallclock_time']
+            if not isinstance(times, list):
+                # Not a merged result
+                times = [ times ]
+            times = [ t for t in times if t is not None ]
+            if max_time is not None:
+                times = [ min(t, max_time) for t in times ]
+            benchmark_to_times.setdefault(r['benchmark'], []).extend(times)
+    return {
+        benchmark: sum(times) / len(times)
+        for benchmark, times in benchmark_to_times.items() if len(times) > 0
+    }
+
+def order_longest_expected_first(indices, invocation_infos, benchmark_to_expected_time,
+                                 default_expected_time=None):
+    """
+    Returns a tuple ``(<ordered_indices>, <expected_times>)`` where
+    ``ordered_indices`` are ``indices`` (into the results of
+    ``invocation_infos``) sorted by decreasing expected run time and
+    ``expected_times`` are the corresponding expected run times.
+    Benchmarks without an expected run time use ``default_expected_time``
+    or, if that is ``None``, the longest expected run time so that they are
+    run first. Indices with the same expected run time keep their order.
+    """
+    if default_expected_time is None:
+        default_expected_time = max(
+            list(benchmark_to_expected_time.values()) + [0.0])
+    index_to_expected_time = dict()
+    for index in indices:
+        benchmark = invocation_infos['results'][index]['benchmark']
+        index_to_expected_time[index] = benchmark_to_expected_time.get(
+            benchmark, default_expected_time)
+    ordered_indices = sorted(indices, key=lambda i: -index_to_expected_time[i])
+    return (ordered_indices, [ index_to_expected_time[i] for i in ordered_indices ])
+
+def predict_makespan(run_times, jobs):
+    """
+    Returns the time taken to run jobs taking ``run_times`` seconds in
+    the given order on ``jobs`` slots where each job is started on the
+    first slot to become free.
+    """
+    slotEndTimes = [ 0.0 ] * min(jobs, max(len(run_times), 1))
+    for runTime in run_times:
+        heapq.heappush(slotEndTimes, heapq.heappop(slotEndTimes) + runTime)
+    return max(slotEndTimes)
+
 def entryPoint(args):
     # pylint: disable=global-statement,too-many-branches,too-many-statements
     # pylint: disable=too-many-return-statements
@@ -70,6 +255,33 @@ def entryPoint(args):
         help="Prefix path for benchmarks")
     parser.add_argument("--dry", action='store_true',
                         help="Stop after initialising runners")
+    parser.add_argument("--journal",
+        dest='journal',
+        type=str,
+        default=None,
+        help="Path to append-only JSON Lines journal of completed results."
+             " (Default <yaml_output>.journal.jsonl)")
+    parser.add_argument("--resume",
+        dest='resume',
+        action='store_true',
+        default=False,
+        help="Resume an interrupted run. Benchmarks that already have a"
+             " result in the journal are skipped")
+    parser.add_argument("--schedule-from",
+        dest='schedule_from',
+        action='append',
+        default=[],
+        help="Result info file from a previous run on the same benchmarks"
+             " (any solver). The mean wallclock time of each benchmark is"
+             " used as its expected run time and jobs are run longest"
+             " expected run time first. Can be given multiple times")
+    parser.add_argument("--default-expected-run-time",
+        dest='default_expected_run_time',
+        type=float,
+        default=None,
+        help="Expected run time (in seconds) of benchmarks that have no"
+             " result in the --schedule-from files. (Default the longest"
+             " expected run time so they are run first)")
     parser.add_argument(
         "-j",
         "--jobs",
@@ -139,6 +351,28 @@ def entryPoint(args):
             'yaml_output file ("{}") already exists'.format(yamlOutputFile))
         return 1
 
+    if pargs.journal is None:
+        journalFile = DriverUtil.getResultJournalPath(yamlOutputFile)
+    else:
+        journalFile = os.path.abspath(pargs.journal)
+    completedBenchmarks = dict()
+    if pargs.resume:
+        if os.path.exists(journalFile):
+            try:
+                completedBenchmarks = get_completed_benchmarks(journalFile)
+            except Exception as e: # pylint: disable=broad-except
+                _logger.error(
+                    'Failed to read journal file ("{}")'.format(journalFile))
+                _logger.error(e)
+                _logger.debug(traceback.format_exc())
+                return 1
+        _logger.info('Resuming with {} completed benchmarks'.format(
+            len(completedBenchmarks)))
+    elif os.path.exists(journalFile):
+        _logger.error(
+            'journal file ("{}") already exists'.format(journalFile))
+        return 1
+
     # Setup the directory to hold working directories
     workDirsRoot = os.path.abspath(pargs.working_dirs_root)
     if os.path.exists(workDirsRoot):
@@ -149,7 +383,10 @@ def entryPoint(args):
             return 1
 
         workDirsRootContents = next(os.walk(workDirsRoot, topdown=True))
-        if len(workDirsRootContents[1]) > 0 or len(workDirsRootContents[2]) > 0:
+        if pargs.resume and os.path.exists(journalFile):
+            # Existing working directories are expected
+            pass
+        elif len(workDirsRootContents[1]) > 0 or len(workDirsRootContents[2]) > 0:
             _logger.error('"{}" is not empty ({},{})'.format(
                 workDirsRoot,
                 workDirsRootContents[1],
@@ -168,7 +405,8 @@ def entryPoint(args):
 
     # Get Runner class to use
     RunnerClass = RunnerFactory.getRunnerClass(config['runner'])
-    runner_ctx = RunnerContext.RunnerContext(num_parallel_jobs=pargs.jobs)
+    runner_ctx = RunnerContext.RunnerContext(
+        num_parallel_jobs=pargs.jobs, working_dirs_root=workDirsRoot)
 
     if not 'runner_config' in config:
         _logger.error('"runner_config" missing from config')
@@ -180,50 +418,119 @@ def entryPoint(args):
 
     rc = config['runner_config']
 
-    # Create the runners
-    runners = []
+    # Work out which invocation infos still need running. Runners are
+    # only created when their job is about to run.
+    pendingIndices = []
     for index, invocationInfo in enumerate(invocation_infos['results']):
-        _logger.info('Creating runner {} out of {} ({:.1f}%)'.format(
-            index + 1,
-            len(invocation_infos['results']),
-            100 * float(index + 1) / len(invocation_infos['results'])))
-        # Create working directory for this runner
-        # FIXME: This should be moved into the runner itself
-        workDir = os.path.join(workDirsRoot, 'workdir-{}'.format(index))
-        assert not os.path.exists(workDir)
+        # The working directory index is derived from the position in the
+        # invocation info.
+        workDir = '/workdir-{}'.format(index)
+        if workDir in completedBenchmarks:
+            if completedBenchmarks[workDir] != invocationInfo['benchmark']:
+                _logger.error(
+                    'Journaled result for working directory "{}" is for "{}" but'
+                    ' expected "{}". Has the invocation info changed?'.format(
+                        workDir,
+                        completedBenchmarks[workDir],
+                        invocationInfo['benchmark']))
+                return 1
+            _logger.info('Skipping completed benchmark "{}" ({})'.format(
+                invocationInfo['benchmark'], workDir))
+            continue
+        pendingIndices.append(index)
+    numJobs = len(pendingIndices)
+
+    # Optionally reorder the jobs so that long running jobs do not start
+    # late and leave most of the job slots idle at the end of the batch.
+    predictedMakespan = None
+    if len(pargs.schedule_from) > 0:
+        if pargs.default_expected_run_time is not None and pargs.default_expected_run_time < 0.0:
+            _logger.error('--default-expected-run-time must be >= 0')
+            return 1
+        try:
+            benchmarkToExpectedTime = get_expected_run_times(
+                pargs.schedule_from, rc.get('max_time', None))
+        except Exception as e: # pylint: disable=broad-except
+            _logger.error('Failed to load result infos to schedule from')
+            _logger.error(e)
+            _logger.debug(traceback.format_exc())
+            return 1
+        numUnknown = len([
+            i for i in pendingIndices
+            if invocation_infos['results'][i]['benchmark'] not in benchmarkToExpectedTime])
+        _logger.info('Expected run times known for {} out of {} jobs'.format(
+            numJobs - numUnknown, numJobs))
+        orderedIndices, expectedTimes = order_longest_expected_first(
+            pendingIndices, invocation_infos, benchmarkToExpectedTime,
+            pargs.default_expected_run_time)
+        indexToExpectedTime = dict(zip(orderedIndices, expectedTimes))
+        _logger.info('Predicted makespan in invocation info order {:.1f}s'.format(
+            predict_makespan([ indexToExpectedTime[i] for i in pendingIndices ],
+                             pargs.jobs)))
+        pendingIndices = orderedIndices
+        predictedMakespan = predict_makespan(expectedTimes, pargs.jobs)
+        _logger.info('Scheduling jobs longest expected run time first.'
+                     ' Predicted makespan {:.1f}s'.format(predictedMakespan))
+        output_misc_data['schedule_policy'] = 'longest_expected_first'
+        output_misc_data['predicted_makespan'] = predictedMakespan
+
+    rc = rc.copy()
+    rc['benchmark_base_path'] = pargs.benchmark_base_path
+    rc['output_base_path'] = workDirsRoot
+
+    def runnerProducer():
+        for jobIndex, index in enumerate(pendingIndices):
+            _logger.info('Creating runner {} out of {} ({:.1f}%)'.format(
+                jobIndex + 1,
+                numJobs,
+                100 * float(jobIndex + 1) / numJobs))
+            yield LazyRunner(index,
+                             invocation_infos['results'][index],
+                             workDirsRoot,
+                             rc,
+                             RunnerClass,
+                             runner_ctx,
+                             removeStaleWorkDir=pargs.resume)
+    runners = runnerProducer()
+
+    # Build the first runner up front so that configuration problems are
+    # reported before any job starts.
+    firstRunner = next(runners, None)
+    if firstRunner is not None:
         try:
-            os.mkdir(workDir)
+            firstRunner.build()
         except Exception as e: # pylint: disable=broad-except
             _logger.error(
-                'Failed to create working directory "{}"'.format(workDir))
+                'Failed to create runner for "{}"'.format(firstRunner.benchmark))
             _logger.error(e)
             _logger.debug(traceback.format_exc())
             return 1
-        # Pass in a copy of rc so that if a runner accidently modifies
-        # a config it won't affect other runners.
-        rc_copy=rc.copy()
-        rc_copy['benchmark_base_path'] = pargs.benchmark_base_path
-        rc_copy['output_base_path'] = workDirsRoot
-        runners.append(RunnerClass(invocationInfo, workDir, rc_copy, runner_ctx))
+        runners = itertools.chain([firstRunner], runners)
 
-    # Run the runners and build the report
-    reports = []
+    # Run the runners. Each result is written to the journal as soon as it
+    # is available and the final report is built from the journal.
     exitCode = 0
 
     if pargs.dry:
+        for r in runners:
+            r.build()
         _logger.info('Not running runners')
         return exitCode
 
+    journal = DriverUtil.ResultJournal(journalFile)
+
     startTime = datetime.datetime.now()
     _logger.info('Starting {}'.format(startTime.isoformat(' ')))
     output_misc_data['start_time'] = str(startTime.isoformat(' '))
+    if pargs.resume:
+        output_misc_data['resumed_with_completed'] = len(completedBenchmarks)
 
     if pargs.jobs == 1:
         _logger.info('Running jobs sequentially')
         for r in runners:
             try:
                 r.run()
-                reports.append(r.getResults())
+                journal.append(r.getResults())
             except KeyboardInterrupt:
                 _logger.error('Keyboard interrupt')
                 # This is slightly redundant because the runner
@@ -231,13 +538,14 @@ def entryPoint(args):
                 r.kill()
                 break
             except Exception: # pylint: disable=broad-except
-                _logger.error("Error handling:{}".format(r.program))
+                _logger.error("Error handling:{}".format(r.benchmark))
                 _logger.error(traceback.format_exc())
 
                 # Attempt to add the error to the reports
                 errorLog = r.InvocationInfo.copy()
+                errorLog['working_directory'] = r.workingDirectoryWithoutPrefix
                 errorLog['error'] = traceback.format_exc()
-                reports.append(errorLog)
+                journal.append(errorLog)
                 exitCode = 1
     else:
         # FIXME: Make windows compatible
@@ -251,56 +559,77 @@ def entryPoint(args):
         try:
             with concurrent.futures.ThreadPoolExecutor(max_workers=pargs.jobs) as executor:
                 # Simple: One runner to one future mapping.
-                futureToRunners = {executor.submit(r.run): [r] for r in runners}
-                for future in concurrent.futures.as_completed(futureToRunners):
-                    completed_runner_list = None
-                    if isinstance(futureToRunners[future], list):
-                        completed_runner_list = futureToRunners[future]
-                    else:
-                        assert isinstance(futureToRunners[future], SequentialRunnerHolder)
-                        completed_runner_list = futureToRunners[future].completed_runs()
-                    for r in completed_runner_list:
-                        _logger.debug('{} runner finished'.format(
-                            r.programPathArgument))
-
-                        if future.done() and not future.cancelled():
-                            completedFutureCounter += 1
-                            _logger.info('Completed {}/{} ({:.1f}%)'.format(
-                                completedFutureCounter,
-                                len(runners),
-                                100 * (float(completedFutureCounter) / len(runners))
-                                ))
-
-                        excep = None
-                        try:
-                            if future.exception():
-                                excep = future.exception()
-                        except concurrent.futures.CancelledError as e:
-                            excep = e
-
-                        if excep != None:
-                            # Attempt to log the error reports
-                            errorLog = r.InvocationInfo.copy()
-                            r_work_dir = None
-                            try:
-                                r_work_dir = r.workingDirectoryWithoutPrefix
-                            except Exception:
-                                pass
-                            errorLog['working_directory'] = r_work_dir
-                            errorLog['error'] = "\n".join(
-                                traceback.format_exception(
-                                    type(excep),
-                                    excep,
-                                    None))
-                            # Only emit messages about exceptions that aren't to do
-                            # with cancellation
-                            if not isinstance(excep, concurrent.futures.CancelledError):
-                                _logger.error('{} runner hit exception:\n{}'.format(
-                                    r.programPathArgument, errorLog['error']))
-                            reports.append(errorLog)
-                            exitCode = 1
+                # Only ``pargs.jobs`` runners are submitted at a time. A new
+                # one is submitted each time a job finishes.
+                futureToRunners = {}
+                def submitNext():
+                    if _cancelEvent.is_set():
+                        return False
+                    r = next(runners, None)
+                    if r is None:
+                        return False
+                    futureToRunners[executor.submit(r.run)] = [r]
+                    return True
+                for _ in range(0, pargs.jobs):
+                    if not submitNext():
+                        break
+                while len(futureToRunners) > 0:
+                    doneFutures, _ = concurrent.futures.wait(
+                        list(futureToRunners.keys()),
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in doneFutures:
+                        completed_runner_list = None
+                        runner_holder = futureToRunners.pop(future)
+                        if isinstance(runner_holder, list):
+                            completed_runner_list = runner_holder
                         else:
-                            reports.append(r.getResults())
+                            assert isinstance(runner_holder, SequentialRunnerHolder)
+                            completed_runner_list = runner_holder.completed_runs()
+                        for r in completed_runner_list:
+                            _logger.debug('{} runner finished'.format(
+                                r.programPathArgument))
+
+                            if future.done() and not future.cancelled():
+                                completedFutureCounter += 1
+                                _logger.info('Completed {}/{} ({:.1f}%)'.format(
+                                    completedFutureCounter,
+                                    numJobs,
+                                    100 * (float(completedFutureCounter) / numJobs)
+                                    ))
+
+                            excep = None
+                            try:
+                                if future.exception():
+                                    excep = future.exception()
+                            except concurrent.futures.CancelledError as e:
+                                excep = e
+
+                            if excep != None:
+                                # Attempt to log the error reports
+                                errorLog = r.InvocationInfo.copy()
+                                r_work_dir = None
+                                try:
+                                    r_work_dir = r.workingDirectoryWithoutPrefix
+                                except Exception:
+                                    pass
+                                if r_work_dir is not None:
+                                    errorLog['working_directory'] = r_work_dir
+                                errorLog['error'] = "\n".join(
+                                    traceback.format_exception(
+                                        type(excep),
+                                        excep,
+                                        None))
+                                # Only emit messages about exceptions that aren't to do
+                                # with cancellation
+                                if not isinstance(excep, concurrent.futures.CancelledError):
+                                    _logger.error('{} runner hit exception:\n{}'.format(
+                                        r.programPathArgument, errorLog['error']))
+                                journal.append(errorLog)
+                                exitCode = 1
+                            else:
+                                journal.append(r.getResults())
+                        # Replace the finished job with the next one
+                        submitNext()
         except KeyboardInterrupt:
             # The executor should of been cleaned terminated.
             # We'll then write what we can to the output YAML file
@@ -310,16 +639,31 @@ def entryPoint(args):
             signal.signal(signal.SIGINT, signal.SIG_DFL)
             signal.signal(signal.SIGTERM, signal.SIG_DFL)
 
+    journal.close()
     endTime = datetime.datetime.now()
     output_misc_data['end_time'] = str(endTime.isoformat(' '))
     output_misc_data['run_time'] = str(endTime- startTime)
+    if predictedMakespan is not None:
+        output_misc_data['actual_makespan'] = (endTime - startTime).total_seconds()
 
-    # Write result to YAML file
-    invocation_infos['results'] = reports
-    DriverUtil.writeYAMLOutputFile(yamlOutputFile, invocation_infos)
+    # Write result to YAML file. The results are streamed from the
+    # journal so they are never all in memory at once.
+    invocation_infos['results'] = None
+    try:
+        DriverUtil.writeYAMLOutputFile(yamlOutputFile, invocation_infos,
+                                       get_final_results(journal.path),
+                                       ResultInfo.validateResultInfoRecord)
+    except ResultInfo.ResultInfoValidationError as e:
+        _logger.error('Invalid result so "{}" was not written:\n{}'.format(
+            yamlOutputFile, e))
+        _logger.error('All results are in the journal ("{}")'.format(journal.path))
+        exitCode = 1
 
     _logger.info('Finished {}'.format(endTime.isoformat(' ')))
     _logger.info('Total run time: {}'.format(endTime - startTime))
+    if predictedMakespan is not None:
+        _logger.info('Predicted makespan: {:.1f}s, actual makespan: {:.1f}s'.format(
+            predictedMakespan, output_misc_data['actual_makespan']))
     return exitCode
 
 if __name__ == '__main__':
@@ -12,13 +12,14 @@ class BackendException(Exception):
 
 class BackendResult:
 
-    def __init__(self, exitCode, runTime, oot, oom, userCpuTime=None, sysCpuTime=None):
+    def __init__(self, exitCode, runTime, oot, oom, userCpuTime=None, sysCpuTime=None, peakMemoryInMiB=None):
         self.exitCode = exitCode
         self.runTime = runTime
         self.outOfTime = oot
         self.outOfMemory = oom
         self.userCpuTime = userCpuTime
         self.sysCpuTime = sysCpuTime
+        self.peakMemoryInMiB = peakMemoryInMiB
 
         if not (isinstance(self.exitCode, int) or self.exitCode == None):
             msg = 'exitCode was expected to be an int or None but was a {}'.format(
@@ -50,6 +51,11 @@ class BackendResult:
                    ' {}'.format(self.sysCpuTime))
             _logger.error(msg)
             raise BackendException(msg)
+        if not (isinstance(self.peakMemoryInMiB, float) or self.peakMemoryInMiB == None):
+            msg = ('peakMemoryInMiB was expected to be a float or None but was'
+                   ' {}'.format(self.peakMemoryInMiB))
+            _logger.error(msg)
+            raise BackendException(msg)
 
 
 class BackendBaseClass(metaclass=abc.ABCMeta):
@@ -1,5 +1,6 @@
 # vim: set sw=4 ts=4 softtabstop=4 expandtab:
 from . BackendBase import *
+import atexit
 import functools
 import logging
 import os
@@ -35,9 +36,10 @@ class ResourcePool:
         * DockerClient
         * CPUs
     """
-    def __init__(self, num_jobs, available_cpu_ids, cpus_per_job, use_memset_of_nearest_node, docker_api_timeout=120, docker_api_version='1.26'):
+    def __init__(self, num_jobs, available_cpu_ids, cpus_per_job, use_memset_of_nearest_node, docker_api_timeout=120, docker_api_version='1.26', num_docker_clients=None):
         assert isinstance(num_jobs, int)
         assert num_jobs > 0
+        assert isinstance(num_docker_clients, int) or num_docker_clients is None
         assert isinstance(available_cpu_ids, set) or available_cpu_ids is None
         assert isinstance(cpus_per_job, int) or cpus_per_job is None
         if cpus_per_job is not None:
@@ -55,6 +57,9 @@ class ResourcePool:
         self._docker_client_pool = set() # Available clients
         self._docker_api_timeout = docker_api_timeout
         self._docker_api_version = docker_api_version
+        self._num_docker_clients = num_jobs
+        if num_docker_clients is not None:
+            self._num_docker_clients = min(num_jobs, num_docker_clients)
         assert isinstance(self._docker_api_timeout, int)
         assert isinstance(self._docker_api_version, str)
 
@@ -62,12 +67,16 @@ class ResourcePool:
         self._numa_nodes = dict() # Maps NUMA node to set of CPU ids
         self._numa_node_pool = dict() # Maps NUMa node to set of available CPU ids
 
-        self._lock = threading.Lock()
+        self._lock = threading.Condition()
 
         # Sanity check
         if cpus_per_job is not None and available_cpu_ids is not None:
             assert (num_jobs * cpus_per_job) <= len(available_cpu_ids)
 
+    @property
+    def docker_api_version(self):
+        return self._docker_api_version
+
     def _lazy_docker_client_init(self):
         # Implicitly assume lock is already held
         if len(self._docker_clients) != 0:
@@ -76,7 +85,7 @@ class ResourcePool:
         # Create Docker clients
         _logger.info('Using Docker API timeout of {} seconds'.format(self._docker_api_timeout))
         _logger.info('Using Docker API version {}'.format(self._docker_api_version))
-        for index in range(0, self._num_jobs):
+        for index in range(0, self._num_docker_clients):
             _logger.info('Creating DockerClient {}'.format(index))
             new_client = docker.APIClient(version=self._docker_api_version, timeout=self._docker_api_timeout)
             self._docker_clients[id(new_client)] = new_client
@@ -88,6 +97,9 @@ class ResourcePool:
     def get_docker_client(self):
         with self._lock:
             self._lazy_docker_client_init()
+            # There may be fewer clients than jobs so wait for one
+            while len(self._docker_client_pool) == 0:
+                self._lock.wait()
             try:
                 docker_client_id = self._docker_client_pool.pop()
             except Exception as e:
@@ -105,6 +117,7 @@ class ResourcePool:
                 raise DockerBackendException('Returned client is already in pool')
             # Put back in pool
             self._docker_client_pool.add(id(docker_client))
+            self._lock.notify()
 
     def _lazy_cpu_and_mem_set_init(self):
         # Implicitly assume lock is already held
@@ -207,6 +220,395 @@ class ResourcePool:
                 if not released:
                     raise Exception('Failed to return CPU {} to pool'.format(cpu_to_release))
 
+class ImageCache:
+    """
+        Cache shared by all DockerBackend instances of Docker image look ups
+        and of tool existence checks.
+
+        Tool existence checks are keyed on the image ID (i.e. the digest of
+        the image) so results are not reused if an image is rebuilt under
+        the same name. The results of tool existence checks can optionally
+        be persisted to a JSON file so they can be reused by later batches.
+    """
+    def __init__(self, persist_path=None):
+        assert isinstance(persist_path, str) or persist_path is None
+        self._images = dict() # Maps image name to image info
+        self._tool_checks = dict() # Maps (image name, image ID, tool path) to bool
+        self._persist_path = persist_path
+        self._persisted = dict() # Maps image name to persisted data
+        self._lock = threading.Lock()
+        if self._persist_path is not None:
+            self._load()
+
+    @property
+    def persist_path(self):
+        return self._persist_path
+
+    def _load(self):
+        if not os.path.exists(self._persist_path):
+            return
+        _logger.info('Loading tool check cache from "{}"'.format(
+            self._persist_path))
+        try:
+            with open(self._persist_path, 'r') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise DockerBackendException('Top level should be a dictionary')
+            self._persisted = data
+        except Exception as e:
+            _logger.warning('Ignoring invalid tool check cache "{}": {}'.format(
+                self._persist_path, str(e)))
+            self._persisted = dict()
+
+    def _save(self):
+        # Implicitly assume lock is already held
+        tmp_path = self._persist_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._persisted, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self._persist_path)
+
+    def get_image(self, image_name, lookup_fn):
+        """
+            Returns the image info for `image_name`. `lookup_fn` is
+            called to retrieve it on the first request for `image_name`.
+        """
+        with self._lock:
+            try:
+                return self._images[image_name]
+            except KeyError:
+                pass
+            image = lookup_fn()
+            self._images[image_name] = image
+            persisted = self._persisted.get(image_name, None)
+            if persisted is not None and persisted.get('id', None) != image['Id']:
+                _logger.info(
+                    'Image "{}" changed ({} => {}). Dropping cached tool checks'.format(
+                        image_name, persisted.get('id', None), image['Id']))
+                del self._persisted[image_name]
+            return image
+
+    def tool_exists(self, image_name, image_id, tool_path, check_fn):
+        """
+            Returns True iff `tool_path` exists in the image. `check_fn`
+            is called to perform the check if the result is not cached.
+        """
+        key = (image_name, image_id, tool_path)
+        with self._lock:
+            try:
+                return self._tool_checks[key]
+            except KeyError:
+                pass
+            persisted = self._persisted.get(image_name, None)
+            if persisted is not None and persisted.get('id', None) == image_id:
+                tools = persisted.get('tools', dict())
+                if tool_path in tools:
+                    _logger.debug('Using persisted tool check for "{}" in "{}"'.format(
+                        tool_path, image_name))
+                    self._tool_checks[key] = tools[tool_path]
+                    return self._tool_checks[key]
+            result = check_fn(tool_path)
+            assert isinstance(result, bool)
+            self._tool_checks[key] = result
+            if self._persist_path is not None:
+                if persisted is None or persisted.get('id', None) != image_id:
+                    persisted = { 'id': image_id, 'tools': dict() }
+                    self._persisted[image_name] = persisted
+                persisted.setdefault('tools', dict())[tool_path] = result
+                try:
+                    self._save()
+                except Exception as e:
+                    _logger.warning('Failed to write tool check cache "{}": {}'.format(
+                        self._persist_path, str(e)))
+            return result
+
+def _get_cgroup_files(pid):
+    """
+        Returns a dictionary mapping 'cpu' and 'memory' to a tuple of
+        (cgroup version, path on host) of the files needed to account
+        for the CPU usage and OOM kills of the cgroup that process `pid`
+        is in. Missing entries mean the files could not be found.
+    """
+    v1 = dict()
+    v2 = dict()
+    with open('/proc/{}/cgroup'.format(pid), 'r') as f:
+        for line in f:
+            _, controllers, path = line.rstrip('\n').split(':', 2)
+            path = path.lstrip('/')
+            if controllers == '':
+                base = os.path.join('/sys/fs/cgroup', path)
+                v2['cpu'] = ('v2', os.path.join(base, 'cpu.stat'))
+                v2['memory'] = ('v2', os.path.join(base, 'memory.events'))
+                continue
+            controllers = controllers.split(',')
+            if 'cpuacct' in controllers:
+                v1['cpu'] = ('v1', os.path.join(
+                    '/sys/fs/cgroup', ','.join(controllers), path, 'cpuacct.stat'))
+            if 'memory' in controllers:
+                v1['memory'] = ('v1', os.path.join(
+                    '/sys/fs/cgroup', 'memory', path, 'memory.oom_control'))
+    files = dict()
+    for resource in ['cpu', 'memory']:
+        for candidate in [v1.get(resource, None), v2.get(resource, None)]:
+            if candidate is not None and os.path.exists(candidate[1]):
+                files[resource] = candidate
+                break
+    return files
+
+
+def _read_cgroup_counters(files):
+    """
+        Read the cumulative counters from cgroup `files` (as returned by
+        `_get_cgroup_files()`). Returns a dictionary mapping 'user_cpu_time'
+        and 'sys_cpu_time' (seconds) and 'oom_kill' to their values or to
+        None if they are not available.
+    """
+    def read_key_values(path):
+        values = dict()
+        with open(path, 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) == 2:
+                    values[fields[0]] = int(fields[1])
+        return values
+    counters = {
+        'user_cpu_time': None,
+        'sys_cpu_time': None,
+        'oom_kill': None,
+    }
+    try:
+        version, path = files['cpu']
+        values = read_key_values(path)
+        if version == 'v2':
+            counters['user_cpu_time'] = values['user_usec'] / (10**6)
+            counters['sys_cpu_time'] = values['system_usec'] / (10**6)
+        else:
+            ticks = os.sysconf('SC_CLK_TCK')
+            counters['user_cpu_time'] = values['user'] / ticks
+            counters['sys_cpu_time'] = values['system'] / ticks
+    except Exception as e:
+        _logger.debug('Failed to read CPU usage from cgroup: {}'.format(e))
+    try:
+        _, path = files['memory']
+        counters['oom_kill'] = read_key_values(path)['oom_kill']
+    except Exception as e:
+        _logger.debug('Failed to read OOM kill count from cgroup: {}'.format(e))
+    return counters
+
+
+def _remove_warm_container(docker_client, container):
+    _logger.info('Destroying warm container:{}'.format(container.id))
+    try:
+        docker_client.remove_container(container=container.id, v=True, force=True)
+    except Exception as e:
+        _logger.error('Failed to remove container:"{}".\n{}'.format(
+            container.id, str(e)))
+
+
+class WarmContainer:
+    """
+        A long lived container that solver invocations are executed in.
+    """
+    def __init__(self, container_id, key, pid):
+        self.id = container_id
+        self.key = key
+        self.cgroup_files = dict()
+        try:
+            self.cgroup_files = _get_cgroup_files(pid)
+        except Exception as e:
+            _logger.warning('Failed to find cgroup of container {}: {}'.format(
+                container_id, e))
+        # Cumulative CPU times last reported by docker-stats-on-exit-shim
+        self.shim_cpu_times = (0.0, 0.0)
+
+
+class WarmContainerPool:
+    """
+        Pool of idle warm containers shared by DockerBackend instances.
+        Containers are grouped by a key that describes how they were
+        created (image, bindings, limits, user) so that a container is
+        only reused by jobs that would have created an identical one.
+
+        At most `max_idle_per_key` containers with the same key are kept
+        idle. Containers that have been idle for more than `idle_timeout`
+        seconds are removed the next time the pool is used. All containers
+        are removed when the process exits.
+    """
+    def __init__(self, resource_pool, max_idle_per_key, idle_timeout=60.0):
+        assert max_idle_per_key > 0
+        self._resource_pool = resource_pool
+        self._max_idle_per_key = max_idle_per_key
+        self._idle_timeout = idle_timeout
+        self._idle = dict() # Maps key to list of (idle container, time it became idle)
+        self._containers = dict() # Maps container ID to all live containers
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _pop_expired(self, now):
+        """
+            Remove containers that have been idle for too long from the
+            pool and return them. Must be called with `_lock` held.
+        """
+        expired = []
+        for key in list(self._idle.keys()):
+            idle = self._idle[key]
+            keep = [ entry for entry in idle if now - entry[1] <= self._idle_timeout ]
+            expired.extend(container for container, idle_since in idle
+                           if now - idle_since > self._idle_timeout)
+            if len(keep) > 0:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        for container in expired:
+            self._containers.pop(container.id, None)
+        return expired
+
+    def acquire(self, key, create_fn):
+        """
+            Returns an idle container with `key`. If there are none
+            `create_fn` is called to create a new one.
+        """
+        container = None
+        with self._lock:
+            expired = self._pop_expired(time.perf_counter())
+            idle = self._idle.get(key, [])
+            if len(idle) > 0:
+                container, _ = idle.pop()
+        self._remove(expired)
+        if container is not None:
+            return container
+        container = create_fn()
+        assert isinstance(container, WarmContainer)
+        with self._lock:
+            self._containers[container.id] = container
+        return container
+
+    def release(self, container):
+        with self._lock:
+            assert container.id in self._containers
+            now = time.perf_counter()
+            idle = self._idle.setdefault(container.key, [])
+            idle.append((container, now))
+            excess = []
+            if len(idle) > self._max_idle_per_key:
+                # Remove the container that has been idle the longest
+                excess.append(idle.pop(0)[0])
+                self._containers.pop(excess[0].id, None)
+            expired = self._pop_expired(now)
+        self._remove(excess + expired)
+
+    def discard(self, docker_client, container):
+        with self._lock:
+            self._containers.pop(container.id, None)
+        _remove_warm_container(docker_client, container)
+
+    def _remove(self, containers):
+        if len(containers) == 0:
+            return
+        try:
+            docker_client = self._resource_pool.get_docker_client()
+        except Exception as e:
+            _logger.error('Failed to remove {} warm containers'.format(
+                len(containers)))
+            return
+        try:
+            for container in containers:
+                _remove_warm_container(docker_client, container)
+        finally:
+            self._resource_pool.release_docker_client(docker_client)
+
+    def close(self):
+        with self._lock:
+            containers = list(self._containers.values())
+            self._containers.clear()
+            self._idle.clear()
+        self._remove(containers)
+
+class ContainerExitWatcher:
+    """
+        Watches Docker's event stream for containers exiting. This allows
+        DockerBackend instances to wait for their container to exit
+        without holding a Docker client (and its connection) for the
+        whole run.
+
+        Events are requested from the time the watcher was created so
+        containers that exit before the stream is (re)connected are not
+        missed.
+    """
+    def __init__(self, docker_api_version):
+        self._waiters = dict() # Maps container ID to [threading.Event, exit code]
+        self._lock = threading.Lock()
+        self._since = int(time.time()) - 1
+        self._client = docker.APIClient(version=docker_api_version)
+        self._thread = threading.Thread(
+            target=self._watch,
+            name='ContainerExitWatcher',
+            daemon=True)
+        self._thread.start()
+
+    def _watch(self):
+        while True:
+            try:
+                _logger.debug('Watching container events since {}'.format(self._since))
+                for event in self._client.events(
+                        since=self._since,
+                        filters={'type': 'container', 'event': 'die'},
+                        decode=True):
+                    self._since = max(self._since, event.get('time', self._since))
+                    exit_code = event['Actor']['Attributes'].get('exitCode', None)
+                    self._notify(event['id'], exit_code)
+            except Exception as e:
+                _logger.error('Error watching container events: {}'.format(str(e)))
+            time.sleep(1)
+
+    def _notify(self, container_id, exit_code):
+        with self._lock:
+            waiter = self._waiters.get(container_id, None)
+            if waiter is None:
+                return
+            if exit_code is not None:
+                exit_code = int(exit_code)
+            waiter[1] = exit_code
+            waiter[0].set()
+
+    def register(self, container_id):
+        """
+            Must be called before `container_id` is started.
+        """
+        with self._lock:
+            self._waiters[container_id] = [threading.Event(), None]
+
+    def unregister(self, container_id):
+        with self._lock:
+            self._waiters.pop(container_id, None)
+
+    def wait(self, container_id, timeout, check_fn, check_interval=30):
+        """
+            Wait for `container_id` to exit. `timeout` is in seconds or
+            is None to wait forever. In case an event is lost `check_fn`
+            is called every `check_interval` seconds and should return
+            the tuple (exited, exit code).
+
+            Returns the tuple (exited, exit code).
+        """
+        with self._lock:
+            waiter = self._waiters[container_id]
+        start_time = time.perf_counter()
+        while True:
+            wait_time = check_interval
+            if timeout is not None:
+                remaining = timeout - (time.perf_counter() - start_time)
+                if remaining <= 0:
+                    return (False, None)
+                wait_time = min(wait_time, remaining)
+            if waiter[0].wait(wait_time):
+                return (True, waiter[1])
+            exited, exit_code = check_fn()
+            if exited:
+                _logger.warning('Missed exit event for container {}'.format(
+                    container_id))
+                return (True, exit_code)
+
+
 class DockerBackend(BackendBaseClass):
 
     def __init__(self, hostProgramPath, workingDirectory, timeLimit, memoryLimit, stackLimit, ctx, **kwargs):
@@ -224,6 +626,12 @@ class DockerBackend(BackendBaseClass):
         self._grabbed_cpus = None
         self._memory_swappiness = None
         self._stdout_and_stderr_bypass = False
+        self._toolCheckCacheFile = None
+        self._warmContainers = False
+        self._warmKillEvent = threading.Event()
+        self._warmProgramPath = None
+        self._waitForExitEvents = False
+        self._numDockerClients = None
         # handle required options
         if not 'image' in kwargs:
             raise DockerBackendException('"image" but be specified')
@@ -257,6 +665,30 @@ class DockerBackend(BackendBaseClass):
                     raise DockerBackendException(
                         '"skip_tool_check" must map to a bool')
                 continue
+            if key == 'wait_for_exit_events':
+                if not isinstance(value, bool):
+                    raise DockerBackendException(
+                        '"wait_for_exit_events" must be bool')
+                self._waitForExitEvents = value
+                continue
+            if key == 'docker_api_clients':
+                if not (isinstance(value, int) and value > 0):
+                    raise DockerBackendException(
+                        '"docker_api_clients" must be an integer > 0')
+                self._numDockerClients = value
+                continue
+            if key == 'warm_containers':
+                if not isinstance(value, bool):
+                    raise DockerBackendException(
+                        '"warm_containers" must be bool')
+                self._warmContainers = value
+                continue
+            if key == 'tool_check_cache_file':
+                if not (isinstance(value, str) and len(value) > 0):
+                    raise DockerBackendException(
+                        '"tool_check_cache_file" must be a non empty string')
+                self._toolCheckCacheFile = os.path.abspath(value)
+                continue
             if key == 'image_work_dir':
                 self._workDirInsideContainer = value
                 if not (isinstance(self._workDirInsideContainer, str) and len(self._workDirInsideContainer) > 0):
@@ -396,6 +828,36 @@ class DockerBackend(BackendBaseClass):
             raise DockerBackendException(
                 '"{}" key is not a recognised option'.format(key))
 
+        if self._numDockerClients is not None and not self._waitForExitEvents:
+            raise DockerBackendException(
+                '"docker_api_clients" requires "wait_for_exit_events"')
+
+        if self._warmContainers:
+            if self.resource_pinning:
+                raise DockerBackendException(
+                    '"warm_containers" cannot be used with "resource_pinning"')
+            if self._waitForExitEvents:
+                raise DockerBackendException(
+                    '"warm_containers" cannot be used with "wait_for_exit_events"')
+            if self._stdout_and_stderr_bypass:
+                # Jobs in warm containers always write their output
+                # directly to the log files.
+                raise DockerBackendException(
+                    '"warm_containers" cannot be used with "stdout_and_stderr_bypass"')
+            # Warm containers are shared between jobs so the program cannot
+            # be mounted per job. Instead it must be inside one of the extra
+            # mounts.
+            for host_path, props in self._extra_volume_mounts.items():
+                rel_path = os.path.relpath(self.hostProgramPath, host_path)
+                if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+                    continue
+                self._warmProgramPath = os.path.join(props['bind'], rel_path)
+                break
+            if self._warmProgramPath is None:
+                raise DockerBackendException(
+                    'Program "{}" must be inside one of "extra_mounts" when using "warm_containers"'.format(
+                        self.hostProgramPath))
+
         # HACK: Try to prevent program path name being used in calls to addFileToBackend()
         if self.programPath().startswith('/tmp') and os.path.dirname(self.programPath()) == '/tmp':
             self._usedFileMapNames.add(os.path.basename(self.programPath()))
@@ -410,7 +872,8 @@ class DockerBackend(BackendBaseClass):
                     num_jobs=self.ctx.num_parallel_jobs,
                     available_cpu_ids=available_cpu_ids,
                     cpus_per_job=cpus_per_job,
-                    use_memset_of_nearest_node=self._use_memset_of_nearest_node
+                    use_memset_of_nearest_node=self._use_memset_of_nearest_node,
+                    num_docker_clients=self._numDockerClients
                 )
                 success = self.ctx.add_object('DockerBackend.ResourcePool', self._resource_pool)
                 # Handle race. If someone managed to make a resource pool before we did
@@ -425,21 +888,79 @@ class DockerBackend(BackendBaseClass):
             raise DockerBackendException(
                 'Failed to get resource pool')
 
+        self._dc = None
+
+        # Initialise global image cache. This is shared amoung all runners.
+        self._image_cache, success = self.ctx.get_object('DockerBackend.ImageCache')
+        if not success:
+            self._image_cache = ImageCache(persist_path=self._toolCheckCacheFile)
+            success = self.ctx.add_object('DockerBackend.ImageCache', self._image_cache)
+            # Handle race. If someone managed to make an image cache before we did
+            # use theirs instead
+            if not success:
+                self._image_cache, success = self.ctx.get_object('DockerBackend.ImageCache')
+                if not success:
+                    raise DockerBackendException('Failed to setup image cache')
+        if self._image_cache.persist_path != self._toolCheckCacheFile:
+            raise DockerBackendException(
+                '"tool_check_cache_file" must be the same for all runners')
+
+        # Check we can find the docker image
+        self._dockerImage = self._image_cache.get_image(
+            self._dockerImageName,
+            self._findDockerImage)
+
+        # Initialise global container exit watcher. This is shared amoung all runners.
+        self._exit_watcher = None
+        if self._waitForExitEvents:
+            self._exit_watcher, success = self.ctx.get_object('DockerBackend.ContainerExitWatcher')
+            if not success:
+                self._exit_watcher = ContainerExitWatcher(self._resource_pool.docker_api_version)
+                success = self.ctx.add_object('DockerBackend.ContainerExitWatcher', self._exit_watcher)
+                # Handle race. If someone managed to make a watcher before we did
+                # use theirs instead
+                if not success:
+                    self._exit_watcher, success = self.ctx.get_object('DockerBackend.ContainerExitWatcher')
+                    if not success:
+                        raise DockerBackendException('Failed to setup container exit watcher')
+
+        # Initialise global warm container pool. This is shared amoung all runners.
+        self._warm_pool = None
+        if self._warmContainers:
+            self._warm_pool, success = self.ctx.get_object('DockerBackend.WarmContainerPool')
+            if not success:
+                # Each job holds its container while it runs so there is no
+                # need to keep more idle containers than jobs.
+                self._warm_pool = WarmContainerPool(
+                    self._resource_pool, max_idle_per_key=self.ctx.num_parallel_jobs)
+                success = self.ctx.add_object('DockerBackend.WarmContainerPool', self._warm_pool)
+                # Handle race. If someone managed to make a pool before we did
+                # use theirs instead
+                if not success:
+                    self._warm_pool, success = self.ctx.get_object('DockerBackend.WarmContainerPool')
+                    if not success:
+                        raise DockerBackendException('Failed to setup warm container pool')
+
+    def _findDockerImage(self):
         # Initialise the docker client
         try:
-            self._dc = self._resource_pool.get_docker_client()
-            self._dc.ping()
+            dc = self._resource_pool.get_docker_client()
         except Exception as e:
-            _logger.error('Failed to connect to the Docker daemon')
+            _logger.error('Failed to get Docker client')
             _logger.error(e)
             raise DockerBackendException(
-                'Failed to connect to the Docker daemon')
+                'Failed to get Docker client')
 
         try:
-            # FIXME: Move this check into the resource pool so we can cache
-            # the result of this check amoung runners.
-            # Check we can find the docker image
-            images = self._dc.images()
+            try:
+                dc.ping()
+            except Exception as e:
+                _logger.error('Failed to connect to the Docker daemon')
+                _logger.error(e)
+                raise DockerBackendException(
+                    'Failed to connect to the Docker daemon')
+
+            images = dc.images()
             assert isinstance(images, list)
             images = list(
                 filter(lambda i: (i['RepoTags'] is not None) and self._dockerImageName in i['RepoTags'], images))
@@ -447,20 +968,18 @@ class DockerBackend(BackendBaseClass):
                 msg = 'Could not find docker image with name "{}"'.format(
                     self._dockerImageName)
                 raise DockerBackendException(msg)
-            else:
-                if len(images) > 1:
-                    msg = 'Found multiple docker images:\n{}'.format(
-                        pprint.pformat(images))
-                    _logger.error(msg)
-                    raise DockerBackendException(msg)
-                self._dockerImage = images[0]
-                _logger.debug('Found Docker image:\n{}'.format(
-                    pprint.pformat(self._dockerImage)))
+            if len(images) > 1:
+                msg = 'Found multiple docker images:\n{}'.format(
+                    pprint.pformat(images))
+                _logger.error(msg)
+                raise DockerBackendException(msg)
+            _logger.debug('Found Docker image:\n{}'.format(
+                pprint.pformat(images[0])))
+            return images[0]
         finally:
             # HACK: To not exhaust the resource pool we need to
             # return the client now.
-            self._resource_pool.release_docker_client(self._dc)
-            self._dc = None
+            self._resource_pool.release_docker_client(dc)
 
     @property
     def name(self):
@@ -484,14 +1003,10 @@ class DockerBackend(BackendBaseClass):
     def dockerStatsLogFileInContainer(self):
         return os.path.join(self.workingDirectoryInternal, self.dockerStatsLogFileName)
 
-    def run(self, cmdLine, stdoutLogFilePath, stderrLogFilePath, envVars):
-        # Grab a docker client
-        self._dc = self._resource_pool.get_docker_client()
-
-        self._stdoutLogFilePath = stdoutLogFilePath
-        self._stderrLogFilePath = stderrLogFilePath
-        self._outOfMemory = False
-        outOfTime = False
+    def _getLimitHostCfgArgs(self):
+        # Returns the host config arguments that enforce the resource
+        # limits of a job.
+        extraHostCfgArgs = {}
         ulimits = []
         if self.stackLimit != None:
             stackLimitInBytes = 0
@@ -518,6 +1033,38 @@ class DockerBackend(BackendBaseClass):
             _logger.info(
                 'Setting stack size limit to {} bytes'.format(stackLimitInBytes))
 
+        if len(ulimits) > 0:
+            extraHostCfgArgs['ulimits'] = ulimits
+
+        if self.memoryLimit > 0:
+            # http://docs.docker.com/reference/run/#memory-constraints
+            #
+            # memory=L<inf, memory-swap=S<inf, L<=S
+            # (specify both memory and memory-swap) The container is not allowed to use more than L bytes of memory, swap *plus* memory usage is limited by S.
+            extraHostCfgArgs['mem_limit'] = '{}m'.format(self.memoryLimit)
+            extraHostCfgArgs['memswap_limit'] = '{}m'.format(self.memoryLimit)
+            _logger.info(
+                'Setting memory limit to {} MiB'.format(self.memoryLimit))
+
+        if self._memory_swappiness is not None:
+            _logger.info('Setting memory_swappiness to {}'.format(
+                self._memory_swappiness))
+            extraHostCfgArgs['mem_swappiness'] = self._memory_swappiness
+        return extraHostCfgArgs
+
+    def run(self, cmdLine, stdoutLogFilePath, stderrLogFilePath, envVars):
+        if self._warmContainers:
+            return self._runInWarmContainer(
+                cmdLine, stdoutLogFilePath, stderrLogFilePath, envVars)
+
+        # Grab a docker client
+        self._dc = self._resource_pool.get_docker_client()
+
+        self._stdoutLogFilePath = stdoutLogFilePath
+        self._stderrLogFilePath = stderrLogFilePath
+        self._outOfMemory = False
+        outOfTime = False
+
         # Handle stdout/stderr bypass. This avoids docker'ss logging system
         # completely. This is an attempt to hack around stdout accidently
         # being lost somewhere ocassionaly.
@@ -536,9 +1083,7 @@ class DockerBackend(BackendBaseClass):
             stdoutLogFilePathInContainer = self.getFilePathInBackend(stdoutLogFilePath)
             stderrLogFilePathInContainer = self.getFilePathInBackend(stderrLogFilePath)
 
-        extraHostCfgArgs = {}
-        if len(ulimits) > 0:
-            extraHostCfgArgs['ulimits'] = ulimits
+        extraHostCfgArgs = self._getLimitHostCfgArgs()
 
         # Declare the volumes
         programPathInsideContainer = self.programPath()
@@ -566,16 +1111,6 @@ class DockerBackend(BackendBaseClass):
 
         extraContainerArgs = {}
 
-        if self.memoryLimit > 0:
-            # http://docs.docker.com/reference/run/#memory-constraints
-            #
-            # memory=L<inf, memory-swap=S<inf, L<=S
-            # (specify both memory and memory-swap) The container is not allowed to use more than L bytes of memory, swap *plus* memory usage is limited by S.
-            extraHostCfgArgs['mem_limit'] = '{}m'.format(self.memoryLimit)
-            extraHostCfgArgs['memswap_limit'] = '{}m'.format(self.memoryLimit)
-            _logger.info(
-                'Setting memory limit to {} MiB'.format(self.memoryLimit))
-
         if self._userToUseInsideContainer != None:
             extraContainerArgs['user'] = self._userToUseInsideContainer
             _logger.info('Using user "{}" inside container'.format(
@@ -599,11 +1134,6 @@ class DockerBackend(BackendBaseClass):
                 mem_set_to_use_str=str(mem_set_to_use)
                 extraHostCfgArgs['cpuset_mems'] = mem_set_to_use_str
 
-        if self._memory_swappiness is not None:
-            _logger.info('Setting memory_swappiness to {}'.format(
-                self._memory_swappiness))
-            extraHostCfgArgs['mem_swappiness'] = self._memory_swappiness
-
         _logger.debug('Using host config:\n{}'.format(pprint.pformat(extraHostCfgArgs)))
         hostCfg = self._dc.create_host_config(
             binds=bindings,
@@ -661,16 +1191,23 @@ class DockerBackend(BackendBaseClass):
             raise e
 
         exitCode = None
+        containerId = self._container['Id']
         startTime = time.perf_counter()
         self._endTime = 0
         try:
+            if self._waitForExitEvents:
+                self._exit_watcher.register(self._container['Id'])
             self._dc.start(container=self._container['Id'])
             timeoutArg = {}
             if self.timeLimit > 0:
                 timeoutArg['timeout'] = self.timeLimit
                 _logger.info('Using timeout {} seconds'.format(self.timeLimit))
-            exitCode = self._dc.wait(
-                container=self._container['Id'], **timeoutArg)
+            if self._waitForExitEvents:
+                exitCode = self._waitForExitEvent(
+                    containerId, timeoutArg.get('timeout', None))
+            else:
+                exitCode = self._dc.wait(
+                    container=self._container['Id'], **timeoutArg)
             if exitCode == -1:
                 # FIXME: Does this even happen? Docker-py's documentation is
                 # unclear.
@@ -688,6 +1225,8 @@ class DockerBackend(BackendBaseClass):
             _logger.error(traceback.format_exc())
         finally:
             self.kill()
+            if self._waitForExitEvents:
+                self._exit_watcher.unregister(containerId)
 
         runTime = self._endTime - startTime
         userCPUTime = None
@@ -715,10 +1254,240 @@ class DockerBackend(BackendBaseClass):
                              userCpuTime=userCPUTime,
                              sysCpuTime=sysCPUTime)
 
+    def _waitForExitEvent(self, containerId, timeout):
+        # Give the client back while waiting so that other jobs can use it
+        with self._killLock:
+            self._resource_pool.release_docker_client(self._dc)
+            self._dc = None
+
+        def checkExited():
+            dc = self._resource_pool.get_docker_client()
+            try:
+                state = dc.inspect_container(container=containerId)['State']
+                return (not state['Running'], state['ExitCode'])
+            except docker.errors.NotFound:
+                return (True, None)
+            finally:
+                self._resource_pool.release_docker_client(dc)
+
+        exited, exitCode = self._exit_watcher.wait(containerId, timeout, checkExited)
+        if not exited:
+            # Same behaviour as `APIClient.wait()` timing out
+            raise requests.exceptions.ReadTimeout()
+        return exitCode
+
+    def _withDockerClient(self, fn):
+        dc = self._resource_pool.get_docker_client()
+        try:
+            return fn(dc)
+        finally:
+            self._resource_pool.release_docker_client(dc)
+
+    def _createWarmContainer(self, dc, key, bindings, extraHostCfgArgs, extraContainerArgs):
+        hostCfg = dc.create_host_config(
+            binds=bindings,
+            privileged=False,
+            network_mode=None,
+            **extraHostCfgArgs
+        )
+        container = dc.create_container(
+            image=self._dockerImage['Id'],
+            # Keep the container alive until it is removed
+            command=['/bin/sh', '-c', 'while :; do sleep 3600; done'],
+            volumes=list(bindings.keys()),
+            host_config=hostCfg,
+            cpu_shares=0,
+            **extraContainerArgs
+        )
+        _logger.info('Created warm container:\n{}'.format(
+            pprint.pformat(container['Id'])))
+        try:
+            dc.start(container=container['Id'])
+            containerInfo = dc.inspect_container(container=container['Id'])
+        except Exception as e:
+            dc.remove_container(container=container['Id'], v=True, force=True)
+            raise e
+        return WarmContainer(container['Id'], key, containerInfo['State']['Pid'])
+
+    def _runInWarmContainer(self, cmdLine, stdoutLogFilePath, stderrLogFilePath, envVars):
+        # Run the job using `docker exec` in a long lived container. Each
+        # container only runs one job at a time so the container's limits
+        # are the limits of the job.
+        for logFile in [stdoutLogFilePath, stderrLogFilePath]:
+            if os.path.dirname(logFile) != self.workingDirectory:
+                raise DockerBackendException(
+                    'Log file "{}" must be in the working directory'.format(logFile))
+        self._stdoutLogFilePath = stdoutLogFilePath
+        self._stderrLogFilePath = stderrLogFilePath
+        self._outOfMemory = False
+        outOfTime = False
+
+        if self._dockerStatsOnExitShimBinary:
+            self.addFileToBackend(self._dockerStatsOnExitShimBinary, read_only=True)
+
+        bindings = dict()
+        for hostPath, (containerPath, read_only) in self._additionalHostContainerFileMaps.items():
+            bindings[hostPath] = {'bind': containerPath, 'ro': read_only}
+        for hostPath, props in self._extra_volume_mounts.items():
+            bindings[hostPath] = props
+        # Make all working directories available so the container can be
+        # used by other jobs.
+        bindings[self._warmWorkDirsRoot] = {
+            'bind': self._workDirInsideContainer, 'ro': False}
+
+        extraHostCfgArgs = self._getLimitHostCfgArgs()
+        extraContainerArgs = {}
+        if self._userToUseInsideContainer != None:
+            extraContainerArgs['user'] = self._userToUseInsideContainer
+            _logger.info('Using user "{}" inside container'.format(
+                self._userToUseInsideContainer))
+
+        # Containers are only reused by jobs that would have created an
+        # identical container.
+        key = json.dumps(
+            [self._dockerImage['Id'], bindings, extraHostCfgArgs, extraContainerArgs],
+            sort_keys=True,
+            default=str)
+
+        finalCmdLine = cmdLine
+        if self._dockerStatsOnExitShimBinary:
+            finalCmdLine = [self.dockerStatsOnExitShimPathInContainer,
+                            self.dockerStatsLogFileInContainer] + finalCmdLine
+        # Run from the working directory with stdout/stderr redirected
+        # to the log files.
+        finalCmdLine = [
+            '/bin/sh',
+            '-c',
+            'cd "$1" || exit 126; out="$2"; err="$3"; shift 3; exec "$@" > "$out" 2> "$err"',
+            'sh',
+            self.workingDirectoryInternal,
+            os.path.join(self.workingDirectoryInternal, os.path.basename(stdoutLogFilePath)),
+            os.path.join(self.workingDirectoryInternal, os.path.basename(stderrLogFilePath)),
+        ] + finalCmdLine
+        _logger.debug('Command line inside container:\n{}'.format(
+            pprint.pformat(finalCmdLine)))
+
+        exitCode = None
+        runTime = 0.0
+        userCPUTime = None
+        sysCPUTime = None
+        container = None
+        # A client is only checked out for each call to the Docker API so
+        # that jobs waiting on their exec do not hold on to clients.
+        def createContainer():
+            return self._withDockerClient(
+                lambda dc: self._createWarmContainer(
+                    dc, key, bindings, extraHostCfgArgs, extraContainerArgs))
+        def discardContainer(container):
+            self._withDockerClient(
+                lambda dc: self._warm_pool.discard(dc, container))
+        try:
+            container = self._warm_pool.acquire(key, createContainer)
+            _logger.info('Using warm container:{}'.format(container.id))
+            execArgs = {}
+            if self._userToUseInsideContainer != None:
+                execArgs['user'] = str(self._userToUseInsideContainer)
+            execId = self._withDockerClient(lambda dc: dc.exec_create(
+                container=container.id,
+                cmd=finalCmdLine,
+                environment=envVars,
+                **execArgs))['Id']
+
+            countersBefore = _read_cgroup_counters(container.cgroup_files)
+            finished = False
+            startTime = time.perf_counter()
+            self._withDockerClient(lambda dc: dc.exec_start(exec_id=execId, detach=True))
+            if self.timeLimit > 0:
+                _logger.info('Using timeout {} seconds'.format(self.timeLimit))
+            while True:
+                execInfo = self._withDockerClient(lambda dc: dc.exec_inspect(exec_id=execId))
+                elapsed = time.perf_counter() - startTime
+                if not execInfo['Running']:
+                    finished = True
+                    exitCode = execInfo['ExitCode']
+                    break
+                if self._warmKillEvent.is_set():
+                    _logger.info('Kill requested')
+                    break
+                if self.timeLimit > 0 and elapsed >= self.timeLimit:
+                    _logger.info('Timeout occurred')
+                    outOfTime = True
+                    break
+                # Poll with a resolution of 1% of the elapsed time
+                self._warmKillEvent.wait(min(0.1, max(0.001, elapsed / 100)))
+            runTime = elapsed
+
+            if not finished:
+                # There is no reliable way to kill just the exec'ed
+                # process so get rid of the container.
+                discardContainer(container)
+                container = None
+            else:
+                countersAfter = _read_cgroup_counters(container.cgroup_files)
+                if countersAfter['user_cpu_time'] is not None:
+                    userCPUTime = countersAfter['user_cpu_time'] - countersBefore['user_cpu_time']
+                    sysCPUTime = countersAfter['sys_cpu_time'] - countersBefore['sys_cpu_time']
+                elif self._dockerStatsOnExitShimBinary:
+                    # The shim reports the cumulative usage of the container
+                    try:
+                        with open(self.dockerStatsLogFileHost, 'r') as f:
+                            stats = json.load(f)
+                        cpuUsage = stats['cgroups']['cpu_stats']['cpu_usage']
+                        cpuTimes = (float(cpuUsage['usage_in_usermode']) / (10**9),
+                                    float(cpuUsage['usage_in_kernelmode']) / (10**9))
+                        userCPUTime = cpuTimes[0] - container.shim_cpu_times[0]
+                        sysCPUTime = cpuTimes[1] - container.shim_cpu_times[1]
+                        container.shim_cpu_times = cpuTimes
+                    except Exception as e:
+                        _logger.error('Failed to retrieve stats from "{}"'.format(
+                            self.dockerStatsLogFileHost))
+                        _logger.error(str(e))
+
+                if countersAfter['oom_kill'] is not None:
+                    self._outOfMemory = countersAfter['oom_kill'] > countersBefore['oom_kill']
+                elif self.memoryLimit > 0 and exitCode == 128 + 9:
+                    # Without the cgroup counters there is no way to tell
+                    # the OOM killer apart from any other SIGKILL.
+                    _logger.warning(
+                        'Job was killed by SIGKILL but it is not known if it ran out of memory')
+
+                containerInfo = self._withDockerClient(
+                    lambda dc: dc.inspect_container(container=container.id))
+                if not containerInfo['State']['Running']:
+                    _logger.warning('Warm container {} died'.format(container.id))
+                    if containerInfo['State']['OOMKilled']:
+                        self._outOfMemory = True
+                    discardContainer(container)
+                    container = None
+        except Exception as e:
+            _logger.error('Unexpected exception raised while running in warm container: {}'.format(str(e)))
+            _logger.error(traceback.format_exc())
+            if container is not None:
+                discardContainer(container)
+                container = None
+            raise e
+        finally:
+            if container is not None:
+                self._warm_pool.release(container)
+
+        return BackendResult(exitCode=exitCode,
+                             runTime=runTime,
+                             oot=outOfTime,
+                             oom=self._outOfMemory,
+                             userCpuTime=userCPUTime,
+                             sysCpuTime=sysCPUTime)
+
     def kill(self):
+        if self._warmContainers:
+            # `_runInWarmContainer()` does the clean up
+            self._warmKillEvent.set()
+            return
         try:
             self._killLock.acquire()
             self._endTime = time.perf_counter()
+            if self._container != None and self._dc is None:
+                # The client is given back while waiting for exit events
+                self._dc = self._resource_pool.get_docker_client()
             if self._container != None:
                 _logger.info('Stopping container:{}'.format(
                     self._container['Id']))
@@ -796,6 +1565,8 @@ class DockerBackend(BackendBaseClass):
             self._killLock.release()
 
     def programPath(self):
+        if self._warmContainers:
+            return self._warmProgramPath
         return '/tmp/{}'.format(os.path.basename(self.hostProgramPath))
 
     def checkToolExists(self, toolPath):
@@ -803,23 +1574,51 @@ class DockerBackend(BackendBaseClass):
             _logger.info('Skipping tool check')
             return
         assert os.path.isabs(toolPath)
-        # HACK: Is there a better way to do this?
-        _logger.debug('Checking tool "{}" exists in image'.format(toolPath))
-        tempContainer = self._dc.create_container(image=self._dockerImage['Id'],
-                                                  command=['ls', toolPath])
-        _logger.debug('Created temporary container: {}'.format(
-            tempContainer['Id']))
-        self._dc.start(container=tempContainer['Id'])
-        exitCode = self._dc.wait(container=tempContainer['Id'])
-        self._dc.remove_container(container=tempContainer['Id'], force=True)
-        if exitCode != 0:
+        exists = self._image_cache.tool_exists(
+            self._dockerImageName,
+            self._dockerImage['Id'],
+            toolPath,
+            self._checkToolExistsInImage)
+        if not exists:
             raise DockerBackendException(
                 'Tool "{}" does not exist in Docker image'.format(toolPath))
 
+    def _checkToolExistsInImage(self, toolPath):
+        # HACK: Is there a better way to do this?
+        _logger.debug('Checking tool "{}" exists in image'.format(toolPath))
+        dc = self._resource_pool.get_docker_client()
+        try:
+            tempContainer = dc.create_container(image=self._dockerImage['Id'],
+                                                command=['ls', toolPath])
+            _logger.debug('Created temporary container: {}'.format(
+                tempContainer['Id']))
+            try:
+                dc.start(container=tempContainer['Id'])
+                exitCode = dc.wait(container=tempContainer['Id'])
+            finally:
+                dc.remove_container(container=tempContainer['Id'], force=True)
+        finally:
+            self._resource_pool.release_docker_client(dc)
+        return exitCode == 0
+
+    @property
+    def _warmWorkDirsRoot(self):
+        # The directory on the host that is mounted in warm containers. This
+        # is the same for every job (even jobs of portfolio members whose
+        # working directories are nested) so that they can share containers.
+        root = self.ctx.working_dirs_root
+        relPath = None if root is None else os.path.relpath(self.workingDirectory, root)
+        if relPath is None or relPath == os.pardir or relPath.startswith(os.pardir + os.sep):
+            root = os.path.dirname(self.workingDirectory)
+        return root
+
     @property
     def workingDirectoryInternal(self):
         # Return the path to the working directory that will be used inside the
         # container
+        if self._warmContainers:
+            return os.path.join(self._workDirInsideContainer,
+                                os.path.relpath(self.workingDirectory, self._warmWorkDirsRoot))
         return self._workDirInsideContainer
 
     def addFileToBackend(self, path, read_only):
@@ -1,9 +1,11 @@
 # vim: set sw=4 ts=4 softtabstop=4 expandtab:
 from . BackendBase import *
+import itertools
 import logging
 import os
 import pprint
 import psutil
+import signal
 import subprocess
 import threading
 import time
@@ -157,6 +159,116 @@ class PythonPsUtilBackendException(BackendException):
     pass
 
 
+class JobCgroup:
+    """
+        A cgroup (v2) that a single job runs in. It is used to enforce
+        the memory limit of the job and to account for its resource
+        usage. It is created as a child of `parent` which must be a
+        cgroup that has been delegated to the current user.
+    """
+    _counter = itertools.count()
+    _lock = threading.Lock()
+
+    def __init__(self, parent, memoryLimit):
+        self._path = os.path.join(parent, 'smt-runner-{}-{}'.format(
+            os.getpid(), next(JobCgroup._counter)))
+        with JobCgroup._lock:
+            self._enableMemoryController(parent)
+        _logger.debug('Creating cgroup {}'.format(self._path))
+        os.mkdir(self._path)
+        if memoryLimit > 0:
+            self._write('memory.max', str(memoryLimit * (2**20)))
+            # Match the Docker backend which does not allow swap
+            if os.path.exists(os.path.join(self._path, 'memory.swap.max')):
+                self._write('memory.swap.max', '0')
+
+    @staticmethod
+    def _enableMemoryController(parent):
+        subtreeControl = os.path.join(parent, 'cgroup.subtree_control')
+        with open(subtreeControl, 'r') as f:
+            if 'memory' in f.read().split():
+                return
+        try:
+            with open(subtreeControl, 'w') as f:
+                f.write('+memory')
+        except OSError as e:
+            raise PythonPsUtilBackendException(
+                'Failed to enable memory controller in "{}": {}'.format(
+                    subtreeControl, e))
+
+    @property
+    def path(self):
+        return self._path
+
+    def _write(self, name, value):
+        with open(os.path.join(self._path, name), 'w') as f:
+            f.write(value)
+
+    def _readKeyValues(self, name):
+        values = dict()
+        with open(os.path.join(self._path, name), 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) == 2:
+                    values[fields[0]] = int(fields[1])
+        return values
+
+    def addSelf(self):
+        """
+          Move the calling process into the cgroup. Designed to be called
+          by subprocess.Popen() after fork.
+        """
+        self._write('cgroup.procs', str(os.getpid()))
+
+    def killAll(self):
+        if os.path.exists(os.path.join(self._path, 'cgroup.kill')):
+            self._write('cgroup.kill', '1')
+            return
+        # Older kernels don't have `cgroup.kill`
+        with open(os.path.join(self._path, 'cgroup.procs'), 'r') as f:
+            pids = [int(line) for line in f if len(line.strip()) > 0]
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def readStats(self):
+        """
+          Returns a dictionary mapping 'oom_kill', 'user_cpu_time',
+          'sys_cpu_time' (seconds) and 'peak_memory' (MiB) to their values.
+          'peak_memory' is None if the kernel does not provide it.
+        """
+        cpuStat = self._readKeyValues('cpu.stat')
+        stats = {
+            'oom_kill': self._readKeyValues('memory.events')['oom_kill'],
+            'user_cpu_time': cpuStat['user_usec'] / (10**6),
+            'sys_cpu_time': cpuStat['system_usec'] / (10**6),
+            'peak_memory': None,
+        }
+        try:
+            with open(os.path.join(self._path, 'memory.peak'), 'r') as f:
+                stats['peak_memory'] = int(f.read()) / (2**20)
+        except FileNotFoundError:
+            pass
+        return stats
+
+    def destroy(self, timeout=5.0):
+        # The cgroup can only be removed once all of its processes have
+        # been reaped.
+        startTime = time.perf_counter()
+        while True:
+            try:
+                os.rmdir(self._path)
+                return
+            except OSError as e:
+                if time.perf_counter() - startTime > timeout:
+                    _logger.error('Failed to remove cgroup "{}": {}'.format(
+                        self._path, e))
+                    return
+                time.sleep(0.01)
+
+
 class PythonPsUtilBackend(BackendBaseClass):
 
     def __init__(self, hostProgramPath, workingDirectory, timeLimit, memoryLimit, stackLimit, ctx, **kwargs):
@@ -166,6 +278,7 @@ class PythonPsUtilBackend(BackendBaseClass):
         # default
         self.memoryLimitPollTimePeriodInSeconds = 0.5
         self.resource_pinning = False
+        self._cgroupParent = None
 
         for key, value in kwargs.items():
             if key == memoryLimitTimePeriodKey:
@@ -179,6 +292,14 @@ class PythonPsUtilBackend(BackendBaseClass):
                         self.memoryLimitPollTimePeriodInSeconds > 0.0):
                     raise PythonPsUtilBackendException(
                         '{} must be a float > 0.0'.format(memoryLimitTimePeriodKey))
+            elif key == 'cgroup_v2_parent':
+                if not (isinstance(value, str) and os.path.isabs(value)):
+                    raise PythonPsUtilBackendException(
+                        '"cgroup_v2_parent" must be an absolute path')
+                if not os.path.exists(os.path.join(value, 'cgroup.subtree_control')):
+                    raise PythonPsUtilBackendException(
+                        '"{}" is not a cgroup v2 cgroup'.format(value))
+                self._cgroupParent = value
             elif key == 'resource_pinning':
                 self.resource_pinning = True
                 if not isinstance(value, dict):
@@ -219,7 +340,13 @@ class PythonPsUtilBackend(BackendBaseClass):
             else:
                 raise PythonPsUtilBackendException('Unknow kwarg "{}"'.format(key))
 
+        if self._cgroupParent is not None and memoryLimitTimePeriodKey in kwargs:
+            raise PythonPsUtilBackendException(
+                'Cannot have "{}" specified with "cgroup_v2_parent"'.format(
+                    memoryLimitTimePeriodKey))
+
         self._process = None
+        self._cgroup = None
         self._eventObj = None
         self._resource_pool = None
         self.resource_pool_init()
@@ -235,6 +362,14 @@ class PythonPsUtilBackend(BackendBaseClass):
                     self._terminateProcess(self._process, 0.0)
             except psutil.NoSuchProcess:
                 pass
+        cgroup = self._cgroup
+        if cgroup != None:
+            # Catch any processes that escaped the process tree
+            try:
+                cgroup.killAll()
+            except OSError:
+                # The cgroup was already destroyed
+                pass
 
     def programPath(self):
         # We run directly on the host so nothing special here
@@ -304,19 +439,33 @@ class PythonPsUtilBackend(BackendBaseClass):
         self._process = None
         startTime = time.perf_counter()
         pollThread = None
+        reaperThread = None
+        self._rusage = None
+        self._peakRssInMiB = None
         self._outOfMemory = False
         outOfTime = False
         runTime = 0.0
+        cgroupStats = None
+        if self._cgroupParent is not None:
+            self._cgroup = JobCgroup(self._cgroupParent, self.memoryLimit)
+            _logger.info('Using cgroup {}'.format(self._cgroup.path))
         with open(stdoutLogFilePath, 'w') as stdoutLogFile:
             with open(stderrLogFilePath, 'w') as stderrLogFile:
                 try:
                     _logger.debug('writing to stdout log file {}'.format(stdoutLogFile.name))
                     _logger.debug('writing to stderr log file {}'.format(stderrLogFile.name))
-                    preExecFn = None
+                    preExecFns = []
+                    if self._cgroup != None:
+                        preExecFns.append(self._cgroup.addSelf)
                     if self.stackLimit != None:
-                        preExecFn = self._setStacksize
+                        preExecFns.append(self._setStacksize)
                         _logger.info('Using stacksize limit: {} KiB'.format(
                             'unlimited' if self.stackLimit == 0 else self.stackLimit))
+                    preExecFn = None
+                    if len(preExecFns) > 0:
+                        def preExecFn():
+                            for fn in preExecFns:
+                                fn()
                     # HACK: Use subprocess.Popen and then create the psutil wrapper
                     # around it because it returns the wrong exit code.
                     # This is a workaround for https://github.com/giampaolo/psutil/issues/960
@@ -332,17 +481,25 @@ class PythonPsUtilBackend(BackendBaseClass):
                         # HACK: Catch case where process has already died
                         pass
 
-                    if self.memoryLimit > 0:
-                        pollThread = self._memoryLimitPolling(self._process)
+                    reaperThread = self._reaper(self._subprocess_process)
+
+                    # Without a cgroup the memory usage of the process tree
+                    # is polled to enforce the memory limit. The peak memory
+                    # usage is only recorded when polling.
+                    if self._cgroup == None and self._process != None and self.memoryLimit > 0:
+                        pollThread = self._memoryPolling(self._process)
 
                     _logger.info(
                         'Running with timeout of {} seconds'.format(self.timeLimit))
-                    exitCode = self._subprocess_process.wait(timeout=self.timeLimit)
-                except subprocess.TimeoutExpired as e:
-                    outOfTime = True
-                    # Note the code in the finally block will sort out clean up
+                    if self._reapedEvent.wait(self.timeLimit if self.timeLimit > 0 else None):
+                        exitCode = self._subprocess_process.returncode
+                    else:
+                        outOfTime = True
+                        # Note the code in the finally block will sort out clean up
                 finally:
                     self.kill()
+                    if reaperThread != None:
+                        reaperThread.join()
                     if self.resource_pinning:
                         self._resource_pool.release_cpus(self._grabbed_cpus)
 
@@ -363,12 +520,41 @@ class PythonPsUtilBackend(BackendBaseClass):
                     endTime = time.perf_counter()
                     runTime = endTime - startTime
 
+                    if self._cgroup != None:
+                        cgroup = self._cgroup
+                        self._cgroup = None
+                        try:
+                            cgroup.killAll()
+                            cgroupStats = cgroup.readStats()
+                        finally:
+                            cgroup.destroy()
+
+        userCpuTime = None
+        sysCpuTime = None
+        peakMemoryInMiB = None
+        if self._rusage != None:
+            # Note this only includes descendants that were waited for.
+            userCpuTime = self._rusage.ru_utime
+            sysCpuTime = self._rusage.ru_stime
+        # Note `ru_maxrss` is not used because it is the peak of a single
+        # process and includes the image of this process before the exec.
+        peakMemoryInMiB = self._peakRssInMiB
+        if cgroupStats != None:
+            _logger.debug('cgroup stats: {}'.format(cgroupStats))
+            self._outOfMemory = cgroupStats['oom_kill'] > 0
+            if self._outOfMemory:
+                _logger.warning('Memory limit reached')
+            userCpuTime = cgroupStats['user_cpu_time']
+            sysCpuTime = cgroupStats['sys_cpu_time']
+            peakMemoryInMiB = cgroupStats['peak_memory']
+
         return BackendResult(exitCode=exitCode,
                              runTime=runTime,
                              oot=outOfTime,
                              oom=self._outOfMemory,
-                             userCpuTime=None,  # FIXME: Find a way to record this
-                             sysCpuTime=None)  # FIXME: Find a way to record this
+                             userCpuTime=userCpuTime,
+                             sysCpuTime=sysCpuTime,
+                             peakMemoryInMiB=peakMemoryInMiB)
 
     def _setStacksize(self):
         """
@@ -390,6 +576,9 @@ class PythonPsUtilBackend(BackendBaseClass):
         # use Virtual memory size rather than resident set
         return process.memory_info()[1] / (2**20)
 
+    def _getProcessRssInMiB(self, process):
+        return process.memory_info()[0] / (2**20)
+
     def _terminateProcess(self, process, pause):
         assert isinstance(pause, float)
         assert pause >= 0.0
@@ -425,11 +614,46 @@ class PythonPsUtilBackend(BackendBaseClass):
     def _processIsRunning(self, process):
         return process.is_running() and not process.status() == psutil.STATUS_ZOMBIE
 
-    def _memoryLimitPolling(self, process):
+    def _reaper(self, popen):
+        """
+          This function launches a new thread that waits for the
+          process to exit using `os.wait4()` so that its resource usage
+          (which includes the descendants it waited for) is recorded in
+          `self._rusage`. `self._reapedEvent` is set when the process
+          has been reaped.
+        """
+        self._reapedEvent = threading.Event()
+
+        def threadBody():
+            try:
+                _, status, rusage = os.wait4(popen.pid, 0)
+                # Tell the Popen object so it doesn't try to reap
+                # the process itself.
+                if os.WIFSIGNALED(status):
+                    popen.returncode = -os.WTERMSIG(status)
+                else:
+                    popen.returncode = os.WEXITSTATUS(status)
+                self._rusage = rusage
+            except ChildProcessError:
+                _logger.error('Process {} was already reaped'.format(popen.pid))
+            finally:
+                self._reapedEvent.set()
+
+        thread = threading.Thread(
+            target=threadBody, name='reaper-{}'.format(popen.pid), daemon=True)
+        thread.start()
+        return thread
+
+    def _memoryPolling(self, process):
         """
           This function launches a new thread that will periodically
-          poll the total memory usage of the tool that is being run.
-          If it goes over the limit will kill it
+          poll the total memory usage of the tool that is being run
+          (including its children) and kill the tool if its virtual memory
+          usage goes over the memory limit. The peak resident set size
+          seen is recorded in `self._peakRssInMiB` (it stays None if the
+          tool exited before it could be sampled). As it is only sampled
+          every `memoryLimitPollTimePeriodInSeconds` short spikes are
+          missed.
         """
         assert self.memoryLimitPollTimePeriodInSeconds > 0
         assert self._outOfMemory == False
@@ -440,15 +664,12 @@ class PythonPsUtilBackend(BackendBaseClass):
         self._eventObj.clear()
 
         def threadBody():
-            _logger.info('Launching memory limit polling thread for PID {} with polling time period of {} seconds'.format(
+            _logger.info('Launching memory polling thread for PID {} with polling time period of {} seconds'.format(
                 process.pid, self.memoryLimitPollTimePeriodInSeconds))
             try:
                 while self._processIsRunning(process):
-                    self._eventObj.wait(
-                        self.memoryLimitPollTimePeriodInSeconds)
-                    totalMemoryUsage = 0
-                    totalMemoryUsage += self._getProcessMemoryUsageInMiB(
-                        process)
+                    totalMemoryUsage = self._getProcessMemoryUsageInMiB(process)
+                    totalRss = self._getProcessRssInMiB(process)
 
                     # The process might of forked so add the memory usage of
                     # its children too
@@ -457,6 +678,7 @@ class PythonPsUtilBackend(BackendBaseClass):
                         try:
                             totalMemoryUsage += self._getProcessMemoryUsageInMiB(
                                 childProc)
+                            totalRss += self._getProcessRssInMiB(childProc)
                             childCount += 1
                         except psutil.NoSuchProcess:
                             _logger.warning(
@@ -466,8 +688,10 @@ class PythonPsUtilBackend(BackendBaseClass):
                         'Total memory usage in MiB:{}'.format(totalMemoryUsage))
                     _logger.debug(
                         'Total number of children: {}'.format(childCount))
+                    if self._peakRssInMiB is None or totalRss > self._peakRssInMiB:
+                        self._peakRssInMiB = totalRss
 
-                    if totalMemoryUsage > self.memoryLimit:
+                    if self.memoryLimit > 0 and totalMemoryUsage > self.memoryLimit:
                         _logger.warning('Memory limit reached (recorded {} MiB). Killing tool with PID {}'.format(
                             totalMemoryUsage, process.pid))
                         self._outOfMemory = True
@@ -475,6 +699,8 @@ class PythonPsUtilBackend(BackendBaseClass):
                         # before aggressively killing it
                         self._terminateProcess(process, pause=1.0)
                         break
+                    self._eventObj.wait(
+                        self.memoryLimitPollTimePeriodInSeconds)
             except psutil.NoSuchProcess:
                 _logger.warning('Main process no longer available')
 
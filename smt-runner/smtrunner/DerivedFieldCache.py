@@ -0,0 +1,122 @@
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Cache of result info fields that are derived from the files a result
+refers to (e.g. `sat`, `dsoes_wallclock_time` and `event_tag`).
+
+Each entry is keyed by the result info key and is only valid if both the
+fingerprint of the code that derived the fields and the signature of the
+inputs (the raw result info and the files it was derived from) are
+unchanged.
+"""
+import hashlib
+import json
+import logging
+import os
+
+_logger = logging.getLogger(__name__)
+
+def get_file_signature(path):
+    """
+    Returns a JSON serializable signature of the file at `path` that changes
+    when the file is modified, or `None` if the file does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [path, st.st_size, st.st_mtime_ns]
+
+def get_data_signature(data):
+    """
+    Returns a digest of the JSON serializable `data`.
+    """
+    as_json = json.dumps(data, sort_keys=True)
+    return hashlib.sha1(as_json.encode('utf-8')).hexdigest()
+
+class DerivedFieldCache:
+    """
+    A cache stored as JSON at `path`. Entries are stored under `namespace`
+    so that different tools can share a cache file without invalidating
+    each other's entries.
+    """
+    VERSION = 1
+
+    def __init__(self, path, namespace):
+        self._path = path
+        self._namespace = namespace
+        self._namespaces = dict()
+        self._hits = 0
+        self._misses = 0
+        self._modified = False
+        if os.path.exists(self._path):
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self._path, 'r') as f:
+                data = json.load(f)
+        except ValueError as e:
+            _logger.warning('Ignoring corrupt cache "{}": {}'.format(self._path, e))
+            return
+        if data.get('version', None) != self.VERSION:
+            _logger.warning('Ignoring cache "{}" with unsupported version'.format(
+                self._path))
+            return
+        self._namespaces = data['namespaces']
+        _logger.info('Loaded {} cache entries from "{}"'.format(
+            len(self._entries), self._path))
+
+    @property
+    def _entries(self):
+        return self._namespaces.setdefault(self._namespace, dict())
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    def lookup(self, key, fingerprint, inputs):
+        """
+        Returns a copy of the cached fields for `key` or `None` if there
+        is no entry or the entry was derived with a different `fingerprint`
+        or from different `inputs`.
+        """
+        entry = self._entries.get(key, None)
+        if (entry is not None and entry['fingerprint'] == fingerprint and
+                entry['inputs'] == inputs):
+            self._hits += 1
+            return entry['fields'].copy()
+        self._misses += 1
+        return None
+
+    def store(self, key, fingerprint, inputs, fields):
+        assert isinstance(fields, dict)
+        # Round trip through JSON so that stored entries compare equal
+        # with entries loaded from disk (e.g. tuples become lists).
+        self._entries[key] = json.loads(json.dumps({
+            'fingerprint': fingerprint,
+            'inputs': inputs,
+            'fields': fields,
+        }))
+        self._modified = True
+
+    def save(self):
+        if not self._modified:
+            return
+        _logger.info('Writing {} cache entries to "{}"'.format(
+            len(self._entries), self._path))
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': self.VERSION,
+                'namespaces': self._namespaces,
+            }, f, sort_keys=True)
+        os.replace(tmp_path, self._path)
+        self._modified = False
@@ -1,7 +1,9 @@
 # vim: set sw=4 ts=4 softtabstop=4 expandtab:
 import argparse
+import json
 import logging
 import os
+import threading
 import traceback
 import yaml
 from . import ConfigLoader
@@ -105,9 +107,137 @@ def setupWorkingDirectory(workingDir):
     return (absWorkDir, True)
 
 
-def writeYAMLOutputFile(yamlOutputFilePath, data):
+def writeYAMLOutputFile(yamlOutputFilePath, data, results=None, validateRecord=None):
+    """
+      Write ``data`` to ``yamlOutputFilePath``. If ``results`` is not
+      ``None`` it is an iterable (e.g. a generator) of results that is
+      streamed to the file as the ``results`` of ``data`` and checked
+      with ``validateRecord`` (see ``util.writeYamlStream()``).
+
+      The file is written under a temporary name and only renamed to
+      ``yamlOutputFilePath`` once it is complete so that a failure (e.g.
+      an invalid result) never leaves a partial output file behind.
+    """
     _logger.info('Writing output to {}'.format(yamlOutputFilePath))
-    with open(yamlOutputFilePath, 'w') as f:
-        f.write('# Generated by smt-runner\n')
-        util.writeYaml(f, data)
+    tmpPath = yamlOutputFilePath + '.tmp'
+    try:
+        with open(tmpPath, 'w') as f:
+            f.write('# Generated by smt-runner\n')
+            if results is None:
+                util.writeYaml(f, data)
+            else:
+                header = { k: v for k, v in data.items() if k != 'results' }
+                util.writeYamlStream(f, header, results, validateRecord)
+    except BaseException:
+        os.remove(tmpPath)
+        raise
+    os.replace(tmpPath, yamlOutputFilePath)
     return
+
+
+def getResultJournalPath(yamlOutputFilePath):
+    """
+      Returns the path of the result journal that accompanies
+      ``yamlOutputFilePath``.
+    """
+    return yamlOutputFilePath + '.journal.jsonl'
+
+
+class ResultJournal:
+    """
+      Append-only journal of raw results written as JSON Lines.
+
+      Every appended result is flushed to disk immediately so that
+      results of a partially completed batch survive the death of the
+      process.
+    """
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self._count = 0
+        _logger.info('Journaling results to {}'.format(self._path))
+        self._dropTruncatedRecord()
+        self._file = open(self._path, 'a')
+
+    def _dropTruncatedRecord(self):
+        # If a previous writer died part way through a record the journal
+        # will not end in a newline. Remove the partial record so that
+        # appended records start on a new line.
+        if not os.path.exists(self._path):
+            return
+        with open(self._path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b'\n':
+                return
+            # Search backwards for the newline ending the last complete
+            # record so that only the tail of the journal is read.
+            newSize = 0
+            blockEnd = end
+            while blockEnd > 0:
+                blockStart = max(0, blockEnd - 4096)
+                f.seek(blockStart)
+                block = f.read(blockEnd - blockStart)
+                index = block.rfind(b'\n')
+                if index != -1:
+                    newSize = blockStart + index + 1
+                    break
+                blockEnd = blockStart
+            _logger.warning('Dropping truncated record at end of {}'.format(
+                self._path))
+            f.truncate(newSize)
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def count(self):
+        """
+          Number of results appended by this object.
+        """
+        return self._count
+
+    def append(self, result):
+        assert isinstance(result, dict)
+        line = json.dumps(result, sort_keys=True)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def loadResultJournal(path, validateRecord=None):
+    """
+      Generator that yields the raw results stored in the journal at
+      ``path``. A truncated final line (e.g. from a crash part way
+      through a write) is skipped.
+
+      If ``validateRecord`` is not ``None`` it is called with each result
+      and its index (e.g. ``ResultInfo.validateResultInfoRecord``) before
+      the result is yielded and should throw if the result is invalid.
+    """
+    index = 0
+    with open(path, 'r') as f:
+        for lineNumber, line in enumerate(f, start=1):
+            try:
+                r = json.loads(line)
+            except ValueError:
+                if line.endswith('\n'):
+                    raise
+                _logger.warning('Ignoring truncated record at {}:{}'.format(
+                    path, lineNumber))
+                continue
+            if validateRecord is not None:
+                validateRecord(r, index=index)
+            index += 1
+            yield r
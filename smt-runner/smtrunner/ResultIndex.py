@@ -0,0 +1,280 @@
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+SQLite index of result info files.
+
+Result info files (one per solver and benchmark set) are loaded into a
+single database so that counts, filters and cross solver comparisons can
+be answered with SQL instead of re-parsing YAML.
+
+The database contains the following tables and views.
+
+* `result_files` has one row per indexed result info file.
+* `records` has one row per result and stores the original result as JSON
+  so that results can be exported back to result info files losslessly.
+* `runs` has one row per run of each result (i.e. a merged result with
+  10 runs has 10 rows) with the commonly queried fields as columns.
+* `sat_disagreements` (view) lists pairs of results of different solvers
+  on the same benchmark in the same benchmark set where one reported sat
+  and the other unsat (in any of their runs). Each pair is listed once
+  with `solver_a < solver_b`.
+"""
+import json
+import logging
+import os
+import sqlite3
+from . import DerivedFieldCache
+from . import ResultInfo
+from . import ResultInfoUtil
+
+_logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+# Fields of a result that are stored as columns of `runs`. The value is
+# the SQLite type of the column.
+RUN_FIELDS = (
+    ('sat', 'TEXT'),
+    ('event_tag', 'TEXT'),
+    ('wallclock_time', 'REAL'),
+    ('dsoes_wallclock_time', 'REAL'),
+    ('user_cpu_time', 'REAL'),
+    ('sys_cpu_time', 'REAL'),
+    ('exit_code', 'INTEGER'),
+    ('backend_timeout', 'INTEGER'),
+    ('out_of_memory', 'INTEGER'),
+    ('working_directory', 'TEXT'),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS index_info (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS result_files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    signature TEXT NOT NULL,
+    solver TEXT NOT NULL,
+    benchmark_set TEXT NOT NULL,
+    schema_version INTEGER,
+    top_level TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES result_files(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    solver TEXT NOT NULL,
+    benchmark_set TEXT NOT NULL,
+    benchmark TEXT,
+    num_sat INTEGER NOT NULL,
+    num_unsat INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    record_id INTEGER NOT NULL REFERENCES records(id) ON DELETE CASCADE,
+    file_id INTEGER NOT NULL REFERENCES result_files(id) ON DELETE CASCADE,
+    solver TEXT NOT NULL,
+    benchmark_set TEXT NOT NULL,
+    benchmark TEXT,
+    run INTEGER NOT NULL,
+    is_error INTEGER NOT NULL,
+    expected_sat TEXT,
+    {run_columns}
+);
+CREATE INDEX IF NOT EXISTS records_file_id ON records(file_id);
+CREATE INDEX IF NOT EXISTS records_benchmark ON records(benchmark, benchmark_set);
+CREATE INDEX IF NOT EXISTS runs_benchmark ON runs(benchmark, benchmark_set);
+CREATE INDEX IF NOT EXISTS runs_solver ON runs(solver, benchmark_set);
+CREATE INDEX IF NOT EXISTS runs_event_tag ON runs(event_tag);
+CREATE INDEX IF NOT EXISTS runs_wallclock_time ON runs(wallclock_time);
+CREATE INDEX IF NOT EXISTS runs_record_id ON runs(record_id);
+CREATE VIEW IF NOT EXISTS sat_disagreements AS
+    SELECT a.benchmark_set AS benchmark_set,
+           a.benchmark AS benchmark,
+           a.solver AS solver_a,
+           a.num_sat AS num_sat_a,
+           a.num_unsat AS num_unsat_a,
+           b.solver AS solver_b,
+           b.num_sat AS num_sat_b,
+           b.num_unsat AS num_unsat_b
+    FROM records a JOIN records b
+        ON a.benchmark = b.benchmark AND a.benchmark_set = b.benchmark_set
+    WHERE a.solver < b.solver
+        AND ((a.num_sat > 0 AND b.num_unsat > 0) OR
+             (a.num_unsat > 0 AND b.num_sat > 0));
+""".format(run_columns=',\n    '.join(
+    '{} {}'.format(name, sql_type) for name, sql_type in RUN_FIELDS))
+
+class ResultIndexError(Exception):
+    pass
+
+def _get_num_runs(r):
+    num_runs = 1
+    for value in r.values():
+        if isinstance(value, list):
+            num_runs = max(num_runs, len(value))
+    return num_runs
+
+def _get_run_value(r, field, run):
+    value = r.get(field, None)
+    if isinstance(value, list):
+        return value[run] if run < len(value) else None
+    return value
+
+class ResultIndex:
+    """
+    A result index stored in the SQLite database at `path`.
+    """
+    def __init__(self, path):
+        self._path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        self._conn.executescript(_SCHEMA)
+        row = self._conn.execute(
+            "SELECT value FROM index_info WHERE key = 'schema_version'").fetchone()
+        if row is None:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO index_info VALUES ('schema_version', ?)",
+                    (str(SCHEMA_VERSION),))
+        elif int(row[0]) != SCHEMA_VERSION:
+            raise ResultIndexError(
+                'Index "{}" uses schema version {} but {} is supported'.format(
+                    path, row[0], SCHEMA_VERSION))
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def connection(self):
+        return self._conn
+
+    def close(self):
+        self._conn.close()
+
+    def is_up_to_date(self, path):
+        """
+        Returns true if the result info file at `path` is indexed and has
+        not been modified since.
+        """
+        row = self._conn.execute(
+            'SELECT signature FROM result_files WHERE path = ?',
+            (os.path.abspath(path),)).fetchone()
+        if row is None:
+            return False
+        signature = DerivedFieldCache.get_file_signature(os.path.abspath(path))
+        return row[0] == json.dumps(signature)
+
+    def add_file(self, path, solver=None, benchmark_set=None):
+        """
+        Load the result info file at `path` and add it to the index,
+        replacing any previous version of it. Returns the number of
+        results added.
+        """
+        abs_path = os.path.abspath(path)
+        default_solver, default_benchmark_set = ResultInfoUtil.get_default_names(abs_path)
+        if solver is None:
+            solver = default_solver
+        if benchmark_set is None:
+            benchmark_set = default_benchmark_set
+        signature = DerivedFieldCache.get_file_signature(abs_path)
+        with open(abs_path, 'r') as f:
+            result_infos = ResultInfo.loadRawResultInfos(f)
+        top_level = {
+            key: value for key, value in result_infos.items()
+            if key not in ('results', ResultInfo.VALIDATION_DIGEST_KEY)
+        }
+        with self._conn:
+            self._conn.execute(
+                'DELETE FROM result_files WHERE path = ?', (abs_path,))
+            file_id = self._conn.execute(
+                'INSERT INTO result_files (path, signature, solver, '
+                'benchmark_set, schema_version, top_level) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (abs_path, json.dumps(signature), solver, benchmark_set,
+                 result_infos.get('schema_version', None),
+                 json.dumps(top_level))).lastrowid
+            run_rows = []
+            for position, r in enumerate(result_infos['results']):
+                benchmark = r.get('benchmark', None)
+                num_runs = _get_num_runs(r)
+                sats = [ _get_run_value(r, 'sat', run) for run in range(num_runs) ]
+                record_id = self._conn.execute(
+                    'INSERT INTO records (file_id, position, solver, '
+                    'benchmark_set, benchmark, num_sat, num_unsat, data) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (file_id, position, solver, benchmark_set, benchmark,
+                     sats.count('sat'), sats.count('unsat'),
+                     json.dumps(r))).lastrowid
+                is_error = 1 if 'error' in r else 0
+                for run in range(num_runs):
+                    run_rows.append(
+                        (record_id, file_id, solver, benchmark_set, benchmark,
+                         run, is_error, r.get('expected_sat', None)) +
+                        tuple(_get_run_value(r, field, run)
+                              for field, _ in RUN_FIELDS))
+            self._conn.executemany(
+                'INSERT INTO runs (record_id, file_id, solver, benchmark_set, '
+                'benchmark, run, is_error, expected_sat, {}) VALUES ({})'.format(
+                    ', '.join(field for field, _ in RUN_FIELDS),
+                    ', '.join(['?'] * (8 + len(RUN_FIELDS)))),
+                run_rows)
+        _logger.info('Indexed {} results ({} runs) from "{}" as {}/{}'.format(
+            len(result_infos['results']), len(run_rows), abs_path,
+            benchmark_set, solver))
+        return len(result_infos['results'])
+
+    def remove_file(self, path):
+        with self._conn:
+            self._conn.execute(
+                'DELETE FROM result_files WHERE path = ?',
+                (os.path.abspath(path),))
+
+    def get_files(self):
+        """
+        Returns a list of (<path>, <solver>, <benchmark_set>) tuples of the
+        indexed files.
+        """
+        return self._conn.execute(
+            'SELECT path, solver, benchmark_set FROM result_files '
+            'ORDER BY benchmark_set, solver').fetchall()
+
+    def query(self, sql, parameters=()):
+        """
+        Returns a cursor over the rows of the SQL query `sql`.
+        """
+        return self._conn.execute(sql, parameters)
+
+    def get_result_infos_header(self, solver, benchmark_set):
+        """
+        Returns the top level data (everything except `results`) of the
+        result info file indexed for `solver` and `benchmark_set`.
+        """
+        row = self._conn.execute(
+            'SELECT top_level FROM result_files '
+            'WHERE solver = ? AND benchmark_set = ?',
+            (solver, benchmark_set)).fetchall()
+        if len(row) != 1:
+            raise ResultIndexError(
+                'Expected one indexed file for {}/{} but found {}'.format(
+                    benchmark_set, solver, len(row)))
+        return json.loads(row[0][0])
+
+    def iter_results(self, solver, benchmark_set, where=None, parameters=()):
+        """
+        Generator yielding the original results of `solver` on
+        `benchmark_set` in file order. If `where` is not `None` only
+        results with at least one run for which the SQL expression `where`
+        (over the columns of `runs`) is true are yielded.
+        """
+        sql = ('SELECT records.data FROM records '
+               'JOIN result_files ON records.file_id = result_files.id '
+               'WHERE result_files.solver = ? AND result_files.benchmark_set = ?')
+        if where is not None:
+            sql += (' AND records.id IN '
+                    '(SELECT record_id FROM runs WHERE {})'.format(where))
+        sql += ' ORDER BY records.file_id, records.position'
+        for (data,) in self._conn.execute(
+                sql, (solver, benchmark_set) + tuple(parameters)):
+            yield json.loads(data)
@@ -3,13 +3,23 @@
 # vim: set sw=4 ts=4 softtabstop=4 expandtab:
 import collections
 import copy
+import hashlib
+import json
 import os
 import logging
 import jsonschema
+import numpy as np
+from . import ResultInfoBinary
 from . import util
 
 _logger = logging.getLogger(__name__)
 
+# Top level key used to store the digest of result infos that have been
+# validated (see ``computeValidationDigest()``). The digest is not keyed so
+# it only records that a file was validated and has not been changed by
+# accident since. It says nothing about who wrote the file.
+VALIDATION_DIGEST_KEY = 'validation_digest'
+
 class ResultInfo:
     def __init__(self, data):
         assert isinstance(data, dict)
@@ -50,34 +60,470 @@ def loadResultInfos(openFile, auto_upgrade=True):
     return (resultInfoObjects, miscData)
 
 
-def loadRawResultInfos(openFile, auto_upgrade=True):
-    resultInfos = util.loadYaml(openFile)
-    if auto_upgrade:
-        resultInfos = upgradeResultInfosToSchema(resultInfos)
-    validateResultInfos(resultInfos)
+def loadRawResultInfos(openFile, auto_upgrade=True, use_validation_digest=True):
+    """
+      Load result infos from ``openFile`` which can be either YAML or the
+      binary format (see ``ResultInfoBinary``).
+
+      If ``use_validation_digest`` is true validation of YAML files is
+      skipped when they store a matching validation digest (see
+      ``computeValidationDigest()``). Pass false for files that might have
+      been crafted to look validated.
+    """
+    schema = getSchema()
+    if ResultInfoBinary.isBinaryResultInfoFile(openFile):
+        topLevel, numResults, strings, columns = _loadBinaryColumns(openFile)
+        if not auto_upgrade or topLevel.get('schema_version', None) == schema['__version__']:
+            validateResultInfoColumns(topLevel, numResults, strings, columns, schema)
+            return ResultInfoBinary.resultInfosFromColumns(
+                topLevel, numResults, strings, columns)
+        resultInfos = ResultInfoBinary.resultInfosFromColumns(
+            topLevel, numResults, strings, columns)
+    else:
+        resultInfos = util.loadYaml(openFile)
+    # The result infos have just been loaded so there is no need to copy
+    # them if they are already at the right version.
+    if auto_upgrade and resultInfos.get('schema_version', None) != schema['__version__']:
+        resultInfos = upgradeResultInfosToSchema(resultInfos, schema)
+    if use_validation_digest and hasMatchingValidationDigest(resultInfos, schema):
+        _logger.debug('Skipping validation of "{}" (validation digest matches)'.format(
+            getattr(openFile, 'name', openFile)))
+        checkSchemaVersion(resultInfos, schema)
+    else:
+        validateResultInfos(resultInfos, schema)
     return resultInfos
 
 
+def loadResultInfoColumns(openFile, fields=None):
+    """
+      Load and validate the columns of the binary result info file
+      ``openFile`` without building the result dictionaries.
+
+      Returns the same tuple as ``ResultInfoBinary.loadBinaryColumns()``
+      with the columns restricted to ``fields`` if given.
+    """
+    topLevel, numResults, strings, columns = _loadBinaryColumns(openFile)
+    validateResultInfoColumns(topLevel, numResults, strings, columns)
+    if fields is not None:
+        columns = {
+            field: column for field, column in columns.items() if field in fields
+        }
+    return (topLevel, numResults, strings, columns)
+
+
+def _loadBinaryColumns(openFile):
+    try:
+        return ResultInfoBinary.loadBinaryColumns(openFile)
+    except ResultInfoBinary.ResultInfoBinaryError as e:
+        raise ResultInfoValidationError(str(e))
+
+
+def saveBinaryResultInfos(path, resultInfos, compress=False):
+    """
+      Validate ``resultInfos`` and write them to ``path`` in the binary
+      format.
+    """
+    validateResultInfos(resultInfos)
+    ResultInfoBinary.saveBinaryResultInfos(path, resultInfos, compress)
+
+
+class _UnsupportedSchemaError(Exception):
+    pass
+
+
+# Keywords understood by ``_getValueRule()``
+_VALUE_RULE_KEYWORDS = frozenset(['type', 'enum', 'anyOf', 'oneOf', 'items'])
+_TYPE_TO_TAGS = {
+    'boolean': (ResultInfoBinary._TAG_BOOL,),
+    'integer': (ResultInfoBinary._TAG_INT,),
+    'null': (ResultInfoBinary._TAG_NONE,),
+    'number': (ResultInfoBinary._TAG_INT, ResultInfoBinary._TAG_FLOAT),
+    'string': (ResultInfoBinary._TAG_STR,),
+}
+
+
+def _unionTagRules(a, b):
+    union = dict(a)
+    for tag, enum in b.items():
+        if tag not in union:
+            union[tag] = enum
+        elif union[tag] is None or enum is None:
+            union[tag] = None
+        else:
+            union[tag] = union[tag] | enum
+    return union
+
+
+def _getValueRule(schema, keywords):
+    """
+      Returns the tuple (<single>, <items>) that describes the values
+      ``schema`` accepts. <single> maps the binary tags of accepted single
+      values to the set of accepted strings (``None`` if any is accepted)
+      and <items> does the same for the items of accepted lists or is
+      ``None`` if lists are not accepted.
+
+      The rule may reject values the schema accepts but never the other
+      way round. Throws ``_UnsupportedSchemaError`` if ``schema`` cannot be
+      described this way.
+    """
+    constraining = set(schema) & keywords
+    if len(constraining) == 0 or not constraining <= _VALUE_RULE_KEYWORDS:
+        raise _UnsupportedSchemaError()
+    for combinator in ('anyOf', 'oneOf'):
+        if combinator not in constraining:
+            continue
+        if len(constraining) > 1:
+            raise _UnsupportedSchemaError()
+        single = dict()
+        items = None
+        for alternative in schema[combinator]:
+            altSingle, altItems = _getValueRule(alternative, keywords)
+            if combinator == 'oneOf' and len(set(single) & set(altSingle)) > 0:
+                # Overlapping alternatives of ``oneOf`` reject values
+                # accepted by both.
+                raise _UnsupportedSchemaError()
+            single = _unionTagRules(single, altSingle)
+            if altItems is not None:
+                # Every item of a list has to match the same alternative
+                # so the items of several alternatives can't be merged.
+                if items is not None:
+                    raise _UnsupportedSchemaError()
+                items = altItems
+        return (single, items)
+
+    types = schema.get('type', None)
+    if types is None:
+        if 'enum' not in schema:
+            raise _UnsupportedSchemaError()
+        # Only strings can match the enum (see below)
+        types = ['string']
+    elif isinstance(types, str):
+        types = [types]
+    single = dict()
+    items = None
+    for t in types:
+        if t == 'array':
+            if not isinstance(schema.get('items', None), dict):
+                raise _UnsupportedSchemaError()
+            items, nestedItems = _getValueRule(schema['items'], keywords)
+            if nestedItems is not None:
+                raise _UnsupportedSchemaError()
+        elif t in _TYPE_TO_TAGS:
+            for tag in _TYPE_TO_TAGS[t]:
+                single[tag] = None
+        else:
+            raise _UnsupportedSchemaError()
+    if 'enum' in schema:
+        enum = schema['enum']
+        if not isinstance(enum, list) or not all(isinstance(v, str) for v in enum):
+            raise _UnsupportedSchemaError()
+        single = { ResultInfoBinary._TAG_STR: frozenset(enum) } if (
+            ResultInfoBinary._TAG_STR in single) else dict()
+        items = None
+    return (single, items)
+
+
+def _getObjectRule(schema, keywords):
+    """
+      Returns the tuple (<property rules>, <additional properties>,
+      <required>) for the schema of a single result.
+    """
+    constraining = set(schema) & keywords
+    if not constraining <= { 'type', 'properties', 'additionalProperties', 'required' }:
+        raise _UnsupportedSchemaError()
+    if schema.get('type', 'object') != 'object':
+        raise _UnsupportedSchemaError()
+    additional = schema.get('additionalProperties', True)
+    if not isinstance(additional, bool):
+        raise _UnsupportedSchemaError()
+    propertyRules = {
+        name: _getValueRule(propertySchema, keywords)
+        for name, propertySchema in schema.get('properties', {}).items()
+    }
+    return (propertyRules, additional, list(schema.get('required', [])))
+
+
+def _getColumnRules(schema, validatorClass):
+    """
+      Returns the tuple (<combinator>, <object rules>) used to validate
+      results column by column or ``None`` if the schema of a result uses
+      keywords that cannot be checked that way.
+    """
+    # Keywords the validator doesn't know about are ignored by it.
+    keywords = frozenset(validatorClass.VALIDATORS)
+    itemsSchema = schema['properties']['results']['items']
+    try:
+        constraining = set(itemsSchema) & keywords
+        combinator = 'anyOf'
+        branches = [ itemsSchema ]
+        for c in ('anyOf', 'oneOf'):
+            if c in constraining:
+                if len(constraining) > 1:
+                    raise _UnsupportedSchemaError()
+                combinator = c
+                branches = itemsSchema[c]
+        return (combinator, [ _getObjectRule(b, keywords) for b in branches ])
+    except _UnsupportedSchemaError:
+        _logger.debug('Results will be validated one at a time')
+        return None
+
+
+def _valuesMatchTagRule(tagRule, column, mask, strings):
+    """
+      Returns a boolean array that is true for the values of ``column``
+      selected by ``mask`` that match ``tagRule``.
+    """
+    tags = column.tags[mask]
+    matches = np.isin(tags, list(tagRule))
+    enum = tagRule.get(ResultInfoBinary._TAG_STR, None)
+    if enum is not None and column.stringIndices is not None:
+        isString = tags == ResultInfoBinary._TAG_STR
+        indices = column.stringIndices[mask][isString]
+        uniqueIndices = np.unique(indices)
+        allowed = uniqueIndices[np.array(
+            [ strings[i] in enum for i in uniqueIndices.tolist() ], dtype=bool)]
+        matches[isString] = np.isin(indices, allowed)
+    return matches
+
+
+def _rowsMatchingValueRule(valueRule, column, numResults, strings):
+    """
+      Returns a boolean array that is true for each result whose value in
+      ``column`` matches ``valueRule`` or that doesn't have the field.
+    """
+    single, items = valueRule
+    kinds = column.kinds
+    valueRows = np.repeat(np.arange(numResults), np.diff(column.offsets))
+    isSingle = kinds[valueRows] == ResultInfoBinary._KIND_SINGLE
+    valueMatches = np.zeros(len(valueRows), dtype=bool)
+    valueMatches[isSingle] = _valuesMatchTagRule(single, column, isSingle, strings)
+    rowMatches = kinds != ResultInfoBinary._KIND_LIST
+    if items is not None:
+        valueMatches[~isSingle] = _valuesMatchTagRule(items, column, ~isSingle, strings)
+        rowMatches[:] = True
+    rowMatches[valueRows[~valueMatches]] = False
+    return rowMatches
+
+
+class CompiledSchema:
+    """
+      Validators compiled from a ResultInfo schema.
+
+      ``validateHeader()`` validates everything except the results and
+      ``validateRecord()`` validates a single result so that validation
+      can be done one result at a time (e.g. while streaming).
+      ``validateColumns()`` validates results stored as binary columns.
+    """
+    def __init__(self, schema):
+        assert isinstance(schema, dict)
+        assert '__version__' in schema
+        self.schema = schema
+        validatorClass = jsonschema.validators.validator_for(schema)
+        validatorClass.check_schema(schema)
+        self._headerValidator = validatorClass(schema)
+        self._recordSchemaPath = ['properties', 'results', 'items']
+        self._recordValidator = validatorClass(
+            schema['properties']['results']['items'])
+        self._columnRules = _getColumnRules(schema, validatorClass)
+        self.digest = hashlib.sha1(
+            json.dumps(schema, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def validateHeader(self, resultInfos):
+        assert isinstance(resultInfos, dict)
+        checkSchemaVersion(resultInfos, self.schema)
+        header = resultInfos.copy()
+        if isinstance(header.get('results', None), list):
+            header['results'] = []
+        e = jsonschema.exceptions.best_match(
+            self._headerValidator.iter_errors(header))
+        if e is not None:
+            raise ResultInfoValidationError(
+                str(e),
+                e.absolute_schema_path)
+
+    def validateRecord(self, result, index=None):
+        e = jsonschema.exceptions.best_match(
+            self._recordValidator.iter_errors(result))
+        if e is not None:
+            absoluteSchemaPath = collections.deque(self._recordSchemaPath)
+            absoluteSchemaPath.extend(e.absolute_schema_path)
+            message = str(e)
+            if index is not None:
+                message = 'Result {}: {}'.format(index, message)
+            raise ResultInfoValidationError(message, absoluteSchemaPath)
+
+    def validateColumns(self, topLevel, numResults, strings, columns):
+        """
+          Validate result infos loaded by
+          ``ResultInfoBinary.loadBinaryColumns()``. ``columns`` must contain
+          every field.
+
+          The values of each column are checked at once. Results that
+          these checks cannot accept are built and validated one at a
+          time so errors are the same as for ``validateRecord()``.
+        """
+        header = dict(topLevel)
+        header['results'] = []
+        self.validateHeader(header)
+        if self._columnRules is None:
+            unchecked = np.arange(numResults)
+        else:
+            combinator, objectRules = self._columnRules
+            numMatches = np.zeros(numResults, dtype=np.int64)
+            for propertyRules, additional, required in objectRules:
+                matches = np.ones(numResults, dtype=bool)
+                for field in required:
+                    if field not in columns:
+                        matches[:] = False
+                    else:
+                        matches &= columns[field].kinds != ResultInfoBinary._KIND_MISSING
+                for field, column in columns.items():
+                    if field in propertyRules:
+                        matches &= _rowsMatchingValueRule(
+                            propertyRules[field], column, numResults, strings)
+                    elif not additional:
+                        matches &= column.kinds == ResultInfoBinary._KIND_MISSING
+                numMatches += matches
+            if combinator == 'oneOf':
+                unchecked = np.flatnonzero(numMatches != 1)
+            else:
+                unchecked = np.flatnonzero(numMatches == 0)
+        if len(unchecked) > 0:
+            _logger.debug('Validating {} results one at a time'.format(len(unchecked)))
+        for index in unchecked.tolist():
+            self.validateRecord(
+                ResultInfoBinary.resultFromColumns(strings, columns, index), index)
+
+
+_cachedSchema = None
+_cachedCompiledSchema = None
+
+
+def _loadSchema():
+    global _cachedSchema
+    if _cachedSchema is None:
+        yamlFile = os.path.join(os.path.dirname(__file__), 'ResultInfoSchema.yml')
+        with open(yamlFile, 'r') as f:
+            _cachedSchema = util.loadYaml(f)
+        assert isinstance(_cachedSchema, dict)
+        assert '__version__' in _cachedSchema
+    return _cachedSchema
+
+
 def getSchema():
     """
       Return the Schema for ResultInfo files.
+      The schema file is only parsed once per process.
     """
-    yamlFile = os.path.join(os.path.dirname(__file__), 'ResultInfoSchema.yml')
-    schema = None
-    with open(yamlFile, 'r') as f:
-        schema = util.loadYaml(f)
-    assert isinstance(schema, dict)
-    assert '__version__' in schema
-    return schema
+    return copy.deepcopy(_loadSchema())
+
+
+def getCompiledSchema(schema=None):
+    """
+      Return a ``CompiledSchema`` for ``schema``. The compiled
+      ResultInfo schema is cached so it is only built once per process.
+    """
+    global _cachedCompiledSchema
+    if schema is not None and schema != _loadSchema():
+        return CompiledSchema(schema)
+    if _cachedCompiledSchema is None:
+        _cachedCompiledSchema = CompiledSchema(getSchema())
+    return _cachedCompiledSchema
 
 
-def validateResultInfos(resultInfos, schema=None):
+def validateResultInfos(resultInfos, schema=None, returnDigest=False):
     """
       Validate a ``resultInfo`` file.
       Will throw a ``ResultInfoValidationError`` exception if
-      something is wrong
+      something is wrong. If ``returnDigest`` is true the validation
+      digest of ``resultInfos`` is returned (see
+      ``computeValidationDigest()``). ``resultInfos`` is never modified.
     """
     assert isinstance(resultInfos, dict)
+    compiled = getCompiledSchema(schema)
+    compiled.validateHeader(resultInfos)
+    for index, result in enumerate(resultInfos['results']):
+        compiled.validateRecord(result, index)
+    if returnDigest:
+        return computeValidationDigest(resultInfos, schema)
+    return None
+
+
+def validateResultInfoRecord(result, schema=None, index=None):
+    """
+      Validate a single result (i.e. an entry of ``results``).
+      Will throw a ``ResultInfoValidationError`` exception if
+      something is wrong.
+    """
+    getCompiledSchema(schema).validateRecord(result, index)
+
+
+def validateResultInfoColumns(topLevel, numResults, strings, columns, schema=None):
+    """
+      Validate result infos loaded by ``ResultInfoBinary.loadBinaryColumns()``
+      (with every field). Will throw a ``ResultInfoValidationError``
+      exception if something is wrong.
+    """
+    getCompiledSchema(schema).validateColumns(topLevel, numResults, strings, columns)
+
+
+def computeValidationDigest(resultInfos, schema=None):
+    """
+      Return the validation digest of ``resultInfos`` (ignoring any stored
+      digest) and the schema it is validated against or ``None`` if
+      ``resultInfos`` cannot be serialized.
+
+      The digest is an unkeyed hash so anyone can compute it. It is a
+      cache of a previous validation that also catches accidental edits,
+      not a way to authenticate files.
+    """
+    compiled = getCompiledSchema(schema)
+    data = {
+        key: value for key, value in resultInfos.items()
+        if key != VALIDATION_DIGEST_KEY
+    }
+    try:
+        asJson = json.dumps(data, sort_keys=True)
+    except (TypeError, ValueError):
+        return None
+    h = hashlib.sha1(compiled.digest.encode('utf-8'))
+    h.update(asJson.encode('utf-8'))
+    return h.hexdigest()
+
+
+def withValidationDigest(resultInfos, digest):
+    """
+      Return a shallow copy of ``resultInfos`` that stores ``digest`` (as
+      returned by ``validateResultInfos(..., returnDigest=True)``) so that
+      loading the written file again can skip validation. Any stale digest
+      is dropped if ``digest`` is ``None``.
+    """
+    newResultInfos = dict(resultInfos)
+    newResultInfos.pop(VALIDATION_DIGEST_KEY, None)
+    if digest is not None:
+        newResultInfos[VALIDATION_DIGEST_KEY] = digest
+    return newResultInfos
+
+
+def hasMatchingValidationDigest(resultInfos, schema=None):
+    """
+      Returns true if ``resultInfos`` stores a validation digest that
+      matches its contents and ``schema``, i.e. it was validated against
+      ``schema`` when it was written and has not been modified since.
+      Only use this to skip validation of files written by these tools
+      (see ``computeValidationDigest()``).
+    """
+    digest = resultInfos.get(VALIDATION_DIGEST_KEY, None)
+    if not isinstance(digest, str):
+        return False
+    return digest == computeValidationDigest(resultInfos, schema)
+
+
+def checkSchemaVersion(resultInfos, schema=None):
+    """
+      Check that ``resultInfos`` uses the schema version of ``schema``.
+      Will throw a ``ResultInfoValidationError`` exception if it doesn't.
+    """
     if schema is None:
         schema = getSchema()
     assert isinstance(schema, dict)
@@ -103,15 +549,6 @@ def validateResultInfos(resultInfos, schema=None):
                 resultInfos['schema_version'],
                 schema['__version__']))
 
-    # Validate against the schema
-    try:
-        jsonschema.validate(resultInfos, schema)
-    except jsonschema.exceptions.ValidationError as e:
-        raise ResultInfoValidationError(
-            str(e),
-            e.absolute_schema_path)
-    return
-
 
 def upgradeResultInfosToVersion(resultInfos, schemaVersion):
     """
@@ -0,0 +1,560 @@
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Binary on-disk format for result infos.
+
+The format is a NumPy ``.npz`` archive that stores the results column by
+column. For each field of the results the values of every result are
+flattened into a single sequence (merged results contribute one value per
+run) and stored as
+
+* ``<field>.kinds`` - int8 per result. ``0`` if the field is missing,
+  ``1`` for a single value and ``2`` for a list (merged result). Stored as
+  a single value if every result has the same kind.
+* ``<field>.offsets`` - int64 per result plus one. Values of result ``i``
+  are ``values[offsets[i]:offsets[i+1]]``. Replaced by
+  ``<field>.length`` if every result has the same number of values.
+* ``<field>.tags`` - int8 per value. The type of each value (see
+  ``_TAG_*``). Stored as a single value if every value has the same type.
+* ``<field>.numbers`` - int64 or float64 per value for booleans and
+  numbers. Only present if there are such values.
+* ``<field>.strings`` - int32 per value. Index into the string table for
+  strings and JSON encoded values. Only present if there are such values.
+
+All strings are stored once in a NUL separated UTF-8 string table. The
+schema version, misc data and field names are stored as JSON.
+
+Files are validated against the schema when they are written. Loading
+checks that the arrays of every column have the expected types and shapes
+and ``ResultInfo`` checks the values against the schema column by column.
+"""
+from collections import namedtuple
+import io
+import json
+import logging
+import numpy as np
+import operator
+import os
+
+_logger = logging.getLogger(__name__)
+
+FORMAT_NAME = 'smtrunner-result-info'
+FORMAT_VERSION = 1
+FILE_EXTENSION = '.npz'
+
+# Zip file magic. ``.npz`` files are zip archives.
+_MAGIC = b'PK\x03\x04'
+
+_TAG_NONE = 0
+_TAG_BOOL = 1
+_TAG_INT = 2
+_TAG_FLOAT = 3
+_TAG_STR = 4
+# Anything else (e.g. nested dictionaries) is stored as JSON.
+_TAG_JSON = 5
+
+_TYPE_TO_TAG = {
+    type(None): _TAG_NONE,
+    bool: _TAG_BOOL,
+    int: _TAG_INT,
+    float: _TAG_FLOAT,
+    str: _TAG_STR,
+}
+
+_KIND_MISSING = 0
+_KIND_SINGLE = 1
+_KIND_LIST = 2
+
+# Integers that can be stored exactly in a float64
+_MAX_EXACT_FLOAT_INT = 2**53
+
+
+class ResultInfoBinaryError(Exception):
+    pass
+
+
+def isBinaryResultInfoFile(openFile):
+    """
+      Returns True if ``openFile`` (an open file or a path) refers to a
+      binary result info file. Open files are checked without consuming
+      any of their data so they can be read afterwards whatever their
+      format (this also works for pipes such as ``sys.stdin``).
+    """
+    if isinstance(openFile, str):
+        if not os.path.isfile(openFile):
+            return False
+        with open(openFile, 'rb') as f:
+            return f.read(len(_MAGIC)) == _MAGIC
+    stream = _getBinaryStream(openFile)
+    if stream is None:
+        return False
+    if hasattr(stream, 'peek'):
+        return stream.peek(len(_MAGIC))[:len(_MAGIC)] == _MAGIC
+    if not stream.seekable():
+        return False
+    position = stream.tell()
+    try:
+        return stream.read(len(_MAGIC)) == _MAGIC
+    finally:
+        stream.seek(position)
+
+
+class _StringTable:
+    def __init__(self):
+        self._stringToIndex = dict()
+
+    def add(self, s):
+        try:
+            return self._stringToIndex[s]
+        except KeyError:
+            if '\0' in s:
+                raise ResultInfoBinaryError(
+                    'Cannot store string containing NUL: {!r}'.format(s))
+            index = len(self._stringToIndex)
+            self._stringToIndex[s] = index
+            return index
+
+    def toArray(self):
+        strings = sorted(self._stringToIndex, key=self._stringToIndex.get)
+        blob = '\0'.join(strings).encode('utf-8')
+        return np.frombuffer(blob, dtype=np.uint8)
+
+
+def _uniformOrArray(array):
+    """
+      Returns ``array`` as a single value if all its elements are the same.
+    """
+    if len(array) > 0 and np.all(array == array[0]):
+        return np.array(array[0], dtype=array.dtype)
+    return array
+
+
+def _expand(stored, length):
+    if stored.ndim == 0:
+        return np.full(length, stored, dtype=stored.dtype)
+    return stored
+
+
+def _encodeField(field, results, stringTable):
+    kinds = np.zeros(len(results), dtype=np.int8)
+    lengths = np.zeros(len(results), dtype=np.int64)
+    values = []
+    for index, r in enumerate(results):
+        try:
+            value = r[field]
+        except KeyError:
+            continue
+        if isinstance(value, list):
+            kinds[index] = _KIND_LIST
+            lengths[index] = len(value)
+            values.extend(value)
+        else:
+            kinds[index] = _KIND_SINGLE
+            lengths[index] = 1
+            values.append(value)
+
+    tags = [ _TYPE_TO_TAG.get(type(v), _TAG_JSON) for v in values ]
+    tagSet = set(tags)
+    hasFloat = _TAG_FLOAT in tagSet
+    if hasFloat and _TAG_INT in tagSet:
+        # Integers that don't fit in a float64 are stored as JSON
+        for index, v in enumerate(values):
+            if tags[index] == _TAG_INT and abs(v) > _MAX_EXACT_FLOAT_INT:
+                tags[index] = _TAG_JSON
+        tagSet = set(tags)
+
+    arrays = dict()
+    arrays['{}.kinds'.format(field)] = _uniformOrArray(kinds)
+    presentLengths = lengths[kinds != _KIND_MISSING]
+    if (np.all(kinds != _KIND_MISSING) and len(presentLengths) > 0 and
+            presentLengths[0] > 0 and np.all(presentLengths == presentLengths[0])):
+        arrays['{}.length'.format(field)] = np.array(presentLengths[0], dtype=np.int64)
+    else:
+        offsets = np.zeros(len(results) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        arrays['{}.offsets'.format(field)] = offsets
+    arrays['{}.tags'.format(field)] = _uniformOrArray(np.array(tags, dtype=np.int8))
+    if tagSet & { _TAG_BOOL, _TAG_INT, _TAG_FLOAT }:
+        if hasFloat:
+            numbers = np.array([
+                v if t in (_TAG_BOOL, _TAG_INT, _TAG_FLOAT) else 0.0
+                for v, t in zip(values, tags)], dtype=np.float64)
+        else:
+            try:
+                numbers = np.array([
+                    v if t in (_TAG_BOOL, _TAG_INT) else 0
+                    for v, t in zip(values, tags)], dtype=np.int64)
+            except OverflowError:
+                raise ResultInfoBinaryError(
+                    'Integer in field "{}" is too large to store'.format(field))
+        arrays['{}.numbers'.format(field)] = numbers
+    if tagSet & { _TAG_STR, _TAG_JSON }:
+        strings = []
+        for v, t in zip(values, tags):
+            if t == _TAG_STR:
+                strings.append(stringTable.add(v))
+            elif t == _TAG_JSON:
+                strings.append(stringTable.add(json.dumps(v, sort_keys=True)))
+            else:
+                strings.append(-1)
+        arrays['{}.strings'.format(field)] = np.array(strings, dtype=np.int32)
+    return arrays
+
+
+def saveBinaryResultInfos(path, resultInfos, compress=False):
+    """
+      Write raw ``resultInfos`` to ``path`` in the binary format. The
+      caller is responsible for validating ``resultInfos`` first.
+    """
+    assert isinstance(resultInfos, dict)
+    results = resultInfos['results']
+    fields = set()
+    for r in results:
+        fields.update(r.keys())
+    fields = sorted(fields)
+    stringTable = _StringTable()
+    arrays = dict()
+    for field in fields:
+        arrays.update(_encodeField(field, results, stringTable))
+    meta = {
+        'format': FORMAT_NAME,
+        'format_version': FORMAT_VERSION,
+        'fields': fields,
+        'num_results': len(results),
+    }
+    for key, value in resultInfos.items():
+        if key == 'results':
+            continue
+        meta[key] = value
+    arrays['__meta__'] = np.frombuffer(
+        json.dumps(meta, sort_keys=True).encode('utf-8'), dtype=np.uint8)
+    arrays['__strings__'] = stringTable.toArray()
+    _logger.info('Writing {} results to "{}"'.format(len(results), path))
+    # Write via an open file so that NumPy doesn't append ``.npz``
+    with open(path, 'wb') as f:
+        if compress:
+            np.savez_compressed(f, **arrays)
+        else:
+            np.savez(f, **arrays)
+
+
+def _decodeTag(tag, numbers, stringIndices, strings):
+    """
+      Returns a list of the values in ``numbers`` or ``stringIndices``
+      decoded as type ``tag``.
+    """
+    if tag == _TAG_NONE:
+        return [None] * max(len(numbers), len(stringIndices))
+    if tag == _TAG_BOOL:
+        return (numbers != 0).tolist()
+    if tag == _TAG_INT:
+        return numbers.astype(np.int64).tolist()
+    if tag == _TAG_FLOAT:
+        return numbers.astype(np.float64).tolist()
+    if len(stringIndices) == 0:
+        return []
+    if len(stringIndices) == 1:
+        decoded = [strings[stringIndices[0]]]
+    else:
+        decoded = list(operator.itemgetter(*stringIndices.tolist())(strings))
+    if tag == _TAG_STR:
+        return decoded
+    assert tag == _TAG_JSON
+    return [ json.loads(s) for s in decoded ]
+
+
+def _getNumbers(column):
+    return column.numbers if column.numbers is not None else np.zeros(0)
+
+
+def _getStringIndices(column):
+    return (column.stringIndices if column.stringIndices is not None
+            else np.zeros(0, dtype=np.int32))
+
+
+def _decodeValues(column, strings):
+    """
+      Returns a list of the Python values stored in ``column``.
+    """
+    tags = column.tags
+    numValues = len(tags)
+    if numValues == 0:
+        return []
+    numbers = _getNumbers(column)
+    stringIndices = _getStringIndices(column)
+    tagCounts = np.bincount(tags, minlength=_TAG_JSON + 1)
+    commonTag = int(np.argmax(tagCounts))
+    if tagCounts[commonTag] == numValues:
+        # Every value has the same type
+        if commonTag == _TAG_NONE:
+            return [None] * numValues
+        return _decodeTag(commonTag, numbers, stringIndices, strings)
+    # Decode all values as the most common type and then patch the
+    # values of other types. This is only safe for types where decoding a
+    # value of another type doesn't fail.
+    if commonTag in (_TAG_NONE, _TAG_JSON):
+        commonTag = _TAG_NONE
+        values = [None] * numValues
+    else:
+        values = _decodeTag(commonTag, numbers, stringIndices, strings)
+    for tag in np.flatnonzero(tagCounts).tolist():
+        if tag == commonTag:
+            continue
+        indices = np.flatnonzero(tags == tag)
+        decoded = _decodeTag(
+            tag,
+            numbers[indices] if len(numbers) > 0 else numbers,
+            stringIndices[indices] if len(stringIndices) > 0 else stringIndices,
+            strings)
+        if tag == _TAG_NONE:
+            decoded = [None] * len(indices)
+        for index, value in zip(indices.tolist(), decoded):
+            values[index] = value
+    return values
+
+
+def _decodeValue(column, index, strings):
+    """
+      Returns the Python value of value ``index`` in ``column``.
+    """
+    tag = int(column.tags[index])
+    if tag == _TAG_NONE:
+        return None
+    numbers = _getNumbers(column)
+    stringIndices = _getStringIndices(column)
+    return _decodeTag(
+        tag,
+        numbers[index:index + 1] if len(numbers) > 0 else numbers,
+        stringIndices[index:index + 1] if len(stringIndices) > 0 else stringIndices,
+        strings)[0]
+
+
+def resultInfosFromColumns(topLevel, numResults, strings, columns):
+    """
+      Build raw result infos from the columns returned by
+      ``loadBinaryColumns()``.
+    """
+    results = [ dict() for _ in range(0, numResults) ]
+    for field, column in columns.items():
+        values = _decodeValues(column, strings)
+        kinds = column.kinds
+        lengths = np.diff(column.offsets)
+        if np.all(kinds == _KIND_SINGLE):
+            for r, value in zip(results, values):
+                r[field] = value
+            continue
+        if (np.all(kinds == _KIND_LIST) and len(lengths) > 0 and
+                np.all(lengths == lengths[0])):
+            # Every result has the field with the same number of values
+            length = int(lengths[0])
+            for index, r in enumerate(results):
+                r[field] = values[index * length:(index + 1) * length]
+            continue
+        offsets = column.offsets.tolist()
+        for index, kind in enumerate(kinds.tolist()):
+            if kind == _KIND_SINGLE:
+                results[index][field] = values[offsets[index]]
+            elif kind == _KIND_LIST:
+                results[index][field] = values[offsets[index]:offsets[index + 1]]
+    resultInfos = dict(topLevel)
+    resultInfos['results'] = results
+    return resultInfos
+
+
+def resultFromColumns(strings, columns, index):
+    """
+      Build the raw result at ``index`` from the columns returned by
+      ``loadBinaryColumns()``.
+    """
+    result = dict()
+    for field, column in columns.items():
+        kind = int(column.kinds[index])
+        if kind == _KIND_MISSING:
+            continue
+        values = [ _decodeValue(column, i, strings)
+                   for i in range(int(column.offsets[index]), int(column.offsets[index + 1])) ]
+        result[field] = values[0] if kind == _KIND_SINGLE else values
+    return result
+
+
+def loadBinaryResultInfos(openFile):
+    """
+      Load raw result infos from a binary result info file. ``openFile``
+      can be an open file or a path. Only the structure of the file is
+      checked. Use ``ResultInfo.loadRawResultInfos()`` to also validate
+      the results.
+    """
+    topLevel, numResults, strings, columns = loadBinaryColumns(openFile)
+    return resultInfosFromColumns(topLevel, numResults, strings, columns)
+
+
+# A field stored in a binary result info file with every array expanded
+# to its full length. ``numbers`` and ``stringIndices`` are ``None`` if
+# the field has no values of the corresponding types.
+BinaryColumn = namedtuple('BinaryColumn',
+    ['kinds', 'offsets', 'tags', 'numbers', 'stringIndices'])
+
+
+def loadBinaryColumns(openFile, fields=None):
+    """
+      Load the columns of a binary result info file without building the
+      result dictionaries. ``openFile`` can be an open file or a path.
+
+      Returns the tuple (<top level>, <num results>, <strings>, <columns>)
+      where <top level> is the result infos without ``results``, <strings>
+      is the string table and <columns> maps each field name (restricted to
+      ``fields`` if given) to a ``BinaryColumn``.
+
+      Will throw a ``ResultInfoBinaryError`` exception if the arrays of a
+      column do not have the expected types and shapes.
+    """
+    name = _getName(openFile)
+    _logger.debug('Loading binary result info columns from "{}"'.format(name))
+    columns = dict()
+    with _loadArchive(openFile) as archive:
+        meta, strings = _readMetaAndStrings(name, archive)
+        numResults = meta['num_results']
+        for field in meta['fields']:
+            if fields is not None and field not in fields:
+                continue
+            try:
+                columns[field] = _readColumn(archive, field, numResults, len(strings))
+            except KeyError as e:
+                raise ResultInfoBinaryError(
+                    '"{}": array missing for field "{}" ({})'.format(name, field, e))
+    return (_getTopLevel(meta), numResults, strings, columns)
+
+
+def _checkArray(field, suffix, array, dtypes, length, allowScalar=False):
+    if array.dtype not in dtypes:
+        raise ResultInfoBinaryError(
+            '"{}.{}" has type {} but expected one of {}'.format(
+                field, suffix, array.dtype, [ np.dtype(d).name for d in dtypes ]))
+    if allowScalar and array.ndim == 0:
+        return
+    if array.shape != (length,):
+        raise ResultInfoBinaryError(
+            '"{}.{}" has shape {} but expected ({},)'.format(
+                field, suffix, array.shape, length))
+
+
+def _readColumn(archive, field, numResults, numStrings):
+    """
+      Read the arrays of ``field`` from ``archive`` and check that they are
+      consistent with each other.
+    """
+    kinds = archive['{}.kinds'.format(field)]
+    _checkArray(field, 'kinds', kinds, (np.int8,), numResults, allowScalar=True)
+    kinds = _expand(kinds, numResults)
+    if np.any((kinds < _KIND_MISSING) | (kinds > _KIND_LIST)):
+        raise ResultInfoBinaryError('"{}.kinds" has invalid kinds'.format(field))
+    lengthName = '{}.length'.format(field)
+    if lengthName in archive:
+        length = archive[lengthName]
+        _checkArray(field, 'length', length, (np.int64,), 1, allowScalar=True)
+        if length.ndim != 0 or int(length) <= 0:
+            raise ResultInfoBinaryError(
+                '"{}.length" must be a single positive value'.format(field))
+        length = int(length)
+        offsets = np.arange(0, length * numResults + 1, length, dtype=np.int64)
+    else:
+        offsets = archive['{}.offsets'.format(field)]
+        _checkArray(field, 'offsets', offsets, (np.int64,), numResults + 1)
+        if offsets[0] != 0 or np.any(np.diff(offsets) < 0):
+            raise ResultInfoBinaryError('"{}.offsets" are not increasing'.format(field))
+    lengths = np.diff(offsets)
+    if (np.any(lengths[kinds == _KIND_MISSING] != 0) or
+            np.any(lengths[kinds == _KIND_SINGLE] != 1)):
+        raise ResultInfoBinaryError(
+            'Number of values of "{}" does not match its kinds'.format(field))
+    numValues = int(offsets[-1])
+    tags = archive['{}.tags'.format(field)]
+    _checkArray(field, 'tags', tags, (np.int8,), numValues, allowScalar=True)
+    tags = _expand(tags, numValues)
+    if np.any((tags < _TAG_NONE) | (tags > _TAG_JSON)):
+        raise ResultInfoBinaryError('"{}.tags" has invalid tags'.format(field))
+
+    numbersName = '{}.numbers'.format(field)
+    numbers = None
+    if numbersName in archive:
+        numbers = archive[numbersName]
+        _checkArray(field, 'numbers', numbers, (np.int64, np.float64), numValues)
+    elif np.any(np.isin(tags, (_TAG_BOOL, _TAG_INT, _TAG_FLOAT))):
+        raise ResultInfoBinaryError('"{}" is missing the numbers array'.format(numbersName))
+    stringsName = '{}.strings'.format(field)
+    stringIndices = None
+    isString = np.isin(tags, (_TAG_STR, _TAG_JSON))
+    if stringsName in archive:
+        stringIndices = archive[stringsName]
+        _checkArray(field, 'strings', stringIndices, (np.int32,), numValues)
+        used = stringIndices[isString]
+        if np.any((used < 0) | (used >= numStrings)):
+            raise ResultInfoBinaryError(
+                '"{}" has indices outside of the string table'.format(stringsName))
+    elif np.any(isString):
+        raise ResultInfoBinaryError('"{}" is missing the strings array'.format(stringsName))
+    return BinaryColumn(
+        kinds=kinds,
+        offsets=offsets,
+        tags=tags,
+        numbers=numbers,
+        stringIndices=stringIndices)
+
+
+def _getName(openFile):
+    if isinstance(openFile, str):
+        return openFile
+    return getattr(openFile, 'name', '<stream>')
+
+
+def _getBinaryStream(openFile):
+    """
+      Returns the binary stream of the open file ``openFile`` or ``None``
+      if there isn't one (e.g. ``io.StringIO``).
+    """
+    if isinstance(openFile, io.TextIOBase):
+        # Text files (e.g. ``sys.stdin``) wrap a binary stream
+        return getattr(openFile, 'buffer', None)
+    return openFile
+
+
+def _loadArchive(openFile):
+    if isinstance(openFile, str):
+        return np.load(openFile, allow_pickle=False)
+    stream = _getBinaryStream(openFile)
+    if stream is None:
+        raise ResultInfoBinaryError(
+            'Cannot read binary result infos from "{}"'.format(_getName(openFile)))
+    if not stream.seekable():
+        # Zip archives have to be read from a seekable file (e.g. not a pipe)
+        stream = io.BytesIO(stream.read())
+    return np.load(stream, allow_pickle=False)
+
+
+def _readMetaAndStrings(name, archive):
+    try:
+        meta = json.loads(archive['__meta__'].tobytes().decode('utf-8'))
+        strings = archive['__strings__'].tobytes().decode('utf-8').split('\0')
+    except (KeyError, ValueError):
+        raise ResultInfoBinaryError(
+            '"{}" is not a binary result info file'.format(name))
+    if not isinstance(meta, dict) or meta.get('format', None) != FORMAT_NAME:
+        raise ResultInfoBinaryError(
+            '"{}" is not a binary result info file'.format(name))
+    if meta.get('format_version', None) != FORMAT_VERSION:
+        raise ResultInfoBinaryError(
+            'Unsupported binary result info format version {}'.format(
+                meta.get('format_version', None)))
+    numResults = meta.get('num_results', None)
+    if not isinstance(numResults, int) or numResults < 0:
+        raise ResultInfoBinaryError('"{}" has an invalid number of results'.format(name))
+    fields = meta.get('fields', None)
+    if not isinstance(fields, list) or not all(isinstance(f, str) for f in fields):
+        raise ResultInfoBinaryError('"{}" has invalid field names'.format(name))
+    return (meta, strings)
+
+
+def _getTopLevel(meta):
+    return {
+        key: value for key, value in meta.items()
+        if key not in ('format', 'format_version', 'fields', 'num_results')
+    }
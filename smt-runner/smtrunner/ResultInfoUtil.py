@@ -12,6 +12,16 @@ def get_result_info_key(ri):
 def get_result_info_wd(ri):
     return ri['working_directory']
 
+def get_default_names(path):
+    """
+    Returns the tuple (<solver>, <benchmark_set>) for the result info file
+    at `path` using the `<benchmark_set>/<solver>/<file>` layout of
+    `data/experiments`.
+    """
+    solver_dir = os.path.dirname(os.path.abspath(path))
+    return (os.path.basename(solver_dir),
+            os.path.basename(os.path.dirname(solver_dir)))
+
 def group_result_infos_by(result_infos_list, key_fn=get_result_info_key):
     """
     Given a list of raw `ResultInfos` group them by `key_fn`. `key_fn` should be a
@@ -275,6 +285,8 @@ def merge_raw_results(lorr, new_wd_base, wd_bases):
         'jfs_stat_num_inputs',
         'jfs_stat_num_wrong_sized_inputs',
         'libfuzzer_average_exec_per_sec',
+        'peak_rss_mib',
+        'portfolio_winner',
     }
     for field in agg_fields_to_add_if_available:
         if not field_is_available(field, lorr):
@@ -0,0 +1,531 @@
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Columnar in-memory representation of a result info file.
+
+Raw result infos are lists of dictionaries where merged results store
+per-run fields (e.g. `wallclock_time`) as lists. A `ResultTable` stores
+each field as a NumPy array instead so that analyses can be done without
+walking the dictionaries.
+
+* Numeric fields are `float64` arrays of shape `(num_rows, num_runs)` with
+  `NaN` for missing values.
+* Boolean fields are `int8` arrays of shape `(num_rows, num_runs)` with
+  `-1` for missing values.
+* String fields (e.g. `sat`, `event_tag`) are dictionary encoded as
+  `int32` code arrays with `-1` for missing values. Per-run fields have
+  shape `(num_rows, num_runs)`, per-row fields (`benchmark`,
+  `expected_sat`) have shape `(num_rows,)`.
+
+A result info that is not merged has `num_runs == 1`.
+
+Tables can be built from YAML or binary (see `ResultInfoBinary`) result
+info files. Building from a binary file is done directly from its columns
+without creating the result dictionaries.
+"""
+import logging
+import numpy as np
+from . import ResultInfo
+from . import ResultInfoBinary
+from . import analysis
+
+_logger = logging.getLogger(__name__)
+
+NUMERIC_FIELDS = (
+    'dsoes_wallclock_time',
+    'exit_code',
+    'jfs_stat_fuzzing_wallclock_time',
+    'jfs_stat_num_inputs',
+    'jfs_stat_num_wrong_sized_inputs',
+    'libfuzzer_average_exec_per_sec',
+    'peak_rss_mib',
+    'sys_cpu_time',
+    'user_cpu_time',
+    'wallclock_time',
+)
+
+BOOL_FIELDS = (
+    'backend_timeout',
+    'out_of_memory',
+)
+
+CATEGORICAL_FIELDS = (
+    'event_tag',
+    'sat',
+)
+
+PER_ROW_CATEGORICAL_FIELDS = (
+    'benchmark',
+    'expected_sat',
+)
+
+MISSING_CODE = -1
+
+class ResultTableError(Exception):
+    pass
+
+def _binary_numbers(column, tags):
+    """
+        Returns the values of the binary `column` as float64 with `NaN`
+        for values that aren't one of `tags`.
+    """
+    if column.numbers is None:
+        return np.full(len(column.tags), np.nan)
+    values = column.numbers.astype(np.float64)
+    values[~np.isin(column.tags, tags)] = np.nan
+    return values
+
+def _binary_string_codes(column, strings, keep):
+    """
+        Returns the tuple (<codes>, <categories>) that dictionary encodes
+        the string values of the binary `column`. Codes are assigned in
+        order of first occurrence. Values of results that are not in
+        `keep` (a boolean array with an entry per result) are given
+        `MISSING_CODE` so that they don't get a category.
+    """
+    if column.stringIndices is None:
+        return (np.full(len(column.tags), MISSING_CODE, dtype=np.int32), [])
+    keep_values = np.repeat(keep, np.diff(column.offsets))
+    indices = np.where(
+        (column.tags == ResultInfoBinary._TAG_STR) & keep_values,
+        column.stringIndices, -1)
+    valid = indices >= 0
+    unique_indices, first = np.unique(indices[valid], return_index=True)
+    order = np.argsort(first, kind='stable')
+    code_of_unique = np.empty(len(unique_indices), dtype=np.int32)
+    code_of_unique[order] = np.arange(len(unique_indices), dtype=np.int32)
+    codes = np.full(len(indices), MISSING_CODE, dtype=np.int32)
+    codes[valid] = code_of_unique[np.searchsorted(unique_indices, indices[valid])]
+    categories = [ strings[i] for i in unique_indices[order].tolist() ]
+    return (codes, categories)
+
+def _binary_to_runs(column, values, num_runs, fill):
+    """
+        Returns a `(num_results, num_runs)` array of the per value `values`
+        of the binary `column`. Single values are used for every run.
+    """
+    num_results = len(column.kinds)
+    out = np.full((num_results, num_runs), fill, dtype=values.dtype)
+    lengths = np.diff(column.offsets)
+    value_rows = np.repeat(np.arange(num_results), lengths)
+    value_runs = np.arange(len(value_rows)) - column.offsets[value_rows]
+    is_list = column.kinds[value_rows] == ResultInfoBinary._KIND_LIST
+    if np.any(value_runs[is_list] >= num_runs):
+        raise ResultTableError('Field has more values than there are runs')
+    out[value_rows[is_list], value_runs[is_list]] = values[is_list]
+    single = np.flatnonzero(column.kinds == ResultInfoBinary._KIND_SINGLE)
+    out[single, :] = values[column.offsets[single]][:, np.newaxis]
+    return out
+
+def _read_only(array):
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+def _run_values(r, field, num_runs):
+    """
+        Returns the list of values of `field` in `r` with one entry per run.
+    """
+    value = r.get(field, None)
+    if isinstance(value, list):
+        return value
+    # Not merged or a field that wasn't merged so use the value for
+    # every run.
+    return [value] * num_runs
+
+class ResultTable:
+    def __init__(self, num_runs, numeric, bools, categorical, categories,
+                 schema_version, misc):
+        self._num_runs = num_runs
+        self._numeric = numeric
+        self._bools = bools
+        self._categorical = categorical
+        self._categories = categories
+        self._schema_version = schema_version
+        self._misc = misc
+        self._category_to_code = {
+            name: { c: code for code, c in enumerate(values) }
+            for name, values in self._categories.items()
+        }
+        self._num_rows = len(self._categorical['benchmark'])
+
+    @classmethod
+    def from_raw_result_infos(cls, result_infos):
+        """
+            Build a `ResultTable` from raw result infos (i.e. as returned
+            by `ResultInfo.loadRawResultInfos()`). Error results are
+            skipped.
+        """
+        assert isinstance(result_infos, dict)
+        results = []
+        for r in result_infos['results']:
+            if 'error' in r:
+                _logger.warning('Skipping error result for "{}"'.format(
+                    r.get('working_directory', None)))
+                continue
+            results.append(r)
+        num_rows = len(results)
+
+        num_runs = 1
+        for r in results:
+            if analysis.is_merged_result_info(r):
+                num_runs = max(num_runs, len(r['sat']))
+
+        numeric = dict()
+        bools = dict()
+        categorical = dict()
+        categories = dict()
+        for field in NUMERIC_FIELDS:
+            if not any(field in r for r in results):
+                continue
+            column = np.full((num_rows, num_runs), np.nan, dtype=np.float64)
+            for row, r in enumerate(results):
+                values = _run_values(r, field, num_runs)
+                column[row, :len(values)] = [
+                    np.nan if v is None else v for v in values]
+            numeric[field] = column
+        for field in BOOL_FIELDS:
+            if not any(field in r for r in results):
+                continue
+            column = np.full((num_rows, num_runs), -1, dtype=np.int8)
+            for row, r in enumerate(results):
+                values = _run_values(r, field, num_runs)
+                column[row, :len(values)] = [
+                    -1 if v is None else int(v) for v in values]
+            bools[field] = column
+        for field in CATEGORICAL_FIELDS + PER_ROW_CATEGORICAL_FIELDS:
+            if not any(field in r for r in results):
+                continue
+            category_to_code = dict()
+            per_row = field in PER_ROW_CATEGORICAL_FIELDS
+            if per_row:
+                column = np.full(num_rows, MISSING_CODE, dtype=np.int32)
+            else:
+                column = np.full((num_rows, num_runs), MISSING_CODE, dtype=np.int32)
+            for row, r in enumerate(results):
+                if per_row:
+                    values = [r.get(field, None)]
+                    if isinstance(values[0], list):
+                        raise ResultTableError(
+                            'Expected a single value for "{}" of "{}"'.format(
+                                field, r['benchmark']))
+                else:
+                    values = _run_values(r, field, num_runs)
+                codes = []
+                for v in values:
+                    if v is None:
+                        codes.append(MISSING_CODE)
+                        continue
+                    try:
+                        codes.append(category_to_code[v])
+                    except KeyError:
+                        code = len(category_to_code)
+                        category_to_code[v] = code
+                        codes.append(code)
+                if per_row:
+                    column[row] = codes[0]
+                else:
+                    column[row, :len(codes)] = codes
+            categorical[field] = column
+            categories[field] = sorted(category_to_code, key=category_to_code.get)
+        if 'benchmark' not in categorical:
+            categorical['benchmark'] = np.zeros(0, dtype=np.int32)
+            categories['benchmark'] = []
+        if len(categories['benchmark']) != num_rows:
+            raise ResultTableError('Benchmarks are not unique')
+        return cls(
+            num_runs,
+            numeric,
+            bools,
+            categorical,
+            categories,
+            result_infos.get('schema_version', None),
+            result_infos.get('misc', None))
+
+    @classmethod
+    def from_binary_file(cls, openFile):
+        """
+            Build a `ResultTable` from a binary result info file. The file
+            is validated but the result dictionaries are never built. Error
+            results are skipped.
+        """
+        wanted_fields = set(NUMERIC_FIELDS + BOOL_FIELDS + CATEGORICAL_FIELDS +
+                            PER_ROW_CATEGORICAL_FIELDS + ('error',))
+        top_level, num_results, strings, columns = (
+            ResultInfo.loadResultInfoColumns(openFile, wanted_fields))
+        keep = np.ones(num_results, dtype=bool)
+        if 'error' in columns:
+            keep = columns['error'].kinds == ResultInfoBinary._KIND_MISSING
+            if not np.all(keep):
+                _logger.warning('Skipping {} error results'.format(
+                    np.count_nonzero(~keep)))
+
+        num_runs = 1
+        if 'sat' in columns:
+            sat = columns['sat']
+            is_list = (sat.kinds == ResultInfoBinary._KIND_LIST) & keep
+            if np.any(is_list):
+                num_runs = max(1, int(np.max(np.diff(sat.offsets)[is_list])))
+
+        numeric_tags = [ ResultInfoBinary._TAG_BOOL, ResultInfoBinary._TAG_INT,
+                         ResultInfoBinary._TAG_FLOAT ]
+        numeric = dict()
+        bools = dict()
+        categorical = dict()
+        categories = dict()
+        for field in NUMERIC_FIELDS:
+            if field not in columns:
+                continue
+            column = columns[field]
+            values = _binary_numbers(column, numeric_tags)
+            numeric[field] = _binary_to_runs(column, values, num_runs, np.nan)[keep]
+        for field in BOOL_FIELDS:
+            if field not in columns:
+                continue
+            column = columns[field]
+            values = _binary_numbers(column, numeric_tags[:2])
+            values = np.where(np.isnan(values), -1, values).astype(np.int8)
+            bools[field] = _binary_to_runs(column, values, num_runs, -1)[keep]
+        for field in CATEGORICAL_FIELDS + PER_ROW_CATEGORICAL_FIELDS:
+            if field not in columns:
+                continue
+            column = columns[field]
+            codes, categories[field] = _binary_string_codes(column, strings, keep)
+            if field in PER_ROW_CATEGORICAL_FIELDS:
+                if np.any(column.kinds == ResultInfoBinary._KIND_LIST):
+                    raise ResultTableError(
+                        'Expected a single value for "{}"'.format(field))
+                row_codes = np.full(num_results, MISSING_CODE, dtype=np.int32)
+                single = np.flatnonzero(column.kinds == ResultInfoBinary._KIND_SINGLE)
+                row_codes[single] = codes[column.offsets[single]]
+                categorical[field] = row_codes[keep]
+            else:
+                categorical[field] = _binary_to_runs(
+                    column, codes, num_runs, MISSING_CODE)[keep]
+        if 'benchmark' not in categorical:
+            categorical['benchmark'] = np.zeros(0, dtype=np.int32)
+            categories['benchmark'] = []
+        if len(categories['benchmark']) != len(categorical['benchmark']):
+            raise ResultTableError('Benchmarks are not unique')
+        return cls(
+            num_runs,
+            numeric,
+            bools,
+            categorical,
+            categories,
+            top_level.get('schema_version', None),
+            top_level.get('misc', None))
+
+    @property
+    def num_rows(self):
+        return self._num_rows
+
+    @property
+    def num_runs(self):
+        return self._num_runs
+
+    @property
+    def schema_version(self):
+        return self._schema_version
+
+    @property
+    def misc(self):
+        return self._misc
+
+    @property
+    def fields(self):
+        return sorted(
+            list(self._numeric) + list(self._bools) + list(self._categorical))
+
+    def has_field(self, name):
+        return (name in self._numeric or name in self._bools or
+                name in self._categorical)
+
+    def numeric(self, name):
+        """
+            Returns a read-only view of the `(num_rows, num_runs)` float
+            array for numeric field `name`.
+        """
+        try:
+            return _read_only(self._numeric[name])
+        except KeyError:
+            raise ResultTableError('No numeric field "{}"'.format(name))
+
+    def bools(self, name):
+        """
+            Returns a read-only view of the `(num_rows, num_runs)` int8
+            array for boolean field `name`.
+        """
+        try:
+            return _read_only(self._bools[name])
+        except KeyError:
+            raise ResultTableError('No boolean field "{}"'.format(name))
+
+    def codes(self, name):
+        """
+            Returns a read-only view of the code array for string field
+            `name`.
+        """
+        try:
+            return _read_only(self._categorical[name])
+        except KeyError:
+            raise ResultTableError('No string field "{}"'.format(name))
+
+    def categories(self, name):
+        """
+            Returns the list of strings for string field `name` indexed
+            by code.
+        """
+        try:
+            return list(self._categories[name])
+        except KeyError:
+            raise ResultTableError('No string field "{}"'.format(name))
+
+    def code_of(self, name, value):
+        """
+            Returns the code of `value` in string field `name` or
+            `MISSING_CODE` if `value` never occurs.
+        """
+        try:
+            category_to_code = self._category_to_code[name]
+        except KeyError:
+            raise ResultTableError('No string field "{}"'.format(name))
+        return category_to_code.get(value, MISSING_CODE)
+
+    def equals(self, name, value):
+        """
+            Returns a boolean array that is `True` where string field
+            `name` is `value`.
+        """
+        code = self.code_of(name, value)
+        codes = self._categorical[name]
+        if code == MISSING_CODE:
+            return np.zeros(codes.shape, dtype=bool)
+        return codes == code
+
+    def decode(self, name, codes):
+        """
+            Returns a list of the strings (or `None` for missing) for the
+            1D array `codes` of string field `name`.
+        """
+        values = self._categories[name]
+        return [ None if c == MISSING_CODE else values[c] for c in codes ]
+
+    @property
+    def benchmarks(self):
+        """
+            Returns the list of benchmark names in row order.
+        """
+        return self.decode('benchmark', self._categorical['benchmark'])
+
+    def row_of(self, benchmark):
+        """
+            Returns the row index of `benchmark` or `None`.
+        """
+        code = self.code_of('benchmark', benchmark)
+        if code == MISSING_CODE:
+            return None
+        return int(np.flatnonzero(self._categorical['benchmark'] == code)[0])
+
+    def join_rows(self, other):
+        """
+            Returns a tuple of arrays (<self_rows>, <other_rows>) with the
+            row indices of the benchmarks present in both `self` and
+            `other`, in row order of `self`.
+        """
+        assert isinstance(other, ResultTable)
+        self_rows = []
+        other_rows = []
+        other_benchmark_to_code = other._category_to_code['benchmark']
+        other_code_to_row = np.empty(other.num_rows, dtype=np.int64)
+        other_code_to_row[other._categorical['benchmark']] = np.arange(other.num_rows)
+        for row, benchmark in enumerate(self.benchmarks):
+            code = other_benchmark_to_code.get(benchmark, None)
+            if code is None:
+                continue
+            self_rows.append(row)
+            other_rows.append(other_code_to_row[code])
+        return (np.array(self_rows, dtype=np.int64),
+                np.array(other_rows, dtype=np.int64))
+
+    def take(self, rows):
+        """
+            Returns a new `ResultTable` containing only `rows` (an array of
+            row indices or a boolean mask).
+        """
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        categorical = { name: column[rows]
+                        for name, column in self._categorical.items() }
+        # Re-encode benchmarks so that codes are still row indices.
+        benchmarks = self.decode('benchmark', categorical['benchmark'])
+        categorical['benchmark'] = np.arange(len(rows), dtype=np.int32)
+        categories = dict(self._categories)
+        categories['benchmark'] = benchmarks
+        return ResultTable(
+            self._num_runs,
+            { name: column[rows] for name, column in self._numeric.items() },
+            { name: column[rows] for name, column in self._bools.items() },
+            categorical,
+            categories,
+            self._schema_version,
+            self._misc)
+
+    def get_exec_times(self, time_prefs=('usr_sys_sum', 'dsoes_wallclock', 'wallclock')):
+        """
+            Returns a `(num_rows, num_runs)` array of execution times.
+
+            Like `analysis.get_exec_time_with_bounds()` the first clock in
+            `time_prefs` for which every run of a row has a value is used
+            for that row. Runs that do not exist (merged results with fewer
+            runs) are `NaN`.
+        """
+        assert len(time_prefs) > 0
+        times = np.full((self._num_rows, self._num_runs), np.nan)
+        done = np.zeros(self._num_rows, dtype=bool)
+        # Runs that exist for each row. Every result has a `wallclock_time`.
+        exists = ~np.isnan(self._numeric['wallclock_time'])
+        for clock_type in time_prefs:
+            if clock_type == 'usr_sys_sum':
+                if ('user_cpu_time' not in self._numeric or
+                        'sys_cpu_time' not in self._numeric):
+                    continue
+                clock = self._numeric['user_cpu_time'] + self._numeric['sys_cpu_time']
+            elif clock_type == 'dsoes_wallclock':
+                if 'dsoes_wallclock_time' not in self._numeric:
+                    continue
+                clock = self._numeric['dsoes_wallclock_time']
+            elif clock_type == 'wallclock':
+                clock = self._numeric['wallclock_time']
+            else:
+                raise Exception('Unsupported clock type: {}'.format(clock_type))
+            usable = ~done & np.all(~np.isnan(clock) | ~exists, axis=1)
+            times[usable] = clock[usable]
+            done |= usable
+        if not np.all(done):
+            rows = np.flatnonzero(~done)
+            raise ResultTableError('Failed to compute execution time for {}'.format(
+                self.decode('benchmark', self._categorical['benchmark'][rows])))
+        times[~exists] = np.nan
+        return times
+
+    @property
+    def nbytes(self):
+        """
+            Total size in bytes of the arrays in the table.
+        """
+        return sum(column.nbytes for columns in (
+            self._numeric, self._bools, self._categorical)
+            for column in columns.values())
+
+def load(openFile, auto_upgrade=True):
+    """
+        Load a YAML or binary result info file into a `ResultTable`.
+        Callers that only need columns should use this rather than
+        building the table from raw result infos so that binary files are
+        loaded without building the result dictionaries.
+    """
+    if ResultInfoBinary.isBinaryResultInfoFile(openFile):
+        return ResultTable.from_binary_file(openFile)
+    result_infos = ResultInfo.loadRawResultInfos(openFile, auto_upgrade)
+    return ResultTable.from_raw_result_infos(result_infos)
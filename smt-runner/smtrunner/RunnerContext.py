@@ -9,18 +9,28 @@ _logger = logging.getLogger(__name__)
 
 
 class RunnerContext:
-    def __init__(self, num_parallel_jobs):
+    def __init__(self, num_parallel_jobs, working_dirs_root=None):
         self._context_global_objects = dict()
         self._num_parallel_jobs = num_parallel_jobs
+        self._working_dirs_root = working_dirs_root
         self._lock = threading.Lock()
         assert isinstance(self._num_parallel_jobs, int)
         assert self._num_parallel_jobs > 0
+        assert self._working_dirs_root is None or os.path.isabs(self._working_dirs_root)
         pass
 
     @property
     def num_parallel_jobs(self):
         return self._num_parallel_jobs
 
+    @property
+    def working_dirs_root(self):
+        """
+            Absolute path of the directory that the working directories of
+            all runners are in or `None` if not known.
+        """
+        return self._working_dirs_root
+
     def get_object(self, name):
         with self._lock:
             if name in self._context_global_objects:
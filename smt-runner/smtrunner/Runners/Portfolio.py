@@ -0,0 +1,297 @@
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Runner that races several solvers on the same benchmark.
+
+Every member of the portfolio is a runner of its own (with its own
+``runner_config`` and so its own backend) that runs in a sub-directory of
+the portfolio's working directory. The first member to report ``sat`` or
+``unsat`` wins and the remaining members are killed.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import traceback
+from .. import RunnerContext
+from .. import RunnerFactory
+from .. import solver_output
+from . RunnerBase import RunnerBaseClass, RunnerBaseException
+
+_logger = logging.getLogger(__name__)
+
+# Fields of the invocation info that are not repeated in the results of
+# each member.
+_INVOCATION_INFO_FIELDS = ('benchmark', 'expected_sat', 'is_trivial')
+
+
+class PortfolioRunnerException(RunnerBaseException):
+    pass
+
+
+class PortfolioMember:
+    def __init__(self, name, runnerName, runner):
+        self.name = name
+        self.runnerName = runnerName
+        self.runner = runner
+        self.thread = None
+        self.started = False
+        self.finished = False
+        self.finishTime = None
+        self.killed = False
+        self.error = None
+        self.sat = 'unknown'
+
+    @property
+    def backendResult(self):
+        # pylint: disable=protected-access
+        return self.runner._backendResult
+
+    @property
+    def isDefinitive(self):
+        """
+        True if the member finished without problems and reported `sat`
+        or `unsat`.
+        """
+        if self.error is not None or self.backendResult is None:
+            return False
+        if self.backendResult.outOfTime or self.backendResult.outOfMemory:
+            return False
+        return self.sat in ('sat', 'unsat')
+
+    def getResults(self):
+        results = {
+            'name': self.name,
+            'runner': self.runnerName,
+            'killed': self.killed,
+        }
+        if self.error is not None:
+            results['error'] = self.error
+        if self.backendResult is not None:
+            for key, value in self.runner.getResults().items():
+                if key in _INVOCATION_INFO_FIELDS:
+                    continue
+                results[key] = value
+            results['sat'] = self.sat
+        return results
+
+
+class PortfolioRunner(RunnerBaseClass):
+    """
+    Runner configured by a list of ``members`` in its ``runner_config``.
+    Each member is a dictionary with a unique ``name``, the name of the
+    ``runner`` to use and an optional ``runner_config``. The
+    ``runner_config`` of a member is the portfolio's ``runner_config``
+    (without ``members``) updated with the member's ``runner_config`` so
+    options like ``max_time`` and ``backend`` can be shared.
+
+    Note the limits (e.g. ``max_memory``) apply to each member so the
+    portfolio as a whole can use several times as much.
+    """
+    def __init__(self, invocationInfo, workingDirectory, rc, ctx):
+        # pylint: disable=super-init-not-called
+        # The portfolio runs no tool of its own so it has no tool or backend
+        # to set up.
+        _logger.debug('Initialising {}'.format(invocationInfo['benchmark']))
+        with RunnerBaseClass._initLock:
+            self.uid = RunnerBaseClass.staticCounter
+            RunnerBaseClass.staticCounter += 1
+        self._backendResult = None
+        self._invocationInfo = invocationInfo
+        self._ctx = ctx
+        assert isinstance(self._ctx, RunnerContext.RunnerContext)
+        self._setupBasePaths(rc)
+        self._checkProgramPath()
+        self._setupWorkingDirectory(workingDirectory)
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._winner = None
+        self._startTime = None
+        self._endTime = None
+        self._setupMembers(rc)
+
+    def _getMemberContext(self):
+        """
+        Members share a context that allows for every member of every
+        portfolio running in parallel (e.g. so that resource pinning
+        has enough CPUs for all of them).
+        """
+        numParallelJobs = self._ctx.num_parallel_jobs * self._numMembers
+        memberCtx, success = self._ctx.get_object('PortfolioRunner.MemberContext')
+        if not success:
+            self._ctx.add_object(
+                'PortfolioRunner.MemberContext',
+                RunnerContext.RunnerContext(
+                    num_parallel_jobs=numParallelJobs,
+                    working_dirs_root=self._ctx.working_dirs_root))
+            # Handle race. If someone managed to make a context before we
+            # did use theirs instead.
+            memberCtx, success = self._ctx.get_object('PortfolioRunner.MemberContext')
+            assert success
+        if memberCtx.num_parallel_jobs != numParallelJobs:
+            raise PortfolioRunnerException(
+                'Portfolios running in parallel must have the same number of members')
+        return memberCtx
+
+    def _setupMembers(self, rc):
+        if not 'members' in rc:
+            raise PortfolioRunnerException('"members" missing from "runner_config"')
+        if not isinstance(rc['members'], list) or len(rc['members']) < 2:
+            raise PortfolioRunnerException(
+                '"members" must be a list with at least two members')
+        self._numMembers = len(rc['members'])
+        sharedRc = { key: value for key, value in rc.items() if key != 'members' }
+        memberCtx = self._getMemberContext()
+        self._members = []
+        names = set()
+        for memberConfig in rc['members']:
+            if not isinstance(memberConfig, dict):
+                raise PortfolioRunnerException('Each member must be a dictionary')
+            name = memberConfig.get('name', None)
+            if not isinstance(name, str) or name == '' or os.sep in name:
+                raise PortfolioRunnerException(
+                    'Member "name" must be a non empty string without "{}"'.format(os.sep))
+            if name in names:
+                raise PortfolioRunnerException(
+                    'Member name "{}" is used more than once'.format(name))
+            names.add(name)
+            runnerName = memberConfig.get('runner', None)
+            if not isinstance(runnerName, str):
+                raise PortfolioRunnerException(
+                    'Member "{}" must have a "runner" string'.format(name))
+            memberRc = sharedRc.copy()
+            memberRunnerConfig = memberConfig.get('runner_config', {})
+            if not isinstance(memberRunnerConfig, dict):
+                raise PortfolioRunnerException(
+                    '"runner_config" of member "{}" must map to a dictionary'.format(name))
+            memberRc.update(memberRunnerConfig)
+            memberWorkingDirectory = os.path.join(self.workingDirectory, name)
+            os.mkdir(memberWorkingDirectory)
+            RunnerClass = RunnerFactory.getRunnerClass(runnerName)
+            runner = RunnerClass(self._invocationInfo, memberWorkingDirectory, memberRc,
+                                 memberCtx)
+            self._members.append(PortfolioMember(name, runnerName, runner))
+
+    @property
+    def name(self):
+        return "Portfolio"
+
+    @property
+    def programPathArgument(self):
+        return self.program
+
+    @property
+    def winner(self):
+        return self._winner
+
+    def _runMember(self, member, doneQueue):
+        try:
+            with self._lock:
+                if self._cancelled.is_set():
+                    return
+                member.started = True
+            member.runner.run()
+            if member.backendResult is not None:
+                member.sat = solver_output.get_sat(member.runner.stdoutLogFile)[0]
+        except Exception: # pylint: disable=broad-except
+            member.error = traceback.format_exc()
+        finally:
+            member.finishTime = time.perf_counter()
+            member.killed = self._cancelled.is_set()
+            doneQueue.put(member)
+
+    def _killMembers(self):
+        for member in self._members:
+            if member.started and not member.finished:
+                member.runner.kill()
+
+    def run(self):
+        self._startTime = time.perf_counter()
+        doneQueue = queue.Queue()
+        for member in self._members:
+            member.thread = threading.Thread(
+                target=self._runMember,
+                args=(member, doneQueue),
+                name='{}-{}'.format(self.uid, member.name))
+            member.thread.start()
+        numFinished = 0
+        while numFinished < len(self._members):
+            try:
+                member = doneQueue.get(timeout=0.1)
+            except queue.Empty:
+                if self._cancelled.is_set():
+                    # Members that were still starting when they were
+                    # killed might have launched their tool since.
+                    self._killMembers()
+                continue
+            numFinished += 1
+            member.finished = True
+            if member.error is not None and not member.killed:
+                _logger.error('Member "{}" hit exception:\n{}'.format(
+                    member.name, member.error))
+            if self._winner is None and member.isDefinitive:
+                self._winner = member
+                _logger.info('Member "{}" answered {} for "{}" after {:.3f}s'.format(
+                    member.name, member.sat, self.InvocationInfo['benchmark'],
+                    member.finishTime - self._startTime))
+                self._cancelled.set()
+                self._killMembers()
+        for member in self._members:
+            member.thread.join()
+        self._endTime = time.perf_counter()
+        if self._winner is None:
+            _logger.info('No member answered for "{}"'.format(
+                self.InvocationInfo['benchmark']))
+        if all(member.backendResult is None for member in self._members):
+            raise PortfolioRunnerException(
+                'No member of the portfolio ran on "{}"'.format(
+                    self.InvocationInfo['benchmark']))
+
+    def kill(self, pause=0.0):
+        _logger.debug('Trying to kill {}'.format(self.name))
+        with self._lock:
+            self._cancelled.set()
+        self._killMembers()
+
+    def _getSummedField(self, field):
+        values = [ getattr(member.backendResult, field) for member in self._members
+                   if member.backendResult is not None ]
+        if any(value is None for value in values):
+            return None
+        return sum(values)
+
+    def getResults(self):
+        results = self.InvocationInfo.copy()
+        assert isinstance(results, dict)
+        ranMembers = [ member for member in self._members if member.backendResult is not None ]
+        reportedMember = self._winner
+        if reportedMember is None:
+            wallclockTime = self._endTime - self._startTime
+            reportedMember = ranMembers[0]
+            results['sat'] = 'unknown'
+            results['exit_code'] = None
+            results['backend_timeout'] = any(
+                member.backendResult.outOfTime for member in ranMembers)
+            results['out_of_memory'] = not results['backend_timeout'] and any(
+                member.backendResult.outOfMemory for member in ranMembers)
+            results['portfolio_winner'] = None
+        else:
+            wallclockTime = reportedMember.finishTime - self._startTime
+            results['sat'] = reportedMember.sat
+            results['exit_code'] = reportedMember.backendResult.exitCode
+            results['backend_timeout'] = False
+            results['out_of_memory'] = False
+            results['portfolio_winner'] = reportedMember.name
+        results['wallclock_time'] = wallclockTime
+        results['working_directory'] = self.stripBasePath(self.workingDirectory)
+        results['stdout_log_file'] = self.stripBasePath(reportedMember.runner.stdoutLogFile)
+        results['stderr_log_file'] = self.stripBasePath(reportedMember.runner.stderrLogFile)
+        # Resources used by all members together
+        results['user_cpu_time'] = self._getSummedField('userCpuTime')
+        results['sys_cpu_time'] = self._getSummedField('sysCpuTime')
+        results['peak_rss_mib'] = self._getSummedField('peakMemoryInMiB')
+        results['portfolio_members'] = [ member.getResults() for member in self._members ]
+        return results
+
+def get():
+    return PortfolioRunner
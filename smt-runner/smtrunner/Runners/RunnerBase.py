@@ -285,6 +285,7 @@ class RunnerBaseClass(metaclass=abc.ABCMeta):
         results['stderr_log_file'] = self.stripBasePath(self.stderrLogFile)
         results['user_cpu_time'] = self._backendResult.userCpuTime
         results['sys_cpu_time'] = self._backendResult.sysCpuTime
+        results['peak_rss_mib'] = self._backendResult.peakMemoryInMiB
         results['backend_timeout'] = self._backendResult.outOfTime
         # TODO: Set sat field and copy other fields over
         return results
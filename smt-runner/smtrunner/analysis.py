@@ -2,6 +2,7 @@
 import copy
 import logging
 import math
+import numpy as np
 import pprint
 import statistics
 
@@ -68,13 +69,18 @@ def get_arithmetic_mean_and_confidence_intervals(values, confidence_interval_fac
     upper_bound = mean + (standard_error_in_mean * confidence_interval_factor)
     return (lower_bound, mean , upper_bound)   # comp time info   add by yx
 
+# 95 % confidence
+CONFIDENCE_INTERVAL_FACTOR_95 = 1.96
+# 99.9 % confidence
+CONFIDENCE_INTERVAL_FACTOR_99 = 3.27
+
 def get_arithmetic_mean_and_95_confidence_intervals(values):
-    # 95 % confidence
-    return get_arithmetic_mean_and_confidence_intervals(values, 1.96)
+    return get_arithmetic_mean_and_confidence_intervals(
+        values, CONFIDENCE_INTERVAL_FACTOR_95)
 
 def get_arithmetic_mean_and_99_confidence_intervals(values):
-    # 99.9 % confidence
-    return get_arithmetic_mean_and_confidence_intervals(values, 3.27)
+    return get_arithmetic_mean_and_confidence_intervals(
+        values, CONFIDENCE_INTERVAL_FACTOR_99)
 
 def is_valid_bound(bounds):
     lower, mid, upper = bounds
@@ -288,6 +294,214 @@ def rank_by_execution_time(index_to_result_info, indices_to_use, max_time, bound
 
     return indices_sorted_and_grouped_by_exec_time, bound_groups
 
+def get_exec_time_values(r, time_prefs=['usr_sys_sum', 'dsoes_wallclock', 'wallclock']):
+    """
+    Returns the list of execution times (one per run) of `r` using the
+    first clock in `time_prefs` that `get_exec_time_with_bounds()` would
+    use.
+    """
+    if not is_merged_result_info(r):
+        r = { field: [r[field]] for field in
+              ['benchmark', 'wallclock_time', 'dsoes_wallclock_time', 'user_cpu_time', 'sys_cpu_time']
+              if field in r }
+    assert len(time_prefs) > 0
+    for clock_type in time_prefs:
+        if clock_type == 'usr_sys_sum':
+            user_cpu_time = r['user_cpu_time']
+            sys_cpu_time = r['sys_cpu_time']
+            if all(v is not None for v in user_cpu_time + sys_cpu_time):
+                return [ u + s for u, s in zip(user_cpu_time, sys_cpu_time) ]
+        elif clock_type == 'dsoes_wallclock':
+            dsoes_wallclock_time = r['dsoes_wallclock_time']
+            if all(v is not None for v in dsoes_wallclock_time):
+                return list(dsoes_wallclock_time)
+        elif clock_type == 'wallclock':
+            return list(r['wallclock_time'])
+        else:
+            raise Exception('Unsupported clock type: {}'.format(clock_type))
+    raise Exception('Failed to compute execution time for "{}"'.format(
+        r.get('benchmark', None)))
+
+def _get_means_and_standard_errors(times):
+    times = np.asarray(times, dtype=np.float64)
+    n = np.sum(~np.isnan(times), axis=-1)
+    # Work relative to the first run so that runs with identical times
+    # give exactly that time as the mean.
+    first = times[..., 0]
+    deltas = times - first[..., np.newaxis]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_delta = np.nansum(deltas, axis=-1) / n
+        mean = first + mean_delta
+        variance = np.nansum(
+            (deltas - mean_delta[..., np.newaxis]) ** 2, axis=-1) / (n - 1)
+        standard_error_in_mean = np.sqrt(variance / n)
+    standard_error_in_mean = np.where(n > 1, standard_error_in_mean, 0.0)
+    return (mean, standard_error_in_mean)
+
+def get_arithmetic_means_and_confidence_intervals(times, confidence_interval_factor):
+    """
+    Batched version of `get_arithmetic_mean_and_confidence_intervals()`.
+
+    `times` is an array whose last axis holds the runs. Missing runs are
+    `NaN` and must come after the runs that exist. Returns the tuple
+    `(lower, mean, upper)` of arrays with the last axis removed. A single
+    run gives a zero width interval.
+    """
+    assert confidence_interval_factor > 0
+    mean, standard_error_in_mean = _get_means_and_standard_errors(times)
+    lower = mean - (standard_error_in_mean * confidence_interval_factor)
+    upper = mean + (standard_error_in_mean * confidence_interval_factor)
+    return (lower, mean, upper)
+
+def _use_exact_means_for_near_ties(times, use, mean):
+    """
+    `statistics.mean()` (used by `rank_by_execution_time()`) is correctly
+    rounded but the NumPy mean can be off by an ulp which can swap the
+    order of solvers with (almost) the same mean. Recompute the means of
+    those solvers with `statistics.mean()` so the order matches.
+    """
+    order = np.lexsort((mean, ~use), axis=-1)
+    sorted_mean = np.take_along_axis(mean, order, axis=1)
+    sorted_use = np.take_along_axis(use, order, axis=1)
+    near = (sorted_use[:, 1:] & sorted_use[:, :-1] &
+            (np.abs(sorted_mean[:, 1:] - sorted_mean[:, :-1]) <=
+             4 * np.spacing(np.abs(sorted_mean[:, 1:]))))
+    is_near_tie = np.zeros(order.shape, dtype=bool)
+    is_near_tie[:, 1:] |= near
+    is_near_tie[:, :-1] |= near
+    rows, positions = np.nonzero(is_near_tie)
+    for b, s in zip(rows.tolist(), order[rows, positions].tolist()):
+        values = times[b, s]
+        mean[b, s] = statistics.mean(values[~np.isnan(values)].tolist())
+
+def rank_by_execution_time_batched(times, use, max_time, confidence_interval_factor):
+    """
+    Batched version of `rank_by_execution_time()` that ranks every
+    benchmark at once.
+
+    `times` is a `(num_benchmarks, num_solvers, num_runs)` array of
+    execution times (`NaN` padded) and `use` is a `(num_benchmarks,
+    num_solvers)` boolean array of the solvers to rank for each benchmark.
+
+    Returns the tuple `(order, groups, bounds)` where
+
+    * `order[b]` are the solver indices sorted by mean execution time with
+      the unused solvers last.
+    * `groups[b, i]` is the group number of solver `order[b, i]` (groups
+      are numbered from 0 in order) or -1 if it is unused.
+    * `bounds[b, s]` is the `(lower, mean, upper)` bound of solver `s`.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    use = np.asarray(use, dtype=bool)
+    assert times.ndim == 3
+    assert use.shape == times.shape[:2]
+    assert confidence_interval_factor > 0
+    mean, standard_error_in_mean = _get_means_and_standard_errors(times)
+    _use_exact_means_for_near_ties(times, use, mean)
+    lower = mean - (standard_error_in_mean * confidence_interval_factor)
+    upper = mean + (standard_error_in_mean * confidence_interval_factor)
+    if max_time is not None:
+        assert isinstance(max_time, float)
+        assert max_time > 0.0
+        # Same as `bound_contains_or_exceeds_value()` for valid bounds
+        exceeds = upper >= max_time
+        lower[exceeds] = max_time
+        mean[exceeds] = max_time
+        upper[exceeds] = max_time
+
+    # Stable sort by mean with unused solvers last
+    order = np.lexsort((mean, ~use), axis=-1)
+    sorted_use = np.take_along_axis(use, order, axis=1)
+    sorted_lower = np.take_along_axis(lower, order, axis=1)
+    sorted_upper = np.take_along_axis(upper, order, axis=1)
+    # Because solvers are sorted by mean, a bound overlaps with a bound
+    # of an earlier solver iff its lower bound is <= that solver's upper
+    # bound. Each group starts with an upper bound larger than all the
+    # earlier ones so it is enough to compare with the running maximum.
+    max_upper = np.maximum.accumulate(
+        np.where(sorted_use, sorted_upper, -np.inf), axis=1)
+    starts = np.ones(order.shape, dtype=bool)
+    starts[:, 1:] = sorted_lower[:, 1:] > max_upper[:, :-1]
+    groups = np.cumsum(starts, axis=1) - 1
+    groups[~sorted_use] = -1
+    return (order, groups, np.stack([lower, mean, upper], axis=-1))
+
+def get_ranking_from_batched(order, groups, bounds, benchmark_index):
+    """
+    Returns the ranking of benchmark `benchmark_index` from the result of
+    `rank_by_execution_time_batched()` in the format returned by
+    `rank_by_execution_time()`.
+    """
+    ranked_indices = []
+    bound_groups = []
+    for index, group in zip(order[benchmark_index].tolist(),
+                            groups[benchmark_index].tolist()):
+        if group < 0:
+            break
+        if group == len(ranked_indices):
+            ranked_indices.append([])
+            bound_groups.append([])
+        ranked_indices[group].append(index)
+        bound_groups[group].append(tuple(bounds[benchmark_index, index].tolist()))
+    return ranked_indices, bound_groups
+
+def rank_result_info_groups_by_execution_time(result_info_groups, max_time,
+        confidence_interval_factor, time_prefs, rank_unknown=True):
+    """
+    Rank each list of result infos (one per solver) in
+    `result_info_groups` (e.g. the values returned by
+    `ResultInfoUtil.group_result_infos_by()`) by execution time.
+
+    Results that are "unknown" are ranked as taking `max_time` if
+    `rank_unknown` is true and are not ranked otherwise.
+
+    Returns a list with an entry for each group that is either `None`
+    (nothing to rank) or the tuple `(ranked_indices, bound_groups)` as
+    returned by `rank_by_execution_time()`.
+    """
+    assert len(time_prefs) > 0
+    if rank_unknown:
+        assert isinstance(max_time, float)
+    num_solvers = max([ len(group) for group in result_info_groups ], default=0)
+    index_to_times = []
+    index_to_use = []
+    for group in result_info_groups:
+        group_times = []
+        group_use = []
+        for ri in group:
+            times = []
+            if ri is not None:
+                sat, _ = get_sat_from_result_info(ri)
+                if sat != 'unknown':
+                    times = get_exec_time_values(ri, time_prefs)
+                elif rank_unknown:
+                    times = [ max_time ]
+            group_times.append(times)
+            group_use.append(len(times) > 0)
+        padding = num_solvers - len(group)
+        index_to_times.append(group_times + [[]] * padding)
+        index_to_use.append(group_use + [False] * padding)
+
+    num_runs = max([ len(times) for group_times in index_to_times
+                     for times in group_times ], default=1)
+    times = np.full((len(result_info_groups), num_solvers, max(num_runs, 1)), np.nan)
+    for benchmark_index, group_times in enumerate(index_to_times):
+        for solver_index, solver_times in enumerate(group_times):
+            times[benchmark_index, solver_index, :len(solver_times)] = [
+                np.nan if v is None else v for v in solver_times ]
+    use = np.array(index_to_use, dtype=bool).reshape(times.shape[:2])
+    order, groups, bounds = rank_by_execution_time_batched(
+        times, use, max_time, confidence_interval_factor)
+
+    rankings = []
+    for benchmark_index in range(len(result_info_groups)):
+        if not np.any(use[benchmark_index]):
+            rankings.append(None)
+            continue
+        rankings.append(get_ranking_from_batched(order, groups, bounds, benchmark_index))
+
+    return rankings
+
 # Useful for unifying timeouts
 def get_result_with_modified_time(r, time):
     assert isinstance(r, dict)
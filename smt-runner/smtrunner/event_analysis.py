@@ -3,7 +3,11 @@ from collections import namedtuple
 from . analysis import is_merged_result_info
 from . import util
 from . import ResultInfoUtil
+import hashlib
+import inspect
+import itertools
 import logging
+import multiprocessing
 import os
 import re
 
@@ -40,6 +44,81 @@ def get_event_analyser_from_runner_name(name, *nargs, **kwargs):
     
     raise Exception('not implemented')
 
+# Event analyser used by `get_event_tags()` worker processes.
+_worker_event_analyser = None
+
+def _init_event_tag_worker(runner_name, analyser_kwargs):
+    global _worker_event_analyser
+    _worker_event_analyser = get_event_analyser_from_runner_name(
+        runner_name, **analyser_kwargs)
+
+def _get_event_tag_in_worker(geti):
+    return _worker_event_analyser.get_event_tag(geti)
+
+def get_event_tags(runner_name, analyser_kwargs, getis, num_jobs=1):
+    """
+        Generator that yields the event tag for each `GETInfo` in `getis`
+        in the same order as `getis`.
+
+        `runner_name` and `analyser_kwargs` are passed to
+        `get_event_analyser_from_runner_name()`. If `num_jobs` is greater
+        than one the tags are computed by a pool of `num_jobs` worker
+        processes that each have their own event analyser.
+    """
+    assert isinstance(num_jobs, int) and num_jobs > 0
+    getis = list(getis)
+    if num_jobs == 1 or len(getis) <= 1:
+        event_analyser = get_event_analyser_from_runner_name(
+            runner_name, **analyser_kwargs)
+        for geti in getis:
+            yield event_analyser.get_event_tag(geti)
+        return
+    # Hand out work in chunks to reduce IPC overhead but keep enough
+    # chunks per worker that workers finish at about the same time.
+    chunk_size = max(1, len(getis) // (num_jobs * 8))
+    _logger.info('Computing event tags using {} jobs'.format(num_jobs))
+    with multiprocessing.Pool(
+            processes=num_jobs,
+            initializer=_init_event_tag_worker,
+            initargs=(runner_name, analyser_kwargs)) as pool:
+        for tag in pool.imap(_get_event_tag_in_worker, getis, chunk_size):
+            yield tag
+
+# Bump this when a change to code outside this module that the analysers
+# use (e.g. `is_merged_result_info()` or `ResultInfoUtil`) changes the
+# event tags so that cached tags are recomputed.
+EVENT_ANALYSIS_VERSION = 1
+
+def get_event_analyser_fingerprint(event_analyser):
+    """
+        Returns a digest of the source code and settings of `event_analyser`.
+
+        Only the classes `event_analyser` is an instance of contribute to the
+        digest so changing the checks of one analyser does not change the
+        fingerprint of the others. The module level functions of this module
+        (e.g. `merge_aggregate_events()`) and `EVENT_ANALYSIS_VERSION` are
+        also included because the analysers use them.
+    """
+    assert isinstance(event_analyser, GenericRunnerEventAnalyser)
+    h = hashlib.sha1()
+    h.update(str(EVENT_ANALYSIS_VERSION).encode('utf-8'))
+    module_functions = [
+        value for _, value in sorted(globals().items())
+        if inspect.isfunction(value) and value.__module__ == __name__
+    ]
+    for fn in module_functions:
+        h.update(inspect.getsource(fn).encode('utf-8'))
+    h.update(inspect.getsource(LogPatternClassifier).encode('utf-8'))
+    for cls in type(event_analyser).__mro__:
+        if not issubclass(cls, GenericRunnerEventAnalyser):
+            continue
+        h.update(inspect.getsource(cls).encode('utf-8'))
+    settings = sorted(
+        (k, repr(v)) for k, v in vars(event_analyser).items()
+        if not k.startswith('_log'))
+    h.update(repr(settings).encode('utf-8'))
+    return h.hexdigest()
+
 class MergeEventFailure(Exception):
     pass
 
@@ -165,9 +244,64 @@ def merge_aggregate_events(events):
 
     raise MergeEventFailure('Could not merge {}'.format(events))
 
+class LogPatternClassifier:
+    """
+        Classifies the lines of a log against a fixed set of compiled
+        patterns in a single pass.
+
+        A combined alternation of all the patterns is used to quickly skip
+        lines that cannot match any of them. Only lines that pass this
+        filter are tested against the individual patterns.
+    """
+    def __init__(self, patterns):
+        self._patterns = list(patterns)
+        assert all([isinstance(p, _RE_TYPE) for p in self._patterns])
+        self._prefilter = None
+        if len(self._patterns) > 0 and all(
+                [p.flags == _RE_DEFAULT_FLAGS for p in self._patterns]):
+            try:
+                self._prefilter = re.compile('|'.join(
+                    ['(?:{})'.format(p.pattern) for p in self._patterns]))
+            except re.error:
+                # e.g. numbered back references can't be combined
+                _logger.debug('Failed to build log prefilter')
+                self._prefilter = None
+
+    @property
+    def patterns(self):
+        return self._patterns
+
+    def scan(self, lines):
+        """
+            Returns the set of `(pattern, search)` tuples found in `lines`.
+            `search` is `True` if `pattern.search()` matched a line and
+            `False` if `pattern.match()` matched a line.
+        """
+        found = set()
+        num_to_find = 2 * len(self._patterns)
+        for l in lines:
+            if self._prefilter is not None and not self._prefilter.search(l):
+                continue
+            for p in self._patterns:
+                if (p, False) in found:
+                    continue
+                if not p.search(l):
+                    continue
+                found.add((p, True))
+                if p.match(l):
+                    found.add((p, False))
+            if len(found) == num_to_find:
+                break
+        return found
+
+_RE_TYPE = type(re.compile(''))
+_RE_DEFAULT_FLAGS = re.compile('').flags
+
 class GenericRunnerEventAnalyser:
     def __init__(self, name, soft_timeout= None, use_dsoes_wallclock_time=False):
         self.name = name
+        # Logs of the result currently being analysed, keyed by path.
+        self._log_cache = dict()
         self._soft_timeout = soft_timeout
         assert isinstance(self._soft_timeout, float) or self._soft_timeout is None
         self.use_dsoes_wallclock_time = use_dsoes_wallclock_time
@@ -271,6 +405,16 @@ class GenericRunnerEventAnalyser:
         log_file = self.join_path(wd_base, ri['stderr_log_file'])
         return log_file
 
+    def get_input_paths(self, geti):
+        """
+            Returns the list of paths of the files that the event tag
+            (and other fields derived by this analyser) of `geti` depend on.
+        """
+        return [
+            self.get_stdout_log_path(geti.ri, geti.wd_base),
+            self.get_stderr_log_path(geti.ri, geti.wd_base),
+        ]
+
     def _open_log_file(self, log_file_path):
         if not os.path.exists(log_file_path):
             msg= 'File "{}" does not exist'.format(log_file_path)
@@ -284,38 +428,113 @@ class GenericRunnerEventAnalyser:
     def open_stderr_log(self, ri, wd_base):
         return self._open_log_file(self.get_stderr_log_path(ri, wd_base))
 
+    @classmethod
+    def _get_log_classifier(cls):
+        # Built once per analyser class from all of its `_RE_*` patterns.
+        if '_log_classifier' not in cls.__dict__:
+            patterns = []
+            for attr_name in sorted(dir(cls)):
+                if not attr_name.startswith('_RE_'):
+                    continue
+                attr = getattr(cls, attr_name)
+                if isinstance(attr, _RE_TYPE):
+                    patterns.append(attr)
+            cls._log_classifier = LogPatternClassifier(patterns)
+        return cls._log_classifier
+
+    # Number of lines at the start of each log that are kept for checkers
+    # that look at specific lines.
+    _NUM_LOG_HEAD_LINES = 2
+
+    def _get_log_path(self, geti, stream):
+        if stream == 'stdout':
+            return self.get_stdout_log_path(geti.ri, geti.wd_base)
+        assert stream == 'stderr'
+        return self.get_stderr_log_path(geti.ri, geti.wd_base)
+
+    def _get_log(self, geti, stream):
+        """
+            Returns the tuple (<head_lines>, <found>) for the `stream`
+            ('stdout' or 'stderr') log of `geti` where <head_lines> are the
+            first `_NUM_LOG_HEAD_LINES` lines of the log and <found> is the
+            set returned by `LogPatternClassifier.scan()`.
+
+            Each log is only read and scanned once, a line at a time, so
+            memory use does not grow with the size of the log. The result
+            is reused by all checkers run on the same result info.
+        """
+        log_path = self._get_log_path(geti, stream)
+        try:
+            return self._log_cache[log_path]
+        except KeyError:
+            pass
+        with self._open_log_file(log_path) as f:
+            head_lines = list(itertools.islice(f, self._NUM_LOG_HEAD_LINES))
+            found = self._get_log_classifier().scan(itertools.chain(head_lines, f))
+        log = (head_lines, found)
+        # Only the stdout and stderr logs of a single result are kept.
+        if len(self._log_cache) >= 2:
+            self._log_cache.clear()
+        self._log_cache[log_path] = log
+        return log
+
+    def _iter_log_lines(self, geti, stream):
+        """
+            Generator yielding the lines of the `stream` log of `geti`
+            without reading the whole log into memory.
+        """
+        with self._open_log_file(self._get_log_path(geti, stream)) as f:
+            for l in f:
+                yield l
+
+    def _get_log_line(self, geti, stream, index):
+        """
+            Returns line `index` of the `stream` log of `geti` or the empty
+            string if the log is shorter than that.
+        """
+        head_lines = self._get_log(geti, stream)[0]
+        if index < len(head_lines):
+            return head_lines[index]
+        if len(head_lines) < self._NUM_LOG_HEAD_LINES:
+            # The log is shorter than its head
+            return ''
+        for l in itertools.islice(self._iter_log_lines(geti, stream), index, None):
+            return l
+        return ''
+
+    def _log_matches(self, geti, stream, regex, search=True):
+        """
+            Returns `True` if any line of the `stream` log of `geti` matches
+            `regex`. `regex.search()` is used if `search` is `True`, otherwise
+            `regex.match()`.
+        """
+        assert isinstance(search, bool)
+        if regex in self._get_log_classifier().patterns:
+            return (regex, search) in self._get_log(geti, stream)[1]
+        # Not one of the analyser's patterns so scan the lines directly.
+        for l in self._iter_log_lines(geti, stream):
+            _logger.debug('Matching against line "{}"'.format(l))
+            m = regex.search(l) if search else regex.match(l)
+            if m:
+                return True
+        return False
+
     def _exit_and_search_stderr_regex(self, geti, regex, match_tag, search=True, exit_code_neq=0):
         assert isinstance(search, bool)
         ri = geti.ri
-        wd_base = geti.wd_base
         if ri['exit_code'] == exit_code_neq:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                if search:
-                    m = regex.search(l)
-                else:
-                    m = regex.match(l)
-                if m:
-                    return match_tag
+        if self._log_matches(geti, 'stderr', regex, search):
+            return match_tag
         return None
 
     def _exit_and_search_stdout_regex(self, geti, regex, match_tag, search=True, exit_code_neq=0):
         assert isinstance(search, bool)
         ri = geti.ri
-        wd_base = geti.wd_base
         if ri['exit_code'] == exit_code_neq:
             return None
-        with self.open_stdout_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                if search:
-                    m = regex.search(l)
-                else:
-                    m = regex.match(l)
-                if m:
-                    return match_tag
+        if self._log_matches(geti, 'stdout', regex, search):
+            return match_tag
         return None
 
 class JFSRunnerEventAnalyser(GenericRunnerEventAnalyser):
@@ -331,11 +550,15 @@ class JFSRunnerEventAnalyser(GenericRunnerEventAnalyser):
             new_kwargs.pop('jfs.handle_unknown')
         super().__init__("JFS", *nargs, **new_kwargs)
 
-    def get_jfs_stats(self, geti):
+    def get_jfs_stats_path(self, geti):
         wd_base = geti.wd_base
         ri = geti.ri
         stats_path = self.join_path(wd_base, ResultInfoUtil.get_result_info_wd(ri))
         stats_path = self.join_path(stats_path, 'jfs-stats.yml')
+        return stats_path
+
+    def get_jfs_stats(self, geti):
+        stats_path = self.get_jfs_stats_path(geti)
         try:
             with open(stats_path, 'r') as f:
                 stats = util.loadYaml(f)
@@ -351,6 +574,12 @@ class JFSRunnerEventAnalyser(GenericRunnerEventAnalyser):
         fuzzer_output_path = self.join_path(fuzzer_output_path, 'jfs-wd/libfuzzer.stderr.txt')
         return fuzzer_output_path
 
+    def get_input_paths(self, geti):
+        return super().get_input_paths(geti) + [
+            self.get_jfs_stats_path(geti),
+            self.get_fuzzer_stderr_path(geti),
+        ]
+
     _RE_LIBFUZZER_AVG_EXEC = re.compile(r'stat::average_exec_per_sec:\s*(\d+)')
     def get_libfuzzer_stat_average_exec_per_sec(self, geti):
         fuzzer_stderr_path = self.get_fuzzer_stderr_path(geti)
@@ -360,7 +589,7 @@ class JFSRunnerEventAnalyser(GenericRunnerEventAnalyser):
         # stat::average_exec_per_sec:     287127
         try:
             with open(fuzzer_stderr_path, 'r', errors='ignore') as f:
-                for line in f.readlines():
+                for line in f:
                     m = self._RE_LIBFUZZER_AVG_EXEC.search(line)
                     if m:
                         value = m.group(1)
@@ -446,10 +675,9 @@ class JFSRunnerEventAnalyser(GenericRunnerEventAnalyser):
         if ri['sat'] != 'unknown':
             return None
         # Verify that JFS actually printed out `unknown`
-        with self.open_stdout_log(ri, geti.wd_base) as f:
-            first_line = f.readline().strip()
-            if first_line == 'unknown':
-                return 'jfs_generic_unknown'
+        first_line = self._get_log_line(geti, 'stdout', 0).strip()
+        if first_line == 'unknown':
+            return 'jfs_generic_unknown'
         return None
 
     _RE_JFS_DEBUG_SOLVER_OUTPUT = re.compile(r'Solver responded with (sat|unsat|unknown)\)$')
@@ -468,27 +696,26 @@ class JFSRunnerEventAnalyser(GenericRunnerEventAnalyser):
         # response.
         # NOTE: This only works with 64f89d6bed53f43e1d3e2b3b21f097164a8bf4c4
         # and newer.
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                m = self._RE_JFS_DEBUG_SOLVER_OUTPUT.search(l)
-                m_model_validation = None
-                sat = None
-                if m:
-                    sat = m.group(1)
-                else:
-                    # Heuristic for older JFS versions where the satisfiability wasn't
-                    # recorded in debug output. This relies on model valiation being on.
-                    # If model validation is performed that implies the result was sat.
-                    m_model_validation = self._RE_JFS_DEBUG_MODEL_VALIDATION.search(l)
-                    if m_model_validation:
-                        sat = 'sat'
-                if sat is not None:
-                    assert sat == 'sat' or sat == 'unsat' or sat == 'unknown'
-                    _logger.warning('jfs_dropped_stdout_bug_{}: {} ({})'.format(
-                        sat,
-                        ri['benchmark'],
-                        ri['working_directory']))
-                    return 'jfs_dropped_stdout_bug_{}'.format(sat)
+        for l in self._iter_log_lines(geti, 'stderr'):
+            m = self._RE_JFS_DEBUG_SOLVER_OUTPUT.search(l)
+            m_model_validation = None
+            sat = None
+            if m:
+                sat = m.group(1)
+            else:
+                # Heuristic for older JFS versions where the satisfiability wasn't
+                # recorded in debug output. This relies on model valiation being on.
+                # If model validation is performed that implies the result was sat.
+                m_model_validation = self._RE_JFS_DEBUG_MODEL_VALIDATION.search(l)
+                if m_model_validation:
+                    sat = 'sat'
+            if sat is not None:
+                assert sat == 'sat' or sat == 'unsat' or sat == 'unknown'
+                _logger.warning('jfs_dropped_stdout_bug_{}: {} ({})'.format(
+                    sat,
+                    ri['benchmark'],
+                    ri['working_directory']))
+                return 'jfs_dropped_stdout_bug_{}'.format(sat)
 
         return None
 
@@ -501,11 +728,8 @@ class JFSRunnerEventAnalyser(GenericRunnerEventAnalyser):
         if ri['sat'] != 'unknown':
             return None
         # LibFuzzer hit single unit run titme out
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                m = self._RE_LIBFUZZER_TIMEOUT.match(l)
-                if m:
-                   return 'jfs_libfuzzer_unit_timeout'
+        if self._log_matches(geti, 'stderr', self._RE_LIBFUZZER_TIMEOUT, search=False):
+            return 'jfs_libfuzzer_unit_timeout'
         return None
 
     def _zero_exit_and_search_regex(self, geti, regex, match_tag, search=True):
@@ -514,15 +738,8 @@ class JFSRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] != 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                if search:
-                    m = regex.search(l)
-                else:
-                    m = regex.match(l)
-                if m:
-                    return match_tag
+        if self._log_matches(geti, 'stderr', regex, search):
+            return match_tag
         return None
 
     _RE_UNSUPPORTED_BV_SORT = re.compile(r'\(BitVector width \d+ not supported\)')
@@ -565,15 +782,8 @@ class CoralRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                if search:
-                    m = regex.search(l)
-                else:
-                    m = regex.match(l)
-                if m:
-                    return match_tag
+        if self._log_matches(geti, 'stderr', regex, search):
+            return match_tag
         return None
 
     _RE_JAVA_UNEXPECTED_TYPE_SYM_BOOL = re.compile(r'java.lang.RuntimeException: Unexpected type: class symlib.SymBoolLiteral')
@@ -638,12 +848,8 @@ class CoralRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_UNSUPPORTED_OP_CONV.search(l)
-                if m:
-                    return 'coral_unsupported_op_sort_conversion'
+        if self._log_matches(geti, 'stderr', self._RE_UNSUPPORTED_OP_CONV, search=True):
+            return 'coral_unsupported_op_sort_conversion'
         return None
 
     _RE_NO_IMPL_BV_EQ = re.compile(r'NotImplementedError: BitVector equal')
@@ -659,12 +865,8 @@ class CoralRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_JAVA_NULL_PTR.search(l)
-                if m:
-                    return 'coral_nullptr_exception'
+        if self._log_matches(geti, 'stderr', self._RE_JAVA_NULL_PTR, search=True):
+            return 'coral_nullptr_exception'
         return None
 
     _RE_PYTHON_OS_ERROR_ARG_LIST_TOO_LONG = re.compile(r'OSError: \[Errno 7\] Argument list too long')
@@ -673,12 +875,8 @@ class CoralRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_PYTHON_OS_ERROR_ARG_LIST_TOO_LONG.search(l)
-                if m:
-                    return 'coral_argument_list_too_long'
+        if self._log_matches(geti, 'stderr', self._RE_PYTHON_OS_ERROR_ARG_LIST_TOO_LONG, search=True):
+            return 'coral_argument_list_too_long'
         return None
 
     _RE_DISTINCT_NOT_IMP = re.compile(r'NotImplementedError: Handler for 259 is missing from dispatch dictionary')
@@ -731,12 +929,8 @@ class goSATRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_ASSERT_FAIL.search(l)
-                if m:
-                    return 'gosat_assert_fail'
+        if self._log_matches(geti, 'stderr', self._RE_ASSERT_FAIL, search=True):
+            return 'gosat_assert_fail'
         return None
 
     _RE_UNCAUGHT_EXCEPTION = re.compile(r"terminate called after throwing an instance of")
@@ -746,12 +940,8 @@ class goSATRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_UNCAUGHT_EXCEPTION.search(l)
-                if m:
-                    return 'gosat_uncaught_exception'
+        if self._log_matches(geti, 'stderr', self._RE_UNCAUGHT_EXCEPTION, search=True):
+            return 'gosat_uncaught_exception'
         return None
 
     def result_unknown(self, geti):
@@ -772,12 +962,8 @@ class goSATRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_UNSUPPORTED_EXPR.match(l)
-                if m:
-                    return 'gosat_unsupported_expr'
+        if self._log_matches(geti, 'stderr', self._RE_UNSUPPORTED_EXPR, search=False):
+            return 'gosat_unsupported_expr'
         return None
 
     def _error_unimplement_fp_literals(self, geti):
@@ -832,12 +1018,8 @@ class optSATRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_ASSERT_FAIL.search(l)
-                if m:
-                    return 'optsat_assert_fail'
+        if self._log_matches(geti, 'stderr', self._RE_ASSERT_FAIL, search=True):
+            return 'optsat_assert_fail'
         return None
 
     _RE_UNCAUGHT_EXCEPTION = re.compile(r"terminate called after throwing an instance of")
@@ -847,12 +1029,8 @@ class optSATRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_UNCAUGHT_EXCEPTION.search(l)
-                if m:
-                    return 'optsat_uncaught_exception'
+        if self._log_matches(geti, 'stderr', self._RE_UNCAUGHT_EXCEPTION, search=True):
+            return 'optsat_uncaught_exception'
         return None
 
     def result_unknown(self, geti):
@@ -875,12 +1053,8 @@ class optSATRunnerEventAnalyser(GenericRunnerEventAnalyser):
             return None
         if ri['exit_code'] == 1:
             return 'optsat_unknown_error'
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_UNSUPPORTED_EXPR.match(l)
-                if m:
-                    return 'optsat_unsupported_expr'
+        if self._log_matches(geti, 'stderr', self._RE_UNSUPPORTED_EXPR, search=False):
+            return 'optsat_unsupported_expr'
         return None
 
 
@@ -916,12 +1090,8 @@ class optSATBitwuzlaRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_ASSERT_FAIL.search(l)
-                if m:
-                    return 'optsat_assert_fail'
+        if self._log_matches(geti, 'stderr', self._RE_ASSERT_FAIL, search=True):
+            return 'optsat_assert_fail'
         return None
 
     _RE_UNCAUGHT_EXCEPTION = re.compile(r"terminate called after throwing an instance of")
@@ -931,12 +1101,8 @@ class optSATBitwuzlaRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_UNCAUGHT_EXCEPTION.search(l)
-                if m:
-                    return 'optsat_uncaught_exception'
+        if self._log_matches(geti, 'stderr', self._RE_UNCAUGHT_EXCEPTION, search=True):
+            return 'optsat_uncaught_exception'
         return None
 
     def result_unknown(self, geti):
@@ -957,12 +1123,8 @@ class optSATBitwuzlaRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] == 0:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                _logger.debug('Matching against line "{}"'.format(l))
-                m = self._RE_UNSUPPORTED_EXPR.match(l)
-                if m:
-                    return 'optsat_unsupported_expr'
+        if self._log_matches(geti, 'stderr', self._RE_UNSUPPORTED_EXPR, search=False):
+            return 'optsat_unsupported_expr'
         return None
 
     _RE_UNIMP_FP_LIT = re.compile(r'Floating-point literals not yet implemented')
@@ -1024,10 +1186,9 @@ class ColibriRunnerEventAnalyser(GenericRunnerEventAnalyser):
         if ri['sat'] != 'unknown' or (ri['exit_code'] != 2 and ri['exit_code'] != 3):
             return None
         # Check stderr
-        with self.open_stderr_log(ri, wd_base) as f:
-            first_line = f.readline()
-            if self._RE_STACK_OVERFLOW.match(first_line):
-                return 'colibri_stack_overflow'
+        first_line = self._get_log_line(geti, 'stderr', 0)
+        if self._RE_STACK_OVERFLOW.match(first_line):
+            return 'colibri_stack_overflow'
         return None
 
     def error_parsing_unknown_char(self, geti):
@@ -1036,12 +1197,10 @@ class ColibriRunnerEventAnalyser(GenericRunnerEventAnalyser):
         if ri['sat'] != 'unknown' or ri['exit_code'] != 2:
             return None
         # Check stderr
-        with self.open_stderr_log(ri, wd_base) as f:
-            # Check 2nd line
-            first_line = f.readline()
-            second_line = f.readline()
-            if second_line.startswith('unknown character'):
-                return 'colibri_parser_error_unknown_character'
+        # Check 2nd line
+        second_line = self._get_log_line(geti, 'stderr', 1)
+        if second_line.startswith('unknown character'):
+            return 'colibri_parser_error_unknown_character'
         return None
 
     def error_seg_fault(self, geti):
@@ -1052,11 +1211,9 @@ class ColibriRunnerEventAnalyser(GenericRunnerEventAnalyser):
         if ri['sat'] != 'unknown' or (ri['exit_code'] != 3 and ri['exit_code'] != 2):
             return None
         # Check stderr
-        with self.open_stderr_log(ri, wd_base) as f:
-            # Check 2nd line
-            first_line = f.readline()
-            if re.search(r'Segmentation fault', first_line):
-                return 'colibri_segfault'
+        first_line = self._get_log_line(geti, 'stderr', 0)
+        if re.search(r'Segmentation fault', first_line):
+            return 'colibri_segfault'
         return None
 
     def _error_colibri_unknown(self, geti):
@@ -1088,11 +1245,10 @@ class Z3RunnerEventAnalyser(GenericRunnerEventAnalyser):
         if ri['exit_code'] != 110:
             return None
         # Check the stderr file for the pattern we expect
-        with self.open_stderr_log(ri, wd_base) as f:
-            line = f.readline()
-            if (line.startswith('ERROR: unknown parameter') or
-                line.startswith('ERROR: invalid parameter')):
-                return 'old_z3_benchmark_name_bug'
+        line = self._get_log_line(geti, 'stderr', 0)
+        if (line.startswith('ERROR: unknown parameter') or
+            line.startswith('ERROR: invalid parameter')):
+            return 'old_z3_benchmark_name_bug'
         return None
 
     def get_solver_end_state_checker_fns(self):
@@ -1113,11 +1269,11 @@ class MathSat5RunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] != 0 or ri['sat'] != 'unknown':
             return None
-        with self.open_stdout_log(ri, wd_base) as f:
-            line = f.readline()
-            _logger.debug('Opened "{}" with line "{}"'.format(f.name, line))
-            if line.startswith('(error "expected status was sat, got unsat instead")'):
-                return 'mathsat5_error_expected_sat_got_unsat'
+        line = self._get_log_line(geti, 'stdout', 0)
+        _logger.debug('Opened "{}" with line "{}"'.format(
+            self.get_stdout_log_path(ri, wd_base), line))
+        if line.startswith('(error "expected status was sat, got unsat instead")'):
+            return 'mathsat5_error_expected_sat_got_unsat'
         return None
 
     def error_empty_name_for_symbol(self, geti):
@@ -1128,10 +1284,9 @@ class MathSat5RunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] != 0 or ri['sat'] != 'unknown':
             return None
-        with self.open_stdout_log(ri, wd_base) as f:
-            line = f.readline()
-            if line.startswith('(error "Empty name for symbol")'):
-                return 'mathsat5_error_empty_symbol_name'
+        line = self._get_log_line(geti, 'stdout', 0)
+        if line.startswith('(error "Empty name for symbol")'):
+            return 'mathsat5_error_empty_symbol_name'
         return None
 
     def error_fp_rem_unsupported(self, geti):
@@ -1142,10 +1297,9 @@ class MathSat5RunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] != 0 or ri['sat'] != 'unknown':
             return None
-        with self.open_stdout_log(ri, wd_base) as f:
-            line = f.readline()
-            if line.startswith('(error "unknown symbol: fp.rem'):
-                return 'mathsat5_error_fp_rem_not_supported'
+        line = self._get_log_line(geti, 'stdout', 0)
+        if line.startswith('(error "unknown symbol: fp.rem'):
+            return 'mathsat5_error_fp_rem_not_supported'
         return None
 
     def error_fp_lt_chainable_unsupported(self, geti):
@@ -1157,10 +1311,9 @@ class MathSat5RunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] != 0 or ri['sat'] != 'unknown':
             return None
-        with self.open_stdout_log(ri, wd_base) as f:
-            line = f.readline()
-            if line.startswith('(error "ERROR: fp.lt takes exactly 2 arguments'):
-                return 'mathsat5_error_fp_lt_chainable_not_supported'
+        line = self._get_log_line(geti, 'stdout', 0)
+        if line.startswith('(error "ERROR: fp.lt takes exactly 2 arguments'):
+            return 'mathsat5_error_fp_lt_chainable_not_supported'
         return None
 
     def error_fp_fma_unsupported(self, geti):
@@ -1171,10 +1324,9 @@ class MathSat5RunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] != 0 or ri['sat'] != 'unknown':
             return None
-        with self.open_stdout_log(ri, wd_base) as f:
-            line = f.readline()
-            if line.startswith('(error "unknown symbol: fp.fma'):
-                return 'mathsat5_error_fp_fma_not_supported'
+        line = self._get_log_line(geti, 'stdout', 0)
+        if line.startswith('(error "unknown symbol: fp.fma'):
+            return 'mathsat5_error_fp_fma_not_supported'
         return None
 
     def mathsat5_error_unknown(self, geti):
@@ -1204,11 +1356,8 @@ class XSatRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] != 1:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                m = self._RE_NOT_IMPLEMENTED_PY.search(l)
-                if m:
-                    return 'xsat_not_implemented_exception'
+        if self._log_matches(geti, 'stderr', self._RE_NOT_IMPLEMENTED_PY, search=True):
+            return 'xsat_not_implemented_exception'
         return None
 
     _RE_UNICODE_ERROR_PY = re.compile(r"UnicodeDecodeError")
@@ -1217,11 +1366,8 @@ class XSatRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] != 1:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                m = self._RE_UNICODE_ERROR_PY.search(l)
-                if m:
-                    return 'xsat_unicode_exception'
+        if self._log_matches(geti, 'stderr', self._RE_UNICODE_ERROR_PY, search=True):
+            return 'xsat_unicode_exception'
         return None
 
     _RE_TYPE_ERROR_PY = re.compile(r'^TypeError:\s+')
@@ -1230,11 +1376,8 @@ class XSatRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] != 1:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                m = self._RE_TYPE_ERROR_PY.match(l)
-                if m:
-                    return 'xsat_type_error'
+        if self._log_matches(geti, 'stderr', self._RE_TYPE_ERROR_PY, search=False):
+            return 'xsat_type_error'
         return None
 
 
@@ -1244,11 +1387,8 @@ class XSatRunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] != 1:
             return None
-        with self.open_stderr_log(ri, wd_base) as f:
-            for l in f.readlines():
-                m = self._RE_COMPILER_ERROR_MSG.match(l)
-                if m:
-                    return 'xsat_compiler_error'
+        if self._log_matches(geti, 'stderr', self._RE_COMPILER_ERROR_MSG, search=False):
+            return 'xsat_compiler_error'
 
     def get_solver_end_state_checker_fns(self):
         # Child classes should override this
@@ -1270,11 +1410,8 @@ class CVC5RunnerEventAnalyser(GenericRunnerEventAnalyser):
         wd_base = geti.wd_base
         if ri['exit_code'] != 1:
             return None
-        with self.open_stdout_log(ri, wd_base) as f:
-            for l in f.readlines():
-                m = self._RE_UNIMP_FP_LIT.search(l)
-                if m:
-                    return 'cvc5_not_implemented_fp_literal'
+        if self._log_matches(geti, 'stdout', self._RE_UNIMP_FP_LIT, search=True):
+            return 'cvc5_not_implemented_fp_literal'
 
     _RE_FREE_SORT_SYM_NOT_ALLOWED = re.compile(r'Free sort symbols not allowed in QF_FP')
 
@@ -0,0 +1,464 @@
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Search for the best portfolio of solvers.
+
+A portfolio is scored as the virtual best solver of its members, i.e. a
+benchmark is solved if any member solves it and takes the time of the
+fastest member that does. Portfolios are compared by the number of solved
+benchmarks (higher is better) and then by PAR-2 score (lower is better),
+where an unsolved benchmark counts as twice the time limit.
+
+The search works on a `(num_solvers, num_benchmarks)` matrix of solve
+times (`inf` where a solver does not solve a benchmark) so that every
+candidate is scored with a few NumPy operations.
+
+Static schedules for a fixed number of cores can also be simulated. A
+schedule is a list of cores where each core is a list of `(solver,
+time_slice)` steps that are run one after another, e.g. `[[(0, 10.0),
+(1, 50.0)]]` runs solver 0 for 10 seconds and then solver 1 for 50
+seconds on a single core. A benchmark is solved by a step if the solver's
+solve time fits in the time slice and the schedule finishes as soon as any
+step solves it. Solvers are assumed to be unaffected by running in
+parallel and to not benefit from earlier steps.
+"""
+import itertools
+import logging
+import numpy as np
+from . import ResultTable
+
+_logger = logging.getLogger(__name__)
+
+class PortfolioError(Exception):
+    pass
+
+def get_solve_times(table, benchmarks, max_time, time_prefs):
+    """
+    Returns a float64 array with the mean execution time of each benchmark
+    in `benchmarks` for the results in `table` or `inf` where the result
+    is missing, not a definitive answer (i.e. unknown or conflicting runs),
+    contradicts `expected_sat` or does not finish within `max_time`.
+    """
+    assert isinstance(table, ResultTable.ResultTable)
+    solve_times = np.full(len(benchmarks), np.inf)
+    if table.num_rows == 0:
+        return solve_times
+    exec_times = np.nanmean(table.get_exec_times(time_prefs), axis=1)
+    has_sat = np.any(table.equals('sat', 'sat'), axis=1)
+    has_unsat = np.any(table.equals('sat', 'unsat'), axis=1)
+    solved = (has_sat != has_unsat) & (exec_times < max_time)
+    if table.has_field('expected_sat'):
+        expected_sat = table.equals('expected_sat', 'sat')
+        expected_unsat = table.equals('expected_sat', 'unsat')
+        solved &= ~((expected_sat & has_unsat) | (expected_unsat & has_sat))
+    row_solve_times = np.where(solved, exec_times, np.inf)
+    benchmark_to_row = { b: row for row, b in enumerate(table.benchmarks) }
+    rows = np.array([ benchmark_to_row.get(b, -1) for b in benchmarks ],
+                    dtype=np.int64)
+    present = rows >= 0
+    solve_times[present] = row_solve_times[rows[present]]
+    return solve_times
+
+class PortfolioProblem:
+    """
+    The solve times of `names` (one per solver) on `benchmarks` with time
+    limit `max_time`.
+    """
+    def __init__(self, names, benchmarks, solve_times, max_time):
+        solve_times = np.asarray(solve_times, dtype=np.float64)
+        assert solve_times.shape == (len(names), len(benchmarks))
+        assert max_time > 0.0
+        self._names = list(names)
+        self._benchmarks = list(benchmarks)
+        self._solve_times = solve_times
+        self._max_time = max_time
+
+    @classmethod
+    def from_tables(cls, names, tables, max_time,
+                    time_prefs=('dsoes_wallclock', 'wallclock')):
+        """
+        Build a problem from `ResultTable`s (one per solver). The benchmarks
+        are those of the first table.
+        """
+        if len(tables) == 0:
+            raise PortfolioError('No solvers')
+        if len(names) != len(tables):
+            raise PortfolioError('Number of names must match number of tables')
+        benchmarks = tables[0].benchmarks
+        solve_times = []
+        for name, table in zip(names, tables):
+            missing = len(set(benchmarks) - set(table.benchmarks))
+            if missing > 0:
+                _logger.warning('{} benchmarks are missing for "{}"'.format(
+                    missing, name))
+            solve_times.append(
+                get_solve_times(table, benchmarks, max_time, time_prefs))
+        return cls(names, benchmarks, np.array(solve_times), max_time)
+
+    @property
+    def names(self):
+        return self._names
+
+    @property
+    def benchmarks(self):
+        return self._benchmarks
+
+    @property
+    def num_solvers(self):
+        return len(self._names)
+
+    @property
+    def max_time(self):
+        return self._max_time
+
+    @property
+    def solve_times(self):
+        view = self._solve_times.view()
+        view.flags.writeable = False
+        return view
+
+    def get_virtual_best_times(self, subset):
+        """
+        Returns the solve time of the virtual best solver of `subset` (a
+        list of solver indices) for each benchmark.
+        """
+        if len(subset) == 0:
+            return np.full(len(self._benchmarks), np.inf)
+        return np.min(self._solve_times[list(subset)], axis=0)
+
+    def get_virtual_best_choices(self, subset):
+        """
+        Returns the index (into `subset`) of the fastest solver of `subset`
+        for each benchmark or -1 if no solver in `subset` solves it.
+        """
+        subset_times = self._solve_times[list(subset)]
+        choices = np.argmin(subset_times, axis=0)
+        choices[np.all(np.isinf(subset_times), axis=0)] = -1
+        return choices
+
+    def score_times(self, times):
+        """
+        Returns the tuple (<num_solved>, <par2>) for the virtual best times
+        `times`. `times` can be 2D to score several portfolios at once.
+        """
+        solved = np.isfinite(times)
+        num_solved = np.sum(solved, axis=-1)
+        par2 = np.sum(np.where(solved, times, 2.0 * self._max_time), axis=-1)
+        return (num_solved, par2)
+
+    def score(self, subset):
+        num_solved, par2 = self.score_times(self.get_virtual_best_times(subset))
+        return (int(num_solved), float(par2))
+
+def is_better(score, other):
+    """
+    Returns true if `score` is strictly better than `other`.
+    """
+    if other is None:
+        return True
+    num_solved, par2 = score
+    other_num_solved, other_par2 = other
+    if num_solved != other_num_solved:
+        return num_solved > other_num_solved
+    return par2 < other_par2
+
+def greedy_search(problem, k):
+    """
+    Returns the list of solver indices of a portfolio of size `k` built by
+    repeatedly adding the solver that improves the score the most.
+    """
+    assert isinstance(problem, PortfolioProblem)
+    k = min(k, problem.num_solvers)
+    subset = []
+    current = problem.get_virtual_best_times(subset)
+    solve_times = problem.solve_times
+    for _ in range(k):
+        candidates = [ s for s in range(problem.num_solvers) if s not in subset ]
+        candidate_times = np.minimum(solve_times[candidates], current)
+        num_solved, par2 = problem.score_times(candidate_times)
+        best = None
+        for index, candidate in enumerate(candidates):
+            score = (int(num_solved[index]), float(par2[index]))
+            if best is None or is_better(score, best[1]):
+                best = (candidate, score)
+        subset.append(best[0])
+        current = np.minimum(solve_times[best[0]], current)
+    return subset
+
+class SearchResult:
+    def __init__(self, subset, score, optimal, num_nodes):
+        self.subset = subset
+        self.score = score
+        self.optimal = optimal
+        self.num_nodes = num_nodes
+
+def exact_search(problem, k, initial=None, max_nodes=None):
+    """
+    Find the best portfolio of size `k` with a depth first branch and
+    bound search. `initial` is a portfolio (e.g. from `greedy_search()`)
+    used as the initial incumbent. The search stops after visiting
+    `max_nodes` nodes in which case the result might not be optimal.
+
+    A partial portfolio is pruned if adding the `r` remaining solvers
+    cannot beat the incumbent. The number solved is bounded by the sum of
+    the `r` largest numbers of benchmarks each remaining candidate solves
+    that the partial portfolio doesn't and the PAR-2 score is bounded by
+    adding every remaining candidate.
+    """
+    assert isinstance(problem, PortfolioProblem)
+    full_problem = problem
+    # Benchmarks that no solver solves add the same PAR-2 penalty to every
+    # portfolio so they can be ignored during the search.
+    solvable = np.any(np.isfinite(problem.solve_times), axis=0)
+    problem = PortfolioProblem(
+        problem.names,
+        [ b for b, keep in zip(problem.benchmarks, solvable) if keep ],
+        problem.solve_times[:, solvable],
+        problem.max_time)
+    k = min(k, problem.num_solvers)
+    solve_times = problem.solve_times
+    # Visit strong solvers first so good incumbents are found early.
+    individual = [ problem.score([s]) for s in range(problem.num_solvers) ]
+    order = sorted(range(problem.num_solvers),
+                   key=lambda s: (-individual[s][0], individual[s][1]))
+    ordered_times = solve_times[order]
+    ordered_solved = np.isfinite(ordered_times)
+
+    best_subset = None
+    best_score = None
+    if initial is not None:
+        best_subset = sorted(initial)
+        best_score = problem.score(best_subset)
+    num_nodes = 0
+    complete = True
+
+    def visit(chosen, current, start):
+        nonlocal best_subset, best_score, num_nodes, complete
+        num_nodes += 1
+        if max_nodes is not None and num_nodes > max_nodes:
+            complete = False
+            return
+        remaining = k - len(chosen)
+        if remaining == 0:
+            score = problem.score_times(current)
+            score = (int(score[0]), float(score[1]))
+            if is_better(score, best_score):
+                best_subset = sorted(order[i] for i in chosen)
+                best_score = score
+            return
+        num_candidates = len(order) - start
+        if num_candidates < remaining:
+            return
+        if best_score is not None:
+            unsolved = ~np.isfinite(current)
+            gains = np.sum(ordered_solved[start:] & unsolved, axis=1)
+            num_solved = int(np.sum(~unsolved))
+            upper_num_solved = num_solved + int(
+                np.sum(np.sort(gains)[num_candidates - remaining:]))
+            if upper_num_solved < best_score[0]:
+                return
+            if upper_num_solved == best_score[0]:
+                lower_times = np.minimum(
+                    current, np.min(ordered_times[start:], axis=0))
+                _, lower_par2 = problem.score_times(lower_times)
+                if lower_par2 >= best_score[1]:
+                    return
+        for i in range(start, len(order) - remaining + 1):
+            visit(chosen + [i], np.minimum(current, ordered_times[i]), i + 1)
+            if not complete:
+                return
+
+    visit([], np.full(len(problem.benchmarks), np.inf), 0)
+    return SearchResult(
+        best_subset, full_problem.score(best_subset), complete, num_nodes)
+
+def brute_force_search(problem, k):
+    """
+    Score every portfolio of size `k`. Only useful for checking
+    `exact_search()` on small problems.
+    """
+    best_subset = None
+    best_score = None
+    for subset in itertools.combinations(range(problem.num_solvers), k):
+        score = problem.score(subset)
+        if is_better(score, best_score):
+            best_subset = list(subset)
+            best_score = score
+    return SearchResult(best_subset, best_score, True, None)
+
+def get_schedule_steps(schedule):
+    """
+    Returns the list of `(solver, start_time, time_slice)` steps of
+    `schedule`.
+    """
+    steps = []
+    for core in schedule:
+        start_time = 0.0
+        for solver, time_slice in core:
+            steps.append((solver, start_time, time_slice))
+            start_time += time_slice
+    return steps
+
+def get_schedule_duration(schedule):
+    """
+    Returns the wallclock time `schedule` takes if nothing is solved.
+    """
+    return max([ sum(t for _, t in core) for core in schedule ], default=0.0)
+
+def get_schedule_times(problem, schedules, time_limit):
+    """
+    Returns a `(len(schedules), num_benchmarks)` array of the time each
+    schedule takes to solve each benchmark (`inf` if it is not solved
+    within `time_limit`).
+    """
+    assert isinstance(problem, PortfolioProblem)
+    step_lists = [ get_schedule_steps(schedule) for schedule in schedules ]
+    num_steps = max([ len(steps) for steps in step_lists ], default=0)
+    num_benchmarks = len(problem.benchmarks)
+    times = np.full((len(schedules), num_benchmarks), np.inf)
+    if num_steps == 0:
+        return times
+    # Padding steps have a negative time slice so they never solve anything.
+    solvers = np.zeros((len(schedules), num_steps), dtype=np.int64)
+    start_times = np.zeros((len(schedules), num_steps))
+    time_slices = np.full((len(schedules), num_steps), -1.0)
+    for index, steps in enumerate(step_lists):
+        for step, (solver, start_time, time_slice) in enumerate(steps):
+            solvers[index, step] = solver
+            start_times[index, step] = start_time
+            time_slices[index, step] = time_slice
+    # Evaluate in chunks to bound the size of the temporary arrays.
+    chunk_size = max(1, 2 ** 22 // max(1, num_steps * num_benchmarks))
+    solve_times = problem.solve_times
+    for begin in range(0, len(schedules), chunk_size):
+        end = begin + chunk_size
+        step_solve_times = solve_times[solvers[begin:end]]
+        finish_times = np.where(
+            step_solve_times <= time_slices[begin:end, :, np.newaxis],
+            start_times[begin:end, :, np.newaxis] + step_solve_times,
+            np.inf)
+        times[begin:end] = np.min(finish_times, axis=1)
+    times[times > time_limit] = np.inf
+    return times
+
+def evaluate_schedules(problem, schedules, time_limit):
+    """
+    Returns the tuple `(num_solved, par2)` of arrays with the score of
+    each schedule in `schedules` under `time_limit`.
+    """
+    times = get_schedule_times(problem, schedules, time_limit)
+    solved = np.isfinite(times)
+    num_solved = np.sum(solved, axis=1)
+    par2 = np.sum(np.where(solved, times, 2.0 * time_limit), axis=1)
+    return (num_solved, par2)
+
+def evaluate_schedule(problem, schedule, time_limit):
+    num_solved, par2 = evaluate_schedules(problem, [schedule], time_limit)
+    return (int(num_solved[0]), float(par2[0]))
+
+def _get_best_schedule(problem, schedules, time_limit):
+    num_solved, par2 = evaluate_schedules(problem, schedules, time_limit)
+    best = None
+    for index in range(len(schedules)):
+        score = (int(num_solved[index]), float(par2[index]))
+        if best is None or is_better(score, best[1]):
+            best = (schedules[index], score)
+    return best
+
+def _get_slice_candidates(time_slices, remaining):
+    candidates = set(t for t in time_slices if t <= remaining)
+    candidates.add(remaining)
+    return sorted(candidates)
+
+def greedy_sequential_schedule(problem, time_limit, time_slices, max_steps):
+    """
+    Build a single core schedule with at most `max_steps` steps by
+    repeatedly appending the `(solver, time_slice)` step (with
+    `time_slice` from `time_slices` or the remaining time) that solves the
+    most new benchmarks per second. The last step uses the remaining time.
+    """
+    assert isinstance(problem, PortfolioProblem)
+    solve_times = problem.solve_times
+    core = []
+    start_time = 0.0
+    current = np.full(len(problem.benchmarks), np.inf)
+    while len(core) < max_steps and start_time < time_limit:
+        remaining = time_limit - start_time
+        if len(core) + 1 == max_steps:
+            # The last step gets the rest of the time
+            slice_candidates = [ remaining ]
+        else:
+            slice_candidates = _get_slice_candidates(time_slices, remaining)
+        candidates = [ (solver, t) for solver in range(problem.num_solvers)
+                       for t in slice_candidates ]
+        candidate_solvers = np.array([ c[0] for c in candidates ], dtype=np.int64)
+        candidate_slices = np.array([ c[1] for c in candidates ])
+        solves = solve_times[candidate_solvers] <= candidate_slices[:, np.newaxis]
+        gains = np.sum(solves & np.isinf(current), axis=1)
+        if np.max(gains) == 0:
+            break
+        # Most new benchmarks per second, then the shortest time slice
+        best = np.lexsort((candidate_slices, -gains / candidate_slices))[0]
+        solver, time_slice = candidates[best]
+        current = np.minimum(current, np.where(
+            solves[best], start_time + solve_times[solver], np.inf))
+        core.append((solver, float(time_slice)))
+        start_time += time_slice
+    return [ core ]
+
+def improve_sequential_schedule(problem, time_limit, schedule, time_slices,
+                                max_steps, max_rounds=100):
+    """
+    Hill climb from the single core `schedule` by repeatedly moving to the
+    best neighbouring schedule. Neighbours change the solver or time slice
+    of a step, swap adjacent steps, remove a step or append a step. Every
+    round evaluates all neighbours at once.
+    """
+    assert len(schedule) == 1
+    best_core = list(schedule[0])
+    best_score = evaluate_schedule(problem, [best_core], time_limit)
+    for _ in range(max_rounds):
+        neighbours = []
+        for i, (solver, time_slice) in enumerate(best_core):
+            others = best_core[:i] + best_core[i + 1:]
+            remaining = time_limit - sum(t for _, t in others)
+            for other_solver in range(problem.num_solvers):
+                if other_solver != solver:
+                    neighbours.append(best_core[:i] + [(other_solver, time_slice)] +
+                                      best_core[i + 1:])
+            for t in _get_slice_candidates(time_slices, remaining):
+                if t != time_slice:
+                    neighbours.append(best_core[:i] + [(solver, t)] + best_core[i + 1:])
+            if i + 1 < len(best_core):
+                swapped = list(best_core)
+                swapped[i], swapped[i + 1] = swapped[i + 1], swapped[i]
+                neighbours.append(swapped)
+            neighbours.append(others)
+        remaining = time_limit - sum(t for _, t in best_core)
+        if len(best_core) < max_steps and remaining > 0.0:
+            for solver in range(problem.num_solvers):
+                for t in _get_slice_candidates(time_slices, remaining):
+                    neighbours.append(best_core + [(solver, t)])
+        if len(neighbours) == 0:
+            break
+        core, score = _get_best_schedule(
+            problem, [ [n] for n in neighbours ], time_limit)
+        if not is_better(score, best_score):
+            break
+        best_core = core[0]
+        best_score = score
+    return [ best_core ]
+
+def best_parallel_schedule(problem, num_cores, time_limit, max_nodes=None):
+    """
+    Returns the tuple `(schedule, search_result)` for the best schedule
+    that runs one solver per core for `time_limit` (see `exact_search()`).
+    """
+    assert isinstance(problem, PortfolioProblem)
+    solve_times = np.where(
+        problem.solve_times <= time_limit, problem.solve_times, np.inf)
+    limited = PortfolioProblem(
+        problem.names, problem.benchmarks, solve_times, time_limit)
+    result = exact_search(
+        limited, num_cores, initial=greedy_search(limited, num_cores),
+        max_nodes=max_nodes)
+    return ([ [(solver, time_limit)] for solver in result.subset ], result)
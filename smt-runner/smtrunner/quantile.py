@@ -0,0 +1,265 @@
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Computation of the points of quantile (cactus) plots.
+
+The points of every result info file being plotted are computed at once
+from `ResultTable`s rather than by walking the result dictionaries. The
+computed points can be saved to a sidecar file so that a plot can be
+redrawn (e.g. with different fonts or legend) without loading the result
+info files again.
+"""
+import json
+import logging
+import os
+import numpy as np
+from . import analysis
+from . import DerivedFieldCache
+
+_logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+class QuantilePoints:
+    """
+    The points of a single curve of a quantile plot.
+
+    `x_points` and `y_points` are lists and `y_errors` is a list of two
+    lists (the lower and upper errors of each point) as expected by
+    matplotlib. The first point is a dummy point that summarises the
+    number of negative scores. `point_index_to_benchmark_name_map` gives
+    the benchmark for each point.
+    """
+    def __init__(self, x_points, y_points, y_errors,
+                 point_index_to_benchmark_name_map, num_positive,
+                 num_negative, num_zero, x_label=None, y_label=None):
+        assert len(x_points) == len(y_points)
+        assert len(y_errors) == 2
+        assert len(y_errors[0]) == len(y_points)
+        assert len(y_errors[1]) == len(y_points)
+        assert len(point_index_to_benchmark_name_map) == len(y_points)
+        self.x_points = x_points
+        self.y_points = y_points
+        self.y_errors = y_errors
+        self.point_index_to_benchmark_name_map = point_index_to_benchmark_name_map
+        self.num_positive = num_positive
+        self.num_negative = num_negative
+        self.num_zero = num_zero
+        self.x_label = x_label
+        self.y_label = y_label
+
+    @classmethod
+    def from_scores(cls, ri_scores):
+        """
+        Create from an object that has computed its points in the same
+        attributes as `QuantilePoints` (e.g. the score classes of
+        `result-info-plot-quantile-plot.py`).
+        """
+        return cls(
+            list(ri_scores.x_points),
+            list(ri_scores.y_points),
+            [ list(ri_scores.y_errors[0]), list(ri_scores.y_errors[1]) ],
+            list(ri_scores.point_index_to_benchmark_name_map),
+            ri_scores.num_positive,
+            ri_scores.num_negative,
+            ri_scores.num_zero,
+            ri_scores.x_label,
+            ri_scores.y_label)
+
+    def get_y_mean_bounds(self):
+        """
+        Return a tuple for the bounds of the arithmetic mean
+        of the y-points, excluding the dummy point.
+        (min_mean_y, mean_y, max_mean_y)
+        """
+        y_values = np.array(self.y_points[1:], dtype=np.float64)
+        y_minus = np.array(self.y_errors[0][1:], dtype=np.float64)
+        y_plus = np.array(self.y_errors[1][1:], dtype=np.float64)
+        assert len(y_values) > 1
+        assert np.all(y_values >= 0.0)
+        assert np.all(y_minus >= 0.0)
+        assert np.all(y_plus >= 0.0)
+        return (float(np.mean(y_values - y_minus)),
+                float(np.mean(y_values)),
+                float(np.mean(y_values + y_plus)))
+
+    def get_solved_counts(self, thresholds):
+        """
+        Returns an array with the number of points (excluding the dummy
+        point) with a y value less than or equal to each of `thresholds`.
+        """
+        y_values = np.sort(np.array(self.y_points[1:], dtype=np.float64))
+        return np.searchsorted(
+            y_values, np.asarray(thresholds, dtype=np.float64), side='right')
+
+def get_time_scores(table):
+    """
+    Returns a boolean array that is `True` for the rows of `table` that
+    have a positive score, i.e. whose (merged) event tag is `sat`.
+
+    Merged event tags are computed like
+    `event_analysis.merge_aggregate_events()`.
+    """
+    if not table.has_field('event_tag'):
+        return np.zeros(table.num_rows, dtype=bool)
+    codes = table.codes('event_tag')
+    exists = ~np.isnan(table.numeric('wallclock_time'))
+    first = codes[:, 0]
+    all_same = np.all((codes == first[:, np.newaxis]) | ~exists, axis=1)
+    sat_count = np.sum(table.equals('event_tag', 'sat') & exists, axis=1)
+    unsat_but_expected_sat_count = np.sum(
+        table.equals('event_tag', 'unsat_but_expected_sat') & exists, axis=1)
+    timeout_count = np.sum(
+        (table.equals('event_tag', 'timeout') |
+         table.equals('event_tag', 'soft_timeout')) & exists, axis=1)
+    mixed_is_sat = ((sat_count >= unsat_but_expected_sat_count) &
+                    (sat_count >= timeout_count))
+    num_conflicts = int(np.sum(~all_same))
+    if num_conflicts > 0:
+        _logger.warning('Conflicts found when merging event tags of {} results'.format(
+            num_conflicts))
+    is_sat = np.where(all_same, table.equals('event_tag', 'sat')[:, 0], mixed_is_sat)
+    return is_sat & (first != -1)
+
+def compute_time_points(tables, max_time, time_prefs,
+                        confidence_interval_factor, index_to_num_results=None):
+    """
+    Compute the points of the quantile plot of execution times for each
+    `ResultTable` in `tables`. Returns a list of `QuantilePoints`.
+
+    The positively scoring results of each table are sorted by their mean
+    execution time and have error bars given by `confidence_interval_factor`.
+    Bounds that reach `max_time` are replaced by `max_time` like
+    `analysis.get_exec_time_with_bounds()` does.
+
+    `index_to_num_results` is the number of results in each result info
+    file (which may include error results that tables do not have). It is
+    only used to count the zero scores.
+    """
+    num_tables = len(tables)
+    if index_to_num_results is None:
+        index_to_num_results = [ t.num_rows for t in tables ]
+    num_rows = max([ t.num_rows for t in tables ] + [0])
+    num_runs = max([ t.num_runs for t in tables ] + [1])
+    # Pad tables with fewer rows or runs with NaN so that every table is
+    # handled in one go.
+    times = np.full((num_tables, num_rows, num_runs), np.nan)
+    positive = np.zeros((num_tables, num_rows), dtype=bool)
+    for index, table in enumerate(tables):
+        times[index, :table.num_rows, :table.num_runs] = table.get_exec_times(time_prefs)
+        positive[index, :table.num_rows] = get_time_scores(table)
+    lower, mean, upper = analysis.get_arithmetic_means_and_confidence_intervals(
+        times, confidence_interval_factor)
+    if max_time is not None:
+        assert max_time > 0.0
+        reached_max_time = upper >= max_time
+        lower = np.where(reached_max_time, max_time, lower)
+        mean = np.where(reached_max_time, max_time, mean)
+        upper = np.where(reached_max_time, max_time, upper)
+    # Sort the positive results of each table by mean execution time.
+    # A stable sort keeps results with the same time in file order.
+    order = np.argsort(np.where(positive, mean, np.inf), axis=1, kind='stable')
+    num_positives = np.sum(positive, axis=1)
+
+    index_to_points = []
+    for index, table in enumerate(tables):
+        num_positive = int(num_positives[index])
+        rows = order[index, :num_positive]
+        y_values = mean[index, rows]
+        lower_errors = np.abs(y_values - lower[index, rows])
+        upper_errors = np.abs(upper[index, rows] - y_values)
+        benchmarks = table.decode('benchmark', table.codes('benchmark')[rows])
+        # The dummy point uses the time of the fastest positive result to
+        # avoid a big discontinuity at the start of the curve.
+        dummy_point_time = 0.0
+        if num_positive == 0:
+            _logger.warning('Using {} as dummy point time'.format(dummy_point_time))
+        else:
+            dummy_point_time = float(y_values[0])
+        index_to_points.append(QuantilePoints(
+            list(range(num_positive + 1)),
+            [ dummy_point_time ] + y_values.tolist(),
+            [ [0.0] + lower_errors.tolist(), [0.0] + upper_errors.tolist() ],
+            [ 'dummy_point' ] + benchmarks,
+            num_positive,
+            0,
+            index_to_num_results[index] - num_positive,
+            'Accumulated score',
+            'Runtime (s)'))
+    return index_to_points
+
+def get_points_cache_inputs(paths, parameters):
+    """
+    Returns the JSON serializable description of the inputs of a plot
+    that a points cache must match to be used. `parameters` are the
+    options that affect the computed points.
+    """
+    return {
+        'version': CACHE_VERSION,
+        'parameters': parameters,
+        'files': [ DerivedFieldCache.get_file_signature(os.path.abspath(p))
+                   for p in paths ],
+    }
+
+def save_points(path, inputs, index_to_points):
+    """
+    Save `index_to_points` (a list of `QuantilePoints`) computed from
+    `inputs` (see `get_points_cache_inputs()`) to the sidecar file `path`.
+    """
+    metadata = {
+        'inputs': inputs,
+        'curves': [ {
+            'num_positive': points.num_positive,
+            'num_negative': points.num_negative,
+            'num_zero': points.num_zero,
+            'x_label': points.x_label,
+            'y_label': points.y_label,
+        } for points in index_to_points ],
+    }
+    arrays = { 'metadata': np.array(json.dumps(metadata, sort_keys=True)) }
+    for index, points in enumerate(index_to_points):
+        prefix = '{}_'.format(index)
+        arrays[prefix + 'x'] = np.array(points.x_points, dtype=np.int64)
+        arrays[prefix + 'y'] = np.array(points.y_points, dtype=np.float64)
+        arrays[prefix + 'y_lower_errors'] = np.array(points.y_errors[0], dtype=np.float64)
+        arrays[prefix + 'y_upper_errors'] = np.array(points.y_errors[1], dtype=np.float64)
+        arrays[prefix + 'benchmarks'] = np.array(
+            points.point_index_to_benchmark_name_map, dtype=np.str_)
+    _logger.info('Writing points cache "{}"'.format(path))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+def load_points(path, inputs):
+    """
+    Returns the list of `QuantilePoints` in the sidecar file `path` or
+    `None` if it does not exist or was computed from different `inputs`.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            metadata = json.loads(str(data['metadata']))
+            if metadata['inputs'] != json.loads(json.dumps(inputs)):
+                _logger.info('Points cache "{}" is out of date'.format(path))
+                return None
+            index_to_points = []
+            for index, curve in enumerate(metadata['curves']):
+                prefix = '{}_'.format(index)
+                index_to_points.append(QuantilePoints(
+                    data[prefix + 'x'].tolist(),
+                    data[prefix + 'y'].tolist(),
+                    [ data[prefix + 'y_lower_errors'].tolist(),
+                      data[prefix + 'y_upper_errors'].tolist() ],
+                    data[prefix + 'benchmarks'].tolist(),
+                    curve['num_positive'],
+                    curve['num_negative'],
+                    curve['num_zero'],
+                    curve['x_label'],
+                    curve['y_label']))
+    except (OSError, ValueError, KeyError) as e:
+        _logger.warning('Ignoring corrupt points cache "{}": {}'.format(path, e))
+        return None
+    _logger.info('Loaded points of {} result infos from "{}"'.format(
+        len(index_to_points), path))
+    return index_to_points
@@ -0,0 +1,65 @@
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Parsing of the files a solver run leaves in its working directory.
+
+These are shared by the tools that derive fields of result infos (e.g.
+`sat` and `dsoes_wallclock_time`) and by runners that need to know the
+answer of a solver while it runs.
+"""
+import json
+import logging
+import os
+import re
+
+_logger = logging.getLogger(__name__)
+
+RE_SAT_RESPONSE = re.compile(r'^\s*(sat|unsat|unknown)')
+
+def join_path(base_path, path):
+    """
+    Join `path` from a result info (e.g. `working_directory`), which
+    starts with `/`, onto `base_path`.
+    """
+    if path.startswith('/'):
+        path = path[1:]
+    return os.path.join(base_path, path)
+
+def get_sat(stdout_log_path):
+    """
+    Returns the tuple (<sat>, <failed>) where <sat> is the satisfiability
+    result (`sat`, `unsat` or `unknown`) on the first line of the solver
+    output in `stdout_log_path` and <failed> is `True` if the first line
+    was not a satisfiability result (in which case <sat> is `unknown`).
+    """
+    if not os.path.exists(stdout_log_path):
+        _logger.error('"{}" does not exist'.format(stdout_log_path))
+        raise Exception('missing file')
+    with open(stdout_log_path, 'r') as f:
+        first_line = f.readline()
+    _logger.debug('Got first line \"{}\"'.format(first_line))
+    m = RE_SAT_RESPONSE.match(first_line)
+    if m:
+        return (m.group(1), False)
+    _logger.warning('Failed to read sat result from "{}"'.format(stdout_log_path))
+    return ('unknown', True)
+
+def get_dsoes_wallclock_time(working_directory_path):
+    """
+    Returns the tuple (<dsoes_wallclock_time>, <failed>) where
+    <dsoes_wallclock_time> is the wallclock time (in seconds) recorded by
+    docker-stats-on-exit-shim in the `exit_stats.json` file in
+    `working_directory_path`. <dsoes_wallclock_time> is `None` if <failed>
+    is `True`.
+    """
+    exit_stats_file_path = os.path.join(working_directory_path, 'exit_stats.json')
+    if not os.path.exists(exit_stats_file_path):
+        _logger.error('"{}" does not exist'.format(exit_stats_file_path))
+        return (None, True)
+    try:
+        with open(exit_stats_file_path, 'r') as f:
+            stats = json.load(f)
+            return (stats["wall_time"] / (10**9), False)
+    except Exception as e:
+        _logger.error('Failed to retrieve stats from "{}"'.format(exit_stats_file_path))
+        _logger.error(e)
+    return (None, True)
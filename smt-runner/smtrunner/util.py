@@ -16,18 +16,66 @@ def loadYaml(openFile):
         _loader = yaml.Loader
     return yaml.load(openFile, Loader=_loader)
 
-def writeYaml(openFile, data):
+def _getDumper():
     if hasattr(yaml, 'CDumper'):
         # Use libyaml which is faster
-        _dumper = yaml.CDumper
-    else:
-        _logger.warning('Using slow Python YAML dumper')
-        _dumper = yaml.Dumper
+        return yaml.CDumper
+    _logger.warning('Using slow Python YAML dumper')
+    return yaml.Dumper
+
+def writeYaml(openFile, data):
+    if isinstance(data, dict) and isinstance(data.get('results', None), list):
+        # Stream the results so that a serialized copy of the whole
+        # document is never held in memory.
+        header = { k: v for k, v in data.items() if k != 'results' }
+        writeYamlStream(openFile, header, data['results'])
+        return
+    _dumper = _getDumper()
     _logger.info('Writing "{}"'.format(openFile.name))
     as_yaml = yaml.dump(data, default_flow_style=False, Dumper=_dumper)
     openFile.write(as_yaml)
     return
 
+def writeYamlStream(openFile, header, results, validateRecord=None):
+    """
+      Write the mapping ``header`` with an additional ``results`` key
+      whose entries are taken from the iterable ``results`` (e.g. a
+      generator) one at a time. The output is the same as writing
+      ``header`` with ``results`` as a list using ``writeYaml()`` but
+      only a single result needs to be in memory at a time.
+
+      If ``validateRecord`` is not ``None`` it is called with each result
+      and its index (e.g. ``ResultInfo.validateResultInfoRecord``) before
+      the result is written and should throw if the result is invalid.
+    """
+    assert isinstance(header, dict)
+    assert 'results' not in header
+    _dumper = _getDumper()
+    _logger.info('Writing "{}"'.format(openFile.name))
+    # Keys are emitted in sorted order like `yaml.dump()` does.
+    keys = sorted(header.keys())
+    for key in keys:
+        if key < 'results':
+            openFile.write(yaml.dump(
+                { key: header[key] }, default_flow_style=False, Dumper=_dumper))
+    numResults = 0
+    for r in results:
+        if validateRecord is not None:
+            validateRecord(r, index=numResults)
+        if numResults == 0:
+            openFile.write('results:\n')
+        # A block sequence inside a mapping is not indented so each
+        # result can be written as a single item sequence.
+        openFile.write(yaml.dump([r], default_flow_style=False, Dumper=_dumper))
+        numResults += 1
+    if numResults == 0:
+        openFile.write('results: []\n')
+    for key in keys:
+        if key > 'results':
+            openFile.write(yaml.dump(
+                { key: header[key] }, default_flow_style=False, Dumper=_dumper))
+    return numResults
+
 def set_font_type(font_type):
     assert isinstance(font_type, int)
     import matplotlib
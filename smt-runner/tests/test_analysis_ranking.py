@@ -0,0 +1,241 @@
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Check that `analysis.rank_result_info_groups_by_execution_time()`, which
+ranks every benchmark at once with `rank_by_execution_time_batched()`,
+gives the same rankings as ranking each benchmark on its own with
+`analysis.rank_by_execution_time()`.
+"""
+import math
+import os
+import random
+import sys
+import unittest
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _REPO_ROOT)
+
+from smtrunner import analysis, ResultInfo, ResultInfoUtil
+
+_MERGED_DATA_DIR = os.path.join(
+    os.path.dirname(_REPO_ROOT), 'data', 'experiments', 'merged')
+
+TIME_PREFS = ['dsoes_wallclock', 'wallclock']
+
+# Loading every solver's results is slow so only a few are ranked.
+_MERGED_DATA_SOLVERS = [ 'bitwuzla', 'colibri', 'cvc5', 'mathsat5', 'xsat', 'z3' ]
+
+
+def rank_group(group, max_time, time_prefs, rank_unknown):
+    """
+    Rank the result infos (one per solver) in `group` one at a time the
+    way the tools did before ranking was batched.
+    """
+    modified_group = []
+    indices_to_use = []
+    for index, ri in enumerate(group):
+        sat, _ = analysis.get_sat_from_result_info(ri)
+        if sat != 'unknown':
+            modified_group.append(ri)
+            indices_to_use.append(index)
+        elif rank_unknown:
+            modified_group.append(analysis.get_result_with_modified_time(ri, max_time))
+            indices_to_use.append(index)
+        else:
+            modified_group.append(ri)
+    if len(indices_to_use) == 0:
+        return None
+    return analysis.rank_by_execution_time(
+        modified_group,
+        indices_to_use,
+        max_time,
+        analysis.get_arithmetic_mean_and_99_confidence_intervals,
+        time_prefs)
+
+
+def make_result(benchmark, sat, times, dsoes_times=None):
+    """
+    Make a result info with one run for each time in `times`. A single
+    time gives an unmerged result info.
+    """
+    if dsoes_times is None:
+        dsoes_times = [ None ] * len(times)
+    if len(times) == 1:
+        return {
+            'benchmark': benchmark,
+            'sat': sat[0],
+            'wallclock_time': times[0],
+            'dsoes_wallclock_time': dsoes_times[0],
+            'user_cpu_time': None,
+            'sys_cpu_time': None,
+        }
+    return {
+        'benchmark': benchmark,
+        'sat': list(sat),
+        'wallclock_time': list(times),
+        'dsoes_wallclock_time': list(dsoes_times),
+        'user_cpu_time': [ None ] * len(times),
+        'sys_cpu_time': [ None ] * len(times),
+    }
+
+
+def make_random_group(rng, benchmark, num_solvers, num_runs, max_time):
+    # Few distinct base times so that exact and near ties are common.
+    base_times = [ 0.5, 1.0, 1.0 + 1e-13, 2.0, max_time - 0.1, max_time, max_time + 3.0 ]
+    group = []
+    for _ in range(num_solvers):
+        base = rng.choice(base_times)
+        noise = rng.choice([ 0.0, 0.0, 0.01, 0.5 ])
+        times = [ max(0.0, base + rng.uniform(-noise, noise)) for _ in range(num_runs) ]
+        kind = rng.random()
+        if kind < 0.6:
+            sat = [ 'sat' ] * num_runs
+        elif kind < 0.75:
+            # Unknown (e.g. a timeout or an error)
+            sat = [ 'unknown' ] * num_runs
+        elif kind < 0.9:
+            # Some runs answered
+            sat = [ rng.choice([ 'unsat', 'unknown' ]) for _ in range(num_runs) ]
+        else:
+            # Conflicting answers count as unknown
+            sat = [ 'sat', 'unsat' ] * num_runs
+            sat = sat[:num_runs]
+        dsoes_times = None
+        if rng.random() < 0.5:
+            dsoes_times = [ t * 0.99 for t in times ]
+        group.append(make_result(benchmark, sat, times, dsoes_times))
+    return group
+
+
+class RankResultInfoGroupsTest(unittest.TestCase):
+    def assertRankingsMatch(self, groups, max_time, rank_unknown, time_prefs=TIME_PREFS):
+        rankings = analysis.rank_result_info_groups_by_execution_time(
+            groups,
+            max_time,
+            analysis.CONFIDENCE_INTERVAL_FACTOR_99,
+            time_prefs,
+            rank_unknown=rank_unknown)
+        self.assertEqual(len(rankings), len(groups))
+        for group, ranking in zip(groups, rankings):
+            expected = rank_group(group, max_time, time_prefs, rank_unknown)
+            msg = 'Ranking of {}'.format(group[0]['benchmark'])
+            if expected is None:
+                self.assertIsNone(ranking, msg)
+                continue
+            self.assertIsNotNone(ranking, msg)
+            expected_indices, expected_bounds = expected
+            indices, bounds = ranking
+            self.assertEqual(indices, expected_indices, msg)
+            self.assertEqual(len(bounds), len(expected_bounds), msg)
+            for bound_group, expected_bound_group in zip(bounds, expected_bounds):
+                self.assertEqual(len(bound_group), len(expected_bound_group), msg)
+                for bound, expected_bound in zip(bound_group, expected_bound_group):
+                    for value, expected_value in zip(bound, expected_bound):
+                        self.assertTrue(
+                            math.isclose(value, expected_value, rel_tol=1e-9, abs_tol=1e-9),
+                            '{}: bound {} != {}'.format(msg, bound, expected_bound))
+
+    def test_exact_ties(self):
+        groups = [
+            [ make_result('a', ['sat'] * 3, [1.0, 2.0, 3.0]),
+              make_result('a', ['sat'] * 3, [1.0, 2.0, 3.0]),
+              make_result('a', ['unsat'] * 3, [0.5, 0.5, 0.5]) ],
+            [ make_result('b', ['sat'] * 2, [2.0, 2.0]),
+              make_result('b', ['sat'] * 2, [2.0, 2.0]),
+              make_result('b', ['sat'] * 2, [2.0, 2.0]) ],
+        ]
+        self.assertRankingsMatch(groups, 10.0, True)
+        rankings = analysis.rank_result_info_groups_by_execution_time(
+            groups, 10.0, analysis.CONFIDENCE_INTERVAL_FACTOR_99, TIME_PREFS)
+        self.assertEqual(rankings[1][0], [[0, 1, 2]])
+
+    def test_near_ties(self):
+        groups = [
+            [ make_result('a', ['sat'] * 2, [1.0, 1.0]),
+              make_result('a', ['sat'] * 2, [1.0 + 1e-13, 1.0 + 1e-13]),
+              make_result('a', ['sat'] * 2, [1.0 - 1e-13, 1.0 - 1e-13]) ],
+        ]
+        self.assertRankingsMatch(groups, 10.0, True)
+
+    def test_single_runs(self):
+        groups = [
+            [ make_result('a', ['sat'], [3.0]),
+              make_result('a', ['sat'], [1.0], [0.9]),
+              make_result('a', ['unknown'], [10.0]) ],
+            [ make_result('b', ['unsat'], [2.0]),
+              make_result('b', ['unsat'], [2.0]),
+              make_result('b', ['unsat'], [2.5]) ],
+        ]
+        self.assertRankingsMatch(groups, 10.0, True)
+        self.assertRankingsMatch(groups, 10.0, False)
+
+    def test_unknown(self):
+        groups = [
+            # Nothing to rank unless unknown results are ranked
+            [ make_result('a', ['unknown'] * 2, [10.0, 10.0]),
+              make_result('a', ['unknown'] * 2, [4.0, 5.0]) ],
+            # Conflicting answers are unknown
+            [ make_result('b', ['sat', 'unsat'], [1.0, 1.0]),
+              make_result('b', ['unknown', 'sat'], [12.0, 2.0]),
+              make_result('b', ['sat', 'sat'], [3.0, 3.5]) ],
+        ]
+        self.assertRankingsMatch(groups, 10.0, True)
+        self.assertRankingsMatch(groups, 10.0, False)
+        rankings = analysis.rank_result_info_groups_by_execution_time(
+            groups, 10.0, analysis.CONFIDENCE_INTERVAL_FACTOR_99, TIME_PREFS,
+            rank_unknown=False)
+        self.assertIsNone(rankings[0])
+
+    def test_max_time_clamping(self):
+        groups = [
+            [ make_result('a', ['sat'] * 3, [9.9, 10.0, 10.1]),
+              make_result('a', ['sat'] * 3, [15.0, 15.0, 15.0]),
+              make_result('a', ['unknown'] * 3, [10.0, 10.0, 10.0]),
+              make_result('a', ['sat'] * 3, [9.0, 9.5, 9.0]) ],
+            [ make_result('b', ['sat'], [10.0]),
+              make_result('b', ['sat'], [11.0]),
+              make_result('b', ['sat'], [9.99]) ],
+        ]
+        self.assertRankingsMatch(groups, 10.0, True)
+        self.assertRankingsMatch(groups, 10.0, False)
+
+    def test_uneven_group_sizes(self):
+        groups = [
+            [ make_result('a', ['sat'] * 2, [1.0, 1.5]) ],
+            [ make_result('b', ['sat'] * 2, [2.0, 2.0]),
+              make_result('b', ['sat'] * 2, [1.0, 1.0]),
+              make_result('b', ['sat'] * 2, [3.0, 3.0]) ],
+        ]
+        self.assertRankingsMatch(groups, 10.0, True)
+
+    def test_random_merged_groups(self):
+        rng = random.Random(0)
+        max_time = 10.0
+        for num_runs in [ 1, 2, 3, 10 ]:
+            groups = [
+                make_random_group(rng, 'b{}'.format(index), rng.randint(1, 6), num_runs, max_time)
+                for index in range(200) ]
+            for rank_unknown in [ True, False ]:
+                with self.subTest(num_runs=num_runs, rank_unknown=rank_unknown):
+                    self.assertRankingsMatch(groups, max_time, rank_unknown)
+
+    def test_merged_experiment_data(self):
+        experiment = os.path.join(_MERGED_DATA_DIR, 'smtlib_qf_fp')
+        paths = [ os.path.join(experiment, solver, 'output_merged.yml')
+                  for solver in _MERGED_DATA_SOLVERS ]
+        paths = [ path for path in paths if os.path.exists(path) ]
+        if len(paths) < 2:
+            self.skipTest('No merged experiment data in "{}"'.format(experiment))
+        result_infos = []
+        for path in paths:
+            with open(path, 'r') as f:
+                result_infos.append(ResultInfo.loadRawResultInfos(f))
+        key_to_result_infos, _ = ResultInfoUtil.group_result_infos_by(result_infos)
+        keys = sorted(key_to_result_infos.keys())
+        groups = [ key_to_result_infos[key] for key in keys ]
+        for rank_unknown in [ True, False ]:
+            with self.subTest(rank_unknown=rank_unknown):
+                self.assertRankingsMatch(groups, 900.0, rank_unknown)
+
+
+if __name__ == '__main__':
+    unittest.main()
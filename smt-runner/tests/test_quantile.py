@@ -0,0 +1,193 @@
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Tests for the quantile plot points computed by `smtrunner.quantile`.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _REPO_ROOT)
+
+from smtrunner import analysis, quantile, ResultInfo, ResultTable
+
+TIME_PREFS = ['dsoes_wallclock', 'wallclock']
+
+# Half width of the 99% confidence interval of two runs that are 2s apart
+# (their standard error in the mean is 1s).
+CI_99 = analysis.CONFIDENCE_INTERVAL_FACTOR_99
+
+
+def result(benchmark, event_tag, wallclock_time):
+    """
+    Make a result. `event_tag` and `wallclock_time` are lists for merged
+    results.
+    """
+    tags = event_tag if isinstance(event_tag, list) else [ event_tag ]
+    sat = [ 'sat' if tag == 'sat' else 'unknown' for tag in tags ]
+    r = {
+        'benchmark': benchmark,
+        'expected_sat': 'sat',
+        'is_trivial': False,
+        'event_tag': event_tag,
+        'sat': sat if isinstance(event_tag, list) else sat[0],
+        'wallclock_time': wallclock_time,
+    }
+    return r
+
+
+def result_infos(*results):
+    return { 'schema_version': 0, 'results': list(results) }
+
+
+def compute_points(index_to_result_infos, max_time, tables=None, index_to_num_results=None):
+    if tables is None:
+        tables = [ ResultTable.ResultTable.from_raw_result_infos(ris)
+                   for ris in index_to_result_infos ]
+    return quantile.compute_time_points(
+        tables,
+        max_time=max_time,
+        time_prefs=TIME_PREFS,
+        confidence_interval_factor=CI_99,
+        index_to_num_results=index_to_num_results)
+
+
+class ComputeTimePointsTest(unittest.TestCase):
+    def assertCurve(self, points, benchmarks, y_points, y_errors=None, num_zero=0):
+        """
+        Check `points` is the curve of the positive `benchmarks` (in
+        order) with times `y_points` and errors `y_errors` (the lower and
+        upper error of each benchmark, zero by default). The dummy point
+        is checked implicitly.
+        """
+        if y_errors is None:
+            y_errors = [ (0.0, 0.0) ] * len(benchmarks)
+        dummy_y = y_points[0] if len(y_points) > 0 else 0.0
+        self.assertEqual(points.x_points, list(range(len(benchmarks) + 1)))
+        self.assertEqual(points.point_index_to_benchmark_name_map,
+                         [ 'dummy_point' ] + benchmarks)
+        self.assertEqual(len(points.y_points), len(benchmarks) + 1)
+        for actual, expected in zip(points.y_points, [ dummy_y ] + y_points):
+            self.assertAlmostEqual(actual, expected)
+        for actual, expected in zip(points.y_errors[0], [ 0.0 ] + [ e[0] for e in y_errors ]):
+            self.assertAlmostEqual(actual, expected)
+        for actual, expected in zip(points.y_errors[1], [ 0.0 ] + [ e[1] for e in y_errors ]):
+            self.assertAlmostEqual(actual, expected)
+        self.assertEqual(points.num_positive, len(benchmarks))
+        self.assertEqual(points.num_negative, 0)
+        self.assertEqual(points.num_zero, num_zero)
+        self.assertEqual(points.x_label, 'Accumulated score')
+        self.assertEqual(points.y_label, 'Runtime (s)')
+
+    def test_dummy_point_uses_fastest_time(self):
+        ris = result_infos(
+            result('a', 'sat', 3.0),
+            result('b', 'timeout', 10.0),
+            result('c', 'sat', 1.5),
+            result('d', 'unsat_but_expected_sat', 0.5))
+        points, = compute_points([ ris ], 10.0)
+        self.assertCurve(points, [ 'c', 'a' ], [ 1.5, 3.0 ], num_zero=2)
+        self.assertEqual(points.y_points[0], 1.5)
+
+    def test_no_positive_results(self):
+        ris = result_infos(
+            result('a', 'timeout', 10.0),
+            result('b', [ 'timeout', 'timeout' ], [ 10.0, 10.0 ]))
+        points, = compute_points([ ris ], 10.0)
+        self.assertCurve(points, [], [], num_zero=2)
+        self.assertEqual(points.y_points, [ 0.0 ])
+
+    def test_ties_keep_file_order(self):
+        ris = result_infos(
+            result('a', [ 'sat' ] * 2, [ 2.0, 2.0 ]),
+            result('b', [ 'sat' ] * 2, [ 1.0, 3.0 ]),
+            result('c', [ 'sat' ] * 2, [ 1.0, 1.0 ]),
+            result('d', [ 'sat' ] * 2, [ 2.0, 2.0 ]))
+        points, = compute_points([ ris ], 10.0)
+        self.assertCurve(
+            points,
+            [ 'c', 'a', 'b', 'd' ],
+            [ 1.0, 2.0, 2.0, 2.0 ],
+            [ (0.0, 0.0), (0.0, 0.0), (CI_99, CI_99), (0.0, 0.0) ])
+
+    def test_max_time_clamping(self):
+        ris = result_infos(
+            result('a', [ 'sat' ] * 2, [ 9.0, 11.0 ]),
+            result('b', [ 'sat' ] * 2, [ 12.0, 12.0 ]),
+            # The mean is below the max time but the interval reaches it
+            result('c', [ 'sat' ] * 2, [ 7.0, 9.0 ]),
+            result('d', [ 'sat' ] * 2, [ 5.0, 5.0 ]))
+        points, = compute_points([ ris ], 10.0)
+        self.assertCurve(points, [ 'd', 'a', 'b', 'c' ], [ 5.0, 10.0, 10.0, 10.0 ])
+
+        points, = compute_points([ ris ], None)
+        self.assertCurve(
+            points,
+            [ 'd', 'c', 'a', 'b' ],
+            [ 5.0, 8.0, 10.0, 12.0 ],
+            [ (0.0, 0.0), (CI_99, CI_99), (CI_99, CI_99), (0.0, 0.0) ])
+
+    def test_merged_event_tags(self):
+        ris = result_infos(
+            # More sat runs than timeouts
+            result('a', [ 'sat', 'timeout', 'sat' ], [ 1.0, 1.0, 1.0 ]),
+            # More timeouts than sat runs
+            result('b', [ 'timeout', 'timeout', 'sat' ], [ 2.0, 2.0, 2.0 ]),
+            result('c', [ 'sat', 'unsat_but_expected_sat', 'unsat_but_expected_sat' ],
+                   [ 3.0, 3.0, 3.0 ]))
+        points, = compute_points([ ris ], 10.0)
+        self.assertCurve(points, [ 'a' ], [ 1.0 ], num_zero=2)
+
+    def test_zero_scores_include_error_results(self):
+        ris = result_infos(
+            result('a', 'sat', 1.0),
+            result('b', 'timeout', 10.0))
+        points, = compute_points([ ris ], 10.0, index_to_num_results=[ 4 ])
+        self.assertCurve(points, [ 'a' ], [ 1.0 ], num_zero=3)
+
+    def test_tables_with_different_shapes(self):
+        # Computed together the tables are padded to the same number of
+        # rows and runs. Padding must not change their curves.
+        first = result_infos(
+            result('a', 'sat', 4.0),
+            result('b', 'sat', 2.0),
+            result('c', 'timeout', 10.0))
+        second = result_infos(
+            result('a', [ 'sat' ] * 3, [ 1.0, 1.0, 1.0 ]))
+        first_points, second_points = compute_points([ first, second ], 10.0)
+        self.assertCurve(first_points, [ 'b', 'a' ], [ 2.0, 4.0 ], num_zero=1)
+        self.assertCurve(second_points, [ 'a' ], [ 1.0 ])
+
+    def test_binary_file_with_error_results(self):
+        ris = result_infos(
+            result('a', [ 'sat' ] * 2, [ 2.0, 4.0 ]),
+            { 'error': 'failed', 'working_directory': '/wd/0' },
+            result('b', [ 'timeout' ] * 2, [ 10.0, 10.0 ]),
+            # Error results can have a benchmark that no other result has
+            { 'error': 'failed', 'working_directory': '/wd/1', 'benchmark': 'c' },
+            result('d', [ 'sat' ] * 2, [ 1.0, 1.0 ]))
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, 'results.npz')
+            ResultInfo.saveBinaryResultInfos(path, ris)
+            with open(path, 'rb') as f:
+                table = ResultTable.load(f)
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.benchmarks, [ 'a', 'b', 'd' ])
+        self.assertEqual(table.row_of('d'), 2)
+        self.assertIsNone(table.row_of('c'))
+        points, = compute_points(None, 10.0, tables=[ table ])
+        self.assertCurve(
+            points,
+            [ 'd', 'a' ],
+            [ 1.0, 3.0 ],
+            [ (0.0, 0.0), (CI_99, CI_99) ],
+            num_zero=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Measure the per-job overhead of the Docker backend by repeatedly running
+a trivial command with and without warm containers.
+"""
+from load_smtrunner import add_smtrunner_to_module_search_path
+add_smtrunner_to_module_search_path()
+from smtrunner import BackendFactory, DriverUtil, RunnerContext
+
+import argparse
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+_logger = None
+
+
+def run_jobs(pargs, warm, bench_dir, bench_file, work_dirs_root):
+    backend_class = BackendFactory.getBackendClass('Docker')
+    ctx = RunnerContext.RunnerContext(num_parallel_jobs=1)
+    backend_options = {
+        'image': pargs.image,
+        'skip_tool_check': True,
+        'extra_mounts': {
+            bench_dir: {
+                'container_path': '/benchmarks',
+                'read_only': True,
+            },
+        },
+        'warm_containers': warm,
+    }
+    end_to_end_times = []
+    reported_times = []
+    for index in range(0, pargs.num_jobs):
+        work_dir = os.path.join(
+            work_dirs_root,
+            '{}-{}'.format('warm' if warm else 'cold', index))
+        os.mkdir(work_dir)
+        start_time = time.perf_counter()
+        backend = backend_class(
+            hostProgramPath=bench_file,
+            workingDirectory=work_dir,
+            timeLimit=pargs.time_limit,
+            memoryLimit=pargs.memory_limit,
+            stackLimit=None,
+            ctx=ctx,
+            **backend_options)
+        result = backend.run(
+            [pargs.tool_path, backend.programPath()],
+            os.path.join(work_dir, 'stdout.log.txt'),
+            os.path.join(work_dir, 'stderr.log.txt'),
+            {})
+        end_to_end_times.append(time.perf_counter() - start_time)
+        reported_times.append(result.runTime)
+        if result.exitCode != 0:
+            _logger.warning('Job {} exited with {}'.format(index, result.exitCode))
+    return (end_to_end_times, reported_times)
+
+
+def print_stats(name, times):
+    print('  {}: mean {:.4f}s, median {:.4f}s, min {:.4f}s, max {:.4f}s'.format(
+        name,
+        statistics.mean(times),
+        statistics.median(times),
+        min(times),
+        max(times)))
+
+
+def main(args):
+    global _logger
+    parser = argparse.ArgumentParser(description=__doc__)
+    DriverUtil.parserAddLoggerArg(parser)
+    parser.add_argument('image',
+                        help='Docker image to run jobs in')
+    parser.add_argument('--tool-path',
+                        dest='tool_path',
+                        default='/bin/cat',
+                        help='Command to run on the benchmark inside the image (default: %(default)s)')
+    parser.add_argument('-n', '--num-jobs',
+                        dest='num_jobs',
+                        type=int,
+                        default=50)
+    parser.add_argument('--time-limit',
+                        dest='time_limit',
+                        type=int,
+                        default=60)
+    parser.add_argument('--memory-limit',
+                        dest='memory_limit',
+                        type=int,
+                        default=1024)
+    parser.add_argument('--modes',
+                        nargs='+',
+                        choices=['cold', 'warm'],
+                        default=['cold', 'warm'])
+
+    pargs = parser.parse_args(args)
+    DriverUtil.handleLoggerArgs(pargs, parser)
+    _logger = logging.getLogger(__name__)
+
+    if pargs.num_jobs < 1:
+        _logger.error('Number of jobs must be >= 1')
+        return 1
+
+    temp_dir = tempfile.mkdtemp(prefix='docker-backend-overhead-')
+    try:
+        bench_dir = os.path.join(temp_dir, 'benchmarks')
+        os.mkdir(bench_dir)
+        bench_file = os.path.join(bench_dir, 'trivial.smt2')
+        with open(bench_file, 'w') as f:
+            f.write('(check-sat)\n')
+        mean_overheads = dict()
+        for mode in pargs.modes:
+            # Each mode gets its own working dirs root so that warm
+            # containers only see their own working directories.
+            work_dirs_root = os.path.join(temp_dir, 'workdirs-{}'.format(mode))
+            os.mkdir(work_dirs_root)
+            _logger.info('Running {} jobs in {} mode'.format(pargs.num_jobs, mode))
+            end_to_end_times, reported_times = run_jobs(
+                pargs, mode == 'warm', bench_dir, bench_file, work_dirs_root)
+            print('{} ({} jobs):'.format(mode, pargs.num_jobs))
+            print_stats('end-to-end', end_to_end_times)
+            print_stats('wallclock_time', reported_times)
+            mean_overheads[mode] = statistics.mean(end_to_end_times)
+        if len(mean_overheads) == 2:
+            print('Mean end-to-end speed up of warm over cold: {:.2f}x'.format(
+                mean_overheads['cold'] / mean_overheads['warm']))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -60,11 +60,19 @@ def main(args):
         default=sys.stdout,
         type=argparse.FileType('w'),
     )
+    parser.add_argument('-j', '--jobs',
+        type=int,
+        default=1,
+        help='Number of processes to compute event tags with (default: %(default)s)',
+    )
     pargs = parser.parse_args(args)
     DriverUtil.handleLoggerArgs(pargs, parser)
     _logger = logging.getLogger(__name__)
     _logger.info('Using benchmark base of "{}"'.format(pargs.benchmark_base))
     _logger.info('Using working directory base of "{}"'.format(pargs.wd_base))
+    if pargs.jobs <= 0:
+        _logger.error('jobs must be > 0')
+        return 1
 
     extra_kwargs = {}
     bool_arg_re = re.compile(r'^([a-zA-z.]+)=(true|false)')
@@ -119,11 +127,23 @@ def main(args):
         'schema_version': result_info_list[0]['schema_version'],
     }
 
-    event_analyser = event_analysis.get_event_analyser_from_runner_name(
-        runner,
-        soft_timeout=pargs.timeout,
-        use_dsoes_wallclock_time=pargs.use_dsoes_wallclock_time,
-        **extra_kwargs)
+    analyser_kwargs = {
+        'soft_timeout': pargs.timeout,
+        'use_dsoes_wallclock_time': pargs.use_dsoes_wallclock_time,
+    }
+    analyser_kwargs.update(extra_kwargs)
+    # Construct get event tag info
+    getis = [
+        event_analysis.GETInfo(
+            ri=ri,
+            wd_base=pargs.wd_base,
+            benchmark_base=pargs.benchmark_base,
+            backend=backend
+        )
+        for ri in result_infos['results']
+    ]
+    tags = event_analysis.get_event_tags(
+        runner, analyser_kwargs, getis, num_jobs=pargs.jobs)
     tag_to_keys = dict()
     non_trivial_known_tags = {
         'jfs_generic_unknown',
@@ -142,16 +162,8 @@ def main(args):
     }
     trivial_keys = set()
     non_trivial_keys = set()
-    for ri in result_infos['results']:
+    for ri, tag in zip(result_infos['results'], tags):
         key = ResultInfoUtil.get_result_info_key(ri)
-        # Construct get event tag info
-        geti = event_analysis.GETInfo(
-            ri=ri,
-            wd_base=pargs.wd_base,
-            benchmark_base=pargs.benchmark_base,
-            backend=backend
-        )
-        tag = event_analyser.get_event_tag(geti)
         if tag is None:
             _logger.error('Unhandled event for "{}"'.format(key))
             _logger.error(pprint.pformat(ri))
@@ -178,14 +190,16 @@ def main(args):
     # Validate against schema
     try:
         _logger.info('Validating result_infos')
-        ResultInfo.validateResultInfos(output_ri)
+        validation_digest = ResultInfo.validateResultInfos(output_ri, returnDigest=True)
     except ResultInfo.ResultInfoValidationError as e:
         _logger.error('Validation error:\n{}'.format(e))
         return 1
     _logger.info('Validation complete')
 
 
-    smtrunner.util.writeYaml(pargs.output, output_ri)
+    smtrunner.util.writeYaml(
+        pargs.output,
+        ResultInfo.withValidationDigest(output_ri, validation_digest))
 
     return 0
 
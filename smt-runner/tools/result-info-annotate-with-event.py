@@ -8,6 +8,7 @@ Read a result info file and annotate with event tag
 from load_smtrunner import add_smtrunner_to_module_search_path
 add_smtrunner_to_module_search_path()
 from smtrunner import ResultInfo, DriverUtil, ResultInfoUtil, event_analysis
+from smtrunner import DerivedFieldCache
 import smtrunner.util
 
 import argparse
@@ -51,11 +52,24 @@ def main(args):
         type=argparse.FileType('w'),
         default=sys.stdout,
     )
+    parser.add_argument('-j', '--jobs',
+        type=int,
+        default=1,
+        help='Number of processes to compute event tags with (default: %(default)s)',
+    )
+    parser.add_argument('--cache',
+        default=None,
+        help='Path to derived field cache to use and update. Only results '
+             'whose logs or event analyser changed are re-tagged',
+    )
     pargs = parser.parse_args(args)
     DriverUtil.handleLoggerArgs(pargs, parser)
     _logger = logging.getLogger(__name__)
     _logger.info('Using benchmark base of "{}"'.format(pargs.benchmark_base))
     _logger.info('Using working directory base of "{}"'.format(pargs.wd_base))
+    if pargs.jobs <= 0:
+        _logger.error('jobs must be > 0')
+        return 1
 
     try:
         _logger.info('Loading "{}"'.format(pargs.result_infos.name))
@@ -72,22 +86,66 @@ def main(args):
         backend = result_infos['misc']['backend']
     _logger.info('Backend was "{}"'.format(backend))
 
-    event_analyser = event_analysis.get_event_analyser_from_runner_name(
-        runner,
-        soft_timeout=pargs.timeout,
-        use_dsoes_wallclock_time=pargs.use_dsoes_wallclock_time)
-    new_results = result_infos.copy()
-    new_results['results'] = []
-    for ri in result_infos['results']:
-        key = ResultInfoUtil.get_result_info_key(ri)
-        # Construct get event tag info
-        geti = event_analysis.GETInfo(
+    analyser_kwargs = {
+        'soft_timeout': pargs.timeout,
+        'use_dsoes_wallclock_time': pargs.use_dsoes_wallclock_time,
+    }
+    # Construct get event tag info
+    getis = [
+        event_analysis.GETInfo(
             ri=ri,
             wd_base=pargs.wd_base,
             benchmark_base=pargs.benchmark_base,
             backend=backend
         )
-        tag = event_analyser.get_event_tag(geti)
+        for ri in result_infos['results']
+    ]
+    tags = [None] * len(getis)
+    to_tag = list(range(0, len(getis)))
+    cache = None
+    if pargs.cache is not None:
+        cache = DerivedFieldCache.DerivedFieldCache(
+            pargs.cache, 'result-info-annotate-with-event')
+        event_analyser = event_analysis.get_event_analyser_from_runner_name(
+            runner, **analyser_kwargs)
+        fingerprint = event_analysis.get_event_analyser_fingerprint(event_analyser)
+        inputs = [
+            [
+                DerivedFieldCache.get_data_signature(geti.ri),
+                [DerivedFieldCache.get_file_signature(p)
+                 for p in event_analyser.get_input_paths(geti)],
+            ]
+            for geti in getis
+        ]
+        to_tag = []
+        for index, geti in enumerate(getis):
+            key = ResultInfoUtil.get_result_info_key(geti.ri)
+            cached = cache.lookup(key, fingerprint, inputs[index])
+            if cached is None:
+                to_tag.append(index)
+            else:
+                tags[index] = cached['event_tag']
+        _logger.info('Using {} cached event tags, {} to compute'.format(
+            cache.hits, len(to_tag)))
+
+    new_tags = event_analysis.get_event_tags(
+        runner, analyser_kwargs, [getis[i] for i in to_tag], num_jobs=pargs.jobs)
+    try:
+        for index, tag in zip(to_tag, new_tags):
+            tags[index] = tag
+            if tag is None:
+                break
+            if cache is not None:
+                key = ResultInfoUtil.get_result_info_key(getis[index].ri)
+                cache.store(key, fingerprint, inputs[index], {'event_tag': tag})
+    finally:
+        if cache is not None:
+            cache.save()
+
+    new_results = result_infos.copy()
+    new_results['results'] = []
+    for ri, tag in zip(result_infos['results'], tags):
+        key = ResultInfoUtil.get_result_info_key(ri)
         if tag is None:
             _logger.error('Unhandled event for "{}"'.format(key))
             _logger.error(pprint.pformat(ri))
@@ -100,13 +158,15 @@ def main(args):
     # Validate against schema
     try:
         _logger.info('Validating result_infos')
-        ResultInfo.validateResultInfos(new_results)
+        validation_digest = ResultInfo.validateResultInfos(new_results, returnDigest=True)
     except ResultInfo.ResultInfoValidationError as e:
         _logger.error('Validation error:\n{}'.format(e))
         return 1
     _logger.info('Validation complete')
 
-    smtrunner.util.writeYaml(pargs.output, new_results)
+    smtrunner.util.writeYaml(
+        pargs.output,
+        ResultInfo.withValidationDigest(new_results, validation_digest))
 
     return 0
 
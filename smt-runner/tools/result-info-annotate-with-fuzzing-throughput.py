@@ -143,13 +143,15 @@ def main(args):
     # Validate against schema
     try:
         _logger.info('Validating result_infos')
-        ResultInfo.validateResultInfos(new_results)
+        validation_digest = ResultInfo.validateResultInfos(new_results, returnDigest=True)
     except ResultInfo.ResultInfoValidationError as e:
         _logger.error('Validation error:\n{}'.format(e))
         return 1
     _logger.info('Validation complete')
 
-    smtrunner.util.writeYaml(pargs.output, new_results)
+    smtrunner.util.writeYaml(
+        pargs.output,
+        ResultInfo.withValidationDigest(new_results, validation_digest))
 
     return 0
 
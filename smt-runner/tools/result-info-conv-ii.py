@@ -56,6 +56,7 @@ def main(args):
         'stderr_log_file',
         'user_cpu_time',
         'sys_cpu_time',
+        'peak_rss_mib',
         'backend_timeout',
         'merged_result',
         'error',
@@ -89,13 +90,15 @@ def main(args):
     # Validate against schema
     try:
         _logger.info('Validating result_infos')
-        ResultInfo.validateResultInfos(result_infos)
+        validation_digest = ResultInfo.validateResultInfos(result_infos, returnDigest=True)
     except ResultInfo.ResultInfoValidationError as e:
         _logger.error('Validation error:\n{}'.format(e))
         return 1
     _logger.info('Validation complete')
 
-    smtrunner.util.writeYaml(pargs.output, result_infos)
+    smtrunner.util.writeYaml(
+        pargs.output,
+        ResultInfo.withValidationDigest(result_infos, validation_digest))
     return 0
 
 if __name__ == '__main__':
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Convert a result info file between YAML and the binary (`.npz`) format.
+
+The input format is detected automatically. The output format is binary
+if the output path ends with `.npz` and YAML otherwise. Tools that use
+`ResultInfo.loadRawResultInfos()` can read either format.
+"""
+from load_smtrunner import add_smtrunner_to_module_search_path
+add_smtrunner_to_module_search_path()
+from smtrunner import ResultInfo, ResultInfoBinary, DriverUtil
+import smtrunner.util
+
+import argparse
+import logging
+import sys
+
+_logger = None
+
+def main(args):
+    global _logger
+    parser = argparse.ArgumentParser(description=__doc__)
+    DriverUtil.parserAddLoggerArg(parser)
+    parser.add_argument('result_infos',
+                        type=argparse.FileType('r'))
+    parser.add_argument('output',
+                        help='Output path. Use `.npz` for the binary format')
+    parser.add_argument('--compress',
+                        action='store_true',
+                        default=False,
+                        help='Compress binary output (smaller but slower to load)')
+    pargs = parser.parse_args(args)
+    DriverUtil.handleLoggerArgs(pargs, parser)
+    _logger = logging.getLogger(__name__)
+
+    try:
+        _logger.info('Loading "{}"'.format(pargs.result_infos.name))
+        result_infos = ResultInfo.loadRawResultInfos(pargs.result_infos)
+    except ResultInfo.ResultInfoValidationError as e:
+        _logger.error('Validation error:\n{}'.format(e))
+        return 1
+    _logger.info('Loading done')
+
+    if pargs.output.endswith(ResultInfoBinary.FILE_EXTENSION):
+        try:
+            ResultInfo.saveBinaryResultInfos(
+                pargs.output, result_infos, compress=pargs.compress)
+        except ResultInfo.ResultInfoValidationError as e:
+            _logger.error('Validation error:\n{}'.format(e))
+            return 1
+    else:
+        if pargs.compress:
+            _logger.warning('--compress is ignored for YAML output')
+        with open(pargs.output, 'w') as f:
+            smtrunner.util.writeYaml(f, result_infos)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
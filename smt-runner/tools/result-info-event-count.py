@@ -56,11 +56,19 @@ def main(args):
         nargs='+',
         default=[],
     )
+    parser.add_argument('-j', '--jobs',
+        type=int,
+        default=1,
+        help='Number of processes to compute event tags with (default: %(default)s)',
+    )
     pargs = parser.parse_args(args)
     DriverUtil.handleLoggerArgs(pargs, parser)
     _logger = logging.getLogger(__name__)
     _logger.info('Using benchmark base of "{}"'.format(pargs.benchmark_base))
     _logger.info('Using working directory base of "{}"'.format(pargs.wd_base))
+    if pargs.jobs <= 0:
+        _logger.error('jobs must be > 0')
+        return 1
 
     extra_kwargs = {}
     bool_arg_re = re.compile(r'^([a-zA-z.]+)=(true|false)')
@@ -94,22 +102,26 @@ def main(args):
         backend = result_infos['misc']['backend']
     _logger.info('Backend was "{}"'.format(backend))
 
-    event_analyser = event_analysis.get_event_analyser_from_runner_name(
-        runner,
-        soft_timeout=pargs.timeout,
-        use_dsoes_wallclock_time=pargs.use_dsoes_wallclock_time,
-        **extra_kwargs)
-    tag_to_keys = dict()
-    for ri in result_infos['results']:
-        key = ResultInfoUtil.get_result_info_key(ri)
-        # Construct get event tag info
-        geti = event_analysis.GETInfo(
+    analyser_kwargs = {
+        'soft_timeout': pargs.timeout,
+        'use_dsoes_wallclock_time': pargs.use_dsoes_wallclock_time,
+    }
+    analyser_kwargs.update(extra_kwargs)
+    # Construct get event tag info
+    getis = [
+        event_analysis.GETInfo(
             ri=ri,
             wd_base=pargs.wd_base,
             benchmark_base=pargs.benchmark_base,
             backend=backend
         )
-        tag = event_analyser.get_event_tag(geti)
+        for ri in result_infos['results']
+    ]
+    tags = event_analysis.get_event_tags(
+        runner, analyser_kwargs, getis, num_jobs=pargs.jobs)
+    tag_to_keys = dict()
+    for ri, tag in zip(result_infos['results'], tags):
+        key = ResultInfoUtil.get_result_info_key(ri)
         if tag is None:
             _logger.error('Unhandled event for "{}"'.format(key))
             _logger.error(pprint.pformat(ri))
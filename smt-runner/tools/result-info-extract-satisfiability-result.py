@@ -8,7 +8,7 @@ from a solver
 """
 from load_smtrunner import add_smtrunner_to_module_search_path
 add_smtrunner_to_module_search_path()
-from smtrunner import ResultInfo, DriverUtil
+from smtrunner import ResultInfo, DriverUtil, solver_output
 import smtrunner.util
 
 import argparse
@@ -29,29 +29,13 @@ def strip(prefix, path):
     if path.startswith(prefix):
         return path[len(prefix):]
 
-_RE_SAT_RESPONCE = re.compile(r'^\s*(sat|unsat|unknown)')
-
 _fail_count = 0
 
 def get_satisfiability_result(r, base_path):
     global _fail_count
-    stdout_path = r['stdout_log_file']
-    if stdout_path.startswith('/'):
-        stdout_path = stdout_path[1:]
-    full_path = os.path.join(base_path, stdout_path)
-    if not os.path.exists(full_path):
-        _logger.error('"{}" does not exist'.format(full_path))
-        raise Exception('missing file')
-    sat = 'unknown'
-    with open(full_path, 'r') as f:
-        first_line = f.readline()
-        _logger.debug('Got first line \"{}\"'.format(first_line))
-        m = _RE_SAT_RESPONCE.match(first_line)
-        if m:
-            sat = m.group(1)
-        else:
-            _logger.warning('Failed to read sat result from "{}"'.format(f.name))
-            _fail_count += 1
+    sat, failed = solver_output.get_sat(
+        solver_output.join_path(base_path, r['stdout_log_file']))
+    _fail_count += int(failed)
     r_copy = r.copy()
     r_copy['sat'] = sat
     return r_copy
@@ -104,14 +88,16 @@ def main(args):
     # Validate against schema
     try:
         _logger.info('Validating result_infos')
-        ResultInfo.validateResultInfos(new_result_infos)
+        validation_digest = ResultInfo.validateResultInfos(new_result_infos, returnDigest=True)
     except ResultInfo.ResultInfoValidationError as e:
         _logger.error('Validation error:\n{}'.format(e))
         return 1
     _logger.info('Validation complete')
 
 
-    smtrunner.util.writeYaml(pargs.output, new_result_infos)
+    smtrunner.util.writeYaml(
+        pargs.output,
+        ResultInfo.withValidationDigest(new_result_infos, validation_digest))
     return 0
 
 if __name__ == '__main__':
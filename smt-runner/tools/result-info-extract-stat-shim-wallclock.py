@@ -8,7 +8,7 @@ docker-stats-on-exit-shim (dsoes)
 """
 from load_smtrunner import add_smtrunner_to_module_search_path
 add_smtrunner_to_module_search_path()
-from smtrunner import ResultInfo, DriverUtil
+from smtrunner import ResultInfo, DriverUtil, solver_output
 import smtrunner.util
 
 import argparse
@@ -32,54 +32,14 @@ def strip(prefix, path):
 
 _fail_count = 0
 
-def get_satisfiability_result(r, base_path):
-    global _fail_count
-    stdout_path = r['stdout_log_file']
-    if stdout_path.startswith('/'):
-        stdout_path = stdout_path[1:]
-    full_path = os.path.join(base_path, stdout_path)
-    if not os.path.exists(full_path):
-        _logger.error('"{}" does not exist'.format(full_path))
-        raise Exception('missing file')
-    sat = 'unknown'
-    with open(full_path, 'r') as f_sat:
-        first_line = f_sat.readline()
-        _logger.debug('Got first line \"{}\"'.format(first_line))
-        m = _RE_SAT_RESPONCE.match(first_line)
-        if m:
-            sat = m.group(1)
-        else:
-            _logger.warning('Failed to read sat result from "{}"'.format(f_sat.name))
-            _fail_count += 1
-    r_copy = r.copy()
-    r_copy['sat'] = sat
-    return r_copy
-
 def get_dsoes_wallclock_time_result(r, base_path):
     global _fail_count
     r_copy = r.copy()
-    r_copy['dsoes_wallclock_time'] = None
-    workdir_path = r['working_directory']
-    if workdir_path.startswith('/'):
-        workdir_path = workdir_path[1:]
-    workdir_path = os.path.join(base_path, workdir_path)
-    exit_stats_file_path = os.path.join(workdir_path, 'exit_stats.json')
-    if not os.path.exists(exit_stats_file_path):
-        _logger.error('"{}" does not exist'.format(exit_stats_file_path))
-        _fail_count += 1
-        return r_copy
-    try:
-        with open(exit_stats_file_path, 'r') as f_time:
-            stats = json.load(f_time)
-            dsoes_wallclock_time = stats["wall_time"] / (10**9)
-            r_copy['dsoes_wallclock_time'] = dsoes_wallclock_time
-    except Exception as e:
-        _logger.error('Failed to retrieve stats from "{}"'.format(exit_stats_file_path))
-        _logger.error(e)
-        _fail_count += 1
+    r_copy['dsoes_wallclock_time'], failed = solver_output.get_dsoes_wallclock_time(
+        solver_output.join_path(base_path, r['working_directory']))
+    _fail_count += int(failed)
     return r_copy
 
-
 def add_dsoes_wallclock_time(results, base_path):
     new_results=[]
     for r in results:
@@ -128,14 +88,16 @@ def main(args):
     # Validate against schema
     try:
         _logger.info('Validating result_infos')
-        ResultInfo.validateResultInfos(new_result_infos)
+        validation_digest = ResultInfo.validateResultInfos(new_result_infos, returnDigest=True)
     except ResultInfo.ResultInfoValidationError as e:
         _logger.error('Validation error:\n{}'.format(e))
         return 1
     _logger.info('Validation complete')
 
 
-    smtrunner.util.writeYaml(pargs.output, new_result_infos)
+    smtrunner.util.writeYaml(
+        pargs.output,
+        ResultInfo.withValidationDigest(new_result_infos, validation_digest))
     return 0
 
 if __name__ == '__main__':
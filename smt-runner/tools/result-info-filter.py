@@ -349,14 +349,16 @@ def main(args):
     # Validate against schema
     try:
         _logger.info('Validating result_infos')
-        ResultInfo.validateResultInfos(new_result_infos)
+        validation_digest = ResultInfo.validateResultInfos(new_result_infos, returnDigest=True)
     except ResultInfo.ResultInfoValidationError as e:
         _logger.error('Validation error:\n{}'.format(e))
         return 1
     _logger.info('Validation complete')
 
 
-    smtrunner.util.writeYaml(pargs.output, new_result_infos)
+    smtrunner.util.writeYaml(
+        pargs.output,
+        ResultInfo.withValidationDigest(new_result_infos, validation_digest))
     return 0
 
 if __name__ == '__main__':
@@ -325,7 +325,7 @@ def main(args):
         # Validate against schema
         try:
             _logger.info('Validating result_infos')
-            ResultInfo.validateResultInfos(new_result_infos)
+            validation_digest = ResultInfo.validateResultInfos(new_result_infos, returnDigest=True)
         except ResultInfo.ResultInfoValidationError as e:
             _logger.error('Validation error:\n{}'.format(e))
             return 1
@@ -334,7 +334,9 @@ def main(args):
             index_to_file_name[index],
             output_file_name))
         with open(output_file_name, 'w') as f:
-            smtrunner.util.writeYaml(f, new_result_infos)
+            smtrunner.util.writeYaml(
+                f,
+                ResultInfo.withValidationDigest(new_result_infos, validation_digest))
     return 0
 
 if __name__ == '__main__':
@@ -22,11 +22,86 @@ import yaml
 
 _logger = None
 
+SELECTION_MODES = ['inv_height_probability', 'rand_bin']
+
+class FenwickTree:
+    """
+        Binary indexed tree over a fixed number of non-negative weights.
+        Changing a weight, computing the total weight and finding the
+        index that a cumulative weight falls in are all O(log n).
+    """
+    def __init__(self, weights):
+        self._weights = list(weights)
+        self._size = len(self._weights)
+        self._tree = [0] + self._weights
+        for index in range(1, self._size + 1):
+            parent = index + (index & -index)
+            if parent <= self._size:
+                self._tree[parent] += self._tree[index]
+        self._high_bit = 0
+        if self._size > 0:
+            self._high_bit = 1 << (self._size.bit_length() - 1)
+
+    def __len__(self):
+        return self._size
+
+    def getWeight(self, index):
+        return self._weights[index]
+
+    def setWeight(self, index, weight):
+        assert weight >= 0
+        delta = weight - self._weights[index]
+        self._weights[index] = weight
+        index += 1
+        while index <= self._size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def getTotal(self):
+        total = 0
+        index = self._size
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, value):
+        """
+            Returns the smallest index such that the sum of the weights up to
+            and including that index is greater than `value`. This is the
+            index picked by a linear walk over the cumulative weights.
+        """
+        tree = self._tree
+        position = 0
+        bit = self._high_bit
+        while bit:
+            next_position = position + bit
+            if next_position <= self._size and tree[next_position] <= value:
+                position = next_position
+                value -= tree[next_position]
+            bit >>= 1
+        if position < self._size and self._weights[position] > 0:
+            return position
+        # Floating point rounding can put `value` at (or past) the total
+        # or on an index with no weight. Fall back to the closest index
+        # with weight, preferring later indices.
+        for index in range(position, self._size):
+            if self._weights[index] > 0:
+                return index
+        for index in range(min(position, self._size) - 1, -1, -1):
+            if self._weights[index] > 0:
+                return index
+        raise Exception('FenwickTree has no weight to find')
+
 class HistogramBin:
     def __init__(self, minValue, maxValue):
         self._used_keys = set()
-        # We use a list to get deterministic selection
-        self.keys = []
+        # We use a list to get deterministic selection. Keys are never
+        # removed from the list, instead `_available` tracks which keys
+        # can still be picked.
+        self._keys = []
+        self._available = None
+        self._size = 0
         # Range in [minValue, maxValue)
         self.minValue = minValue
         self.maxValue = maxValue
@@ -36,13 +111,15 @@ class HistogramBin:
         return "HistogramBin[{},{})".format(self.minValue, self.maxValue)
 
     def insertKey(self, key):
-        _logger.debug('{} inserting {}'.format(self.getID(), key))
         assert key not in self._used_keys
-        self.keys.append(key)
+        self._keys.append(key)
         self._used_keys.add(key)
+        self._size += 1
+        # Rebuilt on next pick
+        self._available = None
 
     def getSize(self):
-        return len(self.keys)
+        return self._size
 
     def getKeys(self):
         return self._used_keys.copy()
@@ -51,10 +128,19 @@ class HistogramBin:
         return (self.minValue, self.maxValue)
 
     def getRandomKey(self, remove_item=True):
-        key = random.sample(self.keys, 1)[0]
+        if self._available is None:
+            self._available = FenwickTree(
+                [ 0 if key is None else 1 for key in self._keys ])
+        # Pick the n-th available key. This consumes the random number
+        # generator in the same way as `random.sample(available_keys, 1)`
+        # so selections are the same for a given seed.
+        index = self._available.find(random.randrange(self._size))
+        key = self._keys[index]
         if remove_item is True:
             _logger.debug('Removing {}'.format(key))
-            self.keys.remove(key)
+            self._available.setWeight(index, 0)
+            self._keys[index] = None
+            self._size -= 1
         return key
 
 class HistogramStateMachine:
@@ -74,10 +160,18 @@ class HistogramStateMachine:
             else:
                 bin = self.range_to_bin[bin_tup]
             bin.insertKey(key_fn(r))
-        # Create ordered bins
+        # Create ordered bins. Bins stay in this list when they become
+        # empty so that indices into the trees below remain valid.
         self.bins = [ x for x in self.range_to_bin.values() ]
         self.bins.sort(key=lambda x: x.minValue)
         assert len(self.bins) == len(self.range_to_bin)
+        # The probability of picking a bin is proportional to
+        # 1/(size of bin). Empty bins have a weight of 0.
+        self._inv_size_weights = FenwickTree(
+            [ 1.0 / x.getSize() for x in self.bins ])
+        # Weight of 1 for each non-empty bin
+        self._non_empty_bins = FenwickTree([ 1 ] * len(self.bins))
+        self._num_non_empty_bins = len(self.bins)
         _logger.info('Created {} bins'.format(len(self.bins)))
 
     def time_to_bin_tuple(self, time):
@@ -85,33 +179,44 @@ class HistogramStateMachine:
         lower_bound = lower_bound // self.bin_width
         lower_bound *= self.bin_width
         upper_bound = lower_bound + self.bin_width
-        _logger.debug('{} => [{},{})'.format(time, lower_bound, upper_bound))
         return (lower_bound, upper_bound)
 
+    def getNonEmptyBins(self):
+        return [ x for x in self.bins if x.getSize() > 0 ]
+
+    def _pickFromBin(self, bin_index, remove_item):
+        selected_bin = self.bins[bin_index]
+        selected_key = selected_bin.getRandomKey(remove_item=remove_item)
+        _logger.debug('Picked "{}"'.format(selected_key))
+        if remove_item is True:
+            size = selected_bin.getSize()
+            if size == 0:
+                # Bin is now empty so it can't be picked again
+                _logger.debug('Bin {} now empty. Removing'.format(
+                    selected_bin.getID()))
+                self._inv_size_weights.setWeight(bin_index, 0.0)
+                self._non_empty_bins.setWeight(bin_index, 0)
+                self._num_non_empty_bins -= 1
+            else:
+                self._inv_size_weights.setWeight(bin_index, 1.0 / size)
+        return selected_key
+
     def getNextRandBin(self, remove_item=True):
         """
             Get next element from available bin.
             The bin is picked at random and then an item
             from the bin is picked at random.
         """
-        if len(self.bins) == 0:
+        if self._num_non_empty_bins == 0:
             return None
 
         # Pick random bin
-        bin_index = random.randrange(len(self.bins))
-        _logger.debug('Picked random bin index {} in range [0,{})'.format(
-            bin_index,
-            len(self.bins)))
-
-        selected_bin = self.bins[bin_index]
-        # Pick random key
-        selected_key = selected_bin.getRandomKey(remove_item=remove_item)
-        _logger.debug('Picked "{}"'.format(selected_key))
-        if selected_bin.getSize() == 0:
-            # Bin is now empty so remove it from list of available bins
-            _logger.debug('Bin {} now empty. Removing'.format(selected_bin.getID()))
-            self.bins.pop(bin_index)
-        return selected_key
+        bin_rank = random.randrange(self._num_non_empty_bins)
+        bin_index = self._non_empty_bins.find(bin_rank)
+        _logger.debug('Picked random bin {} in range [0,{})'.format(
+            bin_rank,
+            self._num_non_empty_bins))
+        return self._pickFromBin(bin_index, remove_item)
 
     def getNext(self, remove_item=True):
         """
@@ -120,52 +225,46 @@ class HistogramStateMachine:
             weighted such that small bins are much more likely
             to be picked than large bins
         """
-        if len(self.bins) == 0:
+        if self._num_non_empty_bins == 0:
             return None
 
-        bin_counts = []
-        max_size = 0 # The largest bin
-        for bin in self.bins:
-            count = bin.getSize()
-            assert count > 0
-            bin_counts.append(count)
-            if count > max_size:
-                max_size = count
-        _logger.debug('Bin counts:\n{}'.format(pprint.pformat(bin_counts)))
-
-        # Compute scaled probabilities. The probability is proportional to
-        # 1/(size of bin). `max_size` is used as a scaling factor to try to
-        # avoid small values
-        scaled_probabilities = list(map(lambda x: float(max_size)/x, bin_counts))
-        _logger.debug('Scaled probs:\n{}'.format(pprint.pformat(scaled_probabilities)))
-        sum_of_probabilities = sum(scaled_probabilities)
-
-        # Compute random (uniform) number in range [0, sum_of_probabilities]
-        num = random.uniform(0.0, sum_of_probabilities)
-        _logger.debug('Generating random number ({}) in range [0, {}]'.format(num, sum_of_probabilities))
-
-        # FIXME: This is really naive. Just walk through
-        lower_b = 0.0
-        found_index = -1
-        for index, scaled_prob in enumerate(scaled_probabilities):
-            upper_b = lower_b + scaled_prob
-            if lower_b <= num and num < upper_b:
-                found_index = index
+        # Compute random (uniform) number in range [0, sum_of_weights]
+        # and find the bin it falls in.
+        num = random.uniform(0.0, self._inv_size_weights.getTotal())
+        bin_index = self._inv_size_weights.find(num)
+        _logger.debug('Picked bin with index {} with size {}'.format(
+            bin_index, self.bins[bin_index].getSize()))
+        return self._pickFromBin(bin_index, remove_item)
+
+    def getBatch(self, count, remove_item=True,
+                 selection_mode='inv_height_probability', exclude=None):
+        """
+            Get up to `count` elements using `selection_mode`. Picked
+            elements that are in `exclude` are discarded and another
+            element is picked. Elements are picked in the same order as
+            repeated calls to `getNext()` (or `getNextRandBin()`) so the
+            result is the same for a given seed. Fewer than `count`
+            elements are returned if the histogram is exhausted.
+        """
+        if selection_mode == 'inv_height_probability':
+            pick = self.getNext
+        elif selection_mode == 'rand_bin':
+            pick = self.getNextRandBin
+        else:
+            raise Exception('Unsupported selection mode')
+        if exclude is None:
+            exclude = set()
+        batch = []
+        picked = set()
+        while len(batch) < count:
+            key = pick(remove_item=remove_item)
+            if key is None:
                 break
-            lower_b = upper_b
-        if found_index == -1 and num == scaled_probabilities:
-            # Handle edge case
-            found_index = len(self.bins) - 1
-        assert found_index != -1
-        selected_bin = self.bins[found_index]
-        _logger.debug('Picked bin with index {} with size {}'.format(found_index, selected_bin.getSize()))
-        selected_key = selected_bin.getRandomKey(remove_item=remove_item)
-        _logger.debug('Picked "{}"'.format(selected_key))
-        if selected_bin.getSize() == 0:
-            # Bin is now empty so remove it from list of available bins
-            _logger.debug('Bin {} now empty. Removing'.format(selected_bin.getID()))
-            self.bins.pop(found_index)
-        return selected_key
+            if key in exclude or key in picked:
+                continue
+            batch.append(key)
+            picked.add(key)
+        return batch
 
 def main(args):
     global _logger
@@ -209,7 +308,7 @@ def main(args):
     parser.add_argument('--selection-mode',
         dest='selection_mode',
         default='inv_height_probability',
-        choices=['inv_height_probability', 'rand_bin'],
+        choices=SELECTION_MODES,
     )
     parser.add_argument('--seed-selection-from',
         dest='seed_selection_from',
@@ -298,7 +397,7 @@ def main(args):
         # Walk through the bins and collect all keys where
         # bin count is less than the specified value.
         for hsm in histogram_sms:
-            for bin in hsm.bins:
+            for bin in hsm.getNonEmptyBins():
                 if bin.getSize() < pargs.hack_check_bins_included_with_count_less_than:
                     _logger.info('Adding keys from bin {} to desirable keys'.format(
                         bin.getBounds()))
@@ -320,35 +419,28 @@ def main(args):
             _logger.warning('Exhausted all histogram SMs')
             break
         hsms_to_remove = set()
-        # Go through sms in round robin order.
+        # Go through sms in round robin order picking one benchmark from
+        # each. When only one sm is left there is nothing to interleave
+        # with so pick everything that is needed in one batch.
+        batch_size = 1
+        if len(histogram_sms) == 1:
+            batch_size = pargs.bound - len(btk)
         for index, hsm in enumerate(histogram_sms):
             if len(btk) >= pargs.bound:
                 # Don't allow bound to be exceeded.
                 break
-            benchmark_key = None
-            while benchmark_key is None:
-                # Based on selection mode pick a benchmark
-                if pargs.selection_mode == 'inv_height_probability':
-                    benchmark_key = hsm.getNext(remove_item=not pargs.keep_on_pick)
-                elif pargs.selection_mode == 'rand_bin':
-                    benchmark_key = hsm.getNextRandBin(remove_item=not pargs.keep_on_pick)
-                else:
-                    raise Exception('Unsupported selection mode')
-                _logger.debug('Got key {}'.format(benchmark_key))
-                if benchmark_key is None:
-                    # hsm exhausted
-                    _logger.debug('HSM index {} exhausted'.format(
-                        index))
-                    hsms_to_remove.add(index)
-                    break
-                if benchmark_key in btk:
-                    _logger.debug('Already have key {}'.format(
-                        benchmark_key))
-                    # We already have this benchmark
-                    # Try picking another.
-                    benchmark_key = None
-                    continue
-            if benchmark_key is not None:
+            # Benchmarks we already have are skipped by the hsm
+            benchmark_keys = hsm.getBatch(
+                batch_size,
+                remove_item=not pargs.keep_on_pick,
+                selection_mode=pargs.selection_mode,
+                exclude=btk)
+            if len(benchmark_keys) < batch_size:
+                # hsm exhausted
+                _logger.debug('HSM index {} exhausted'.format(
+                    index))
+                hsms_to_remove.add(index)
+            for benchmark_key in benchmark_keys:
                 _logger.debug('Adding key {}'.format(benchmark_key))
                 assert benchmark_key not in btk_to_result_info_index
                 assert benchmark_key not in btk
@@ -412,12 +504,14 @@ def main(args):
     # Validate against schema
     try:
         _logger.info('Validating new_result_infos')
-        ResultInfo.validateResultInfos(new_result_infos)
+        validation_digest = ResultInfo.validateResultInfos(new_result_infos, returnDigest=True)
     except ResultInfo.ResultInfoValidationError as e:
         _logger.error('Validation error:\n{}'.format(e))
         return 1
     _logger.info('Validation complete')
-    smtrunner.util.writeYaml(pargs.output, new_result_infos)
+    smtrunner.util.writeYaml(
+        pargs.output,
+        ResultInfo.withValidationDigest(new_result_infos, validation_digest))
     return 0
 
 if __name__ == '__main__':
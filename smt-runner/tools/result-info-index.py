@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Add result info files to a SQLite result index (see
+`smtrunner.ResultIndex`) that can be queried with
+`result-info-query.py`.
+
+By default the solver and benchmark set of a file are taken from its
+path (`<benchmark_set>/<solver>/output*.yml`). Files that are already
+indexed and have not been modified are skipped.
+"""
+from load_smtrunner import add_smtrunner_to_module_search_path
+add_smtrunner_to_module_search_path()
+from smtrunner import ResultInfo, DriverUtil, ResultIndex
+
+import argparse
+import logging
+import sys
+
+_logger = None
+
+def main(args):
+    global _logger
+    parser = argparse.ArgumentParser(description=__doc__)
+    DriverUtil.parserAddLoggerArg(parser)
+    parser.add_argument('index',
+                        help='Path to SQLite database (created if it does not exist)')
+    parser.add_argument('result_infos',
+                        nargs='+',
+                        help='Result info files to add')
+    parser.add_argument('--solver',
+                        default=None,
+                        help='Solver name to use for all files')
+    parser.add_argument('--benchmark-set',
+                        dest='benchmark_set',
+                        default=None,
+                        help='Benchmark set name to use for all files')
+    parser.add_argument('--force',
+                        default=False,
+                        action='store_true',
+                        help='Re-index files even if they have not changed')
+    pargs = parser.parse_args(args)
+    DriverUtil.handleLoggerArgs(pargs, parser)
+    _logger = logging.getLogger(__name__)
+
+    try:
+        index = ResultIndex.ResultIndex(pargs.index)
+    except ResultIndex.ResultIndexError as e:
+        _logger.error(e)
+        return 1
+    num_skipped = 0
+    for path in pargs.result_infos:
+        if not pargs.force and index.is_up_to_date(path):
+            _logger.debug('Skipping unmodified "{}"'.format(path))
+            num_skipped += 1
+            continue
+        try:
+            _logger.info('Loading "{}"'.format(path))
+            index.add_file(path, pargs.solver, pargs.benchmark_set)
+        except ResultInfo.ResultInfoValidationError as e:
+            _logger.error('Validation error in "{}":\n{}'.format(path, e))
+            return 1
+    if num_skipped > 0:
+        _logger.info('Skipped {} unmodified files'.format(num_skipped))
+    index.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -117,13 +117,15 @@ def main(args):
     # Validate against schema
     try:
         _logger.info('Validating result_infos')
-        ResultInfo.validateResultInfos(merged)
+        validation_digest = ResultInfo.validateResultInfos(merged, returnDigest=True)
     except ResultInfo.ResultInfoValidationError as e:
         _logger.error('Validation error:\n{}'.format(e))
         return 1
     _logger.info('Validation complete')
 
-    smtrunner.util.writeYaml(pargs.output, merged)
+    smtrunner.util.writeYaml(
+        pargs.output,
+        ResultInfo.withValidationDigest(merged, validation_digest))
     return 0
 
 if __name__ == '__main__':
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Find the best portfolio of `k` solvers out of the given result info files
+(one per solver) and optionally write it out as a synthesized result info
+file in the format of `result-info-synthesize-portfolio.py`.
+
+Portfolios are scored as their virtual best solver by the number of
+solved benchmarks and then by PAR-2 score. A greedy portfolio is used as
+the starting point of an exact branch and bound search.
+"""
+from load_smtrunner import add_smtrunner_to_module_search_path
+add_smtrunner_to_module_search_path()
+from smtrunner import ResultInfo, DriverUtil, ResultTable, ResultInfoUtil, portfolio
+import smtrunner.util
+
+import argparse
+import copy
+import logging
+import sys
+
+_logger = None
+
+def main(args):
+    global _logger
+    parser = argparse.ArgumentParser(description=__doc__)
+    DriverUtil.parserAddLoggerArg(parser)
+    parser.add_argument('result_infos',
+                        type=argparse.FileType('r'),
+                        nargs='+')
+    parser.add_argument('--names',
+                        nargs='+',
+                        help='Solver names (default: name of the directory of each file)')
+    parser.add_argument('-k', '--size',
+                        type=int,
+                        required=True,
+                        help='Number of solvers in the portfolio')
+    parser.add_argument('--max-exec-time',
+                        type=float,
+                        required=True,
+                        dest='max_exec_time')
+    parser.add_argument('--greedy-only',
+                        dest='greedy_only',
+                        default=False,
+                        action='store_true',
+                        help='Skip the exact search')
+    parser.add_argument('--max-nodes',
+                        dest='max_nodes',
+                        type=int,
+                        default=1000000,
+                        help='Maximum number of nodes visited by the exact search')
+    parser.add_argument('-o', '--output',
+                        type=argparse.FileType('w'),
+                        default=None,
+                        help='Write the portfolio as a result info file')
+    pargs = parser.parse_args(args)
+    DriverUtil.handleLoggerArgs(pargs, parser)
+    _logger = logging.getLogger(__name__)
+
+    if pargs.size < 1:
+        _logger.error('Portfolio size must be >= 1')
+        return 1
+    if pargs.max_exec_time <= 0.0:
+        _logger.error('Max time must be > 0')
+        return 1
+    if pargs.names is None:
+        names = [ ResultInfoUtil.get_default_names(f.name)[0] for f in pargs.result_infos ]
+    else:
+        names = pargs.names
+    if len(names) != len(pargs.result_infos):
+        _logger.error('Number of names must match number of result info files')
+        return 1
+    if len(set(names)) != len(names):
+        _logger.error('Solver names must be unique')
+        return 1
+
+    index_to_raw_result_infos = []
+    tables = []
+    for result_infos_file in pargs.result_infos:
+        try:
+            _logger.info('Loading "{}"'.format(result_infos_file.name))
+            if pargs.output is None:
+                # Only the columns are needed
+                tables.append(ResultTable.load(result_infos_file))
+            else:
+                # The raw result infos are needed to write the portfolio
+                result_infos = ResultInfo.loadRawResultInfos(result_infos_file)
+                tables.append(ResultTable.ResultTable.from_raw_result_infos(result_infos))
+                index_to_raw_result_infos.append(result_infos)
+        except ResultInfo.ResultInfoValidationError as e:
+            _logger.error('Validation error:\n{}'.format(e))
+            return 1
+        except ResultTable.ResultTableError as e:
+            _logger.error('Failed to load "{}": {}'.format(result_infos_file.name, e))
+            return 1
+        _logger.info('Loading done')
+
+    problem = portfolio.PortfolioProblem.from_tables(
+        names, tables, pargs.max_exec_time)
+    tables = None
+
+    def describe(subset):
+        num_solved, par2 = problem.score(subset)
+        return '{} solved {} PAR-2 {:.2f}'.format(
+            [ names[s] for s in subset ], num_solved, par2)
+
+    best_single = max(range(problem.num_solvers),
+                      key=lambda s: (problem.score([s])[0], -problem.score([s])[1]))
+    print('# benchmarks: {}'.format(len(problem.benchmarks)))
+    print('Best single solver: {}'.format(describe([best_single])))
+    subset = portfolio.greedy_search(problem, pargs.size)
+    print('Greedy portfolio: {}'.format(describe(subset)))
+    if not pargs.greedy_only:
+        result = portfolio.exact_search(
+            problem, pargs.size, initial=subset, max_nodes=pargs.max_nodes)
+        subset = result.subset
+        print('Exact search portfolio: {} ({}, {} nodes)'.format(
+            describe(subset),
+            'optimal' if result.optimal else 'node limit reached, might not be optimal',
+            result.num_nodes))
+        if not result.optimal:
+            _logger.warning('Node limit reached')
+    subset = sorted(subset)
+
+    if pargs.output is None:
+        return 0
+
+    num_solved, par2 = problem.score(subset)
+    first = index_to_raw_result_infos[subset[0]]
+    merged = {
+        'misc': {
+            'runner': first['misc']['runner'],
+            'synthesized_from': [ names[s] for s in subset ],
+            'portfolio_num_solved': num_solved,
+            'portfolio_par2': par2,
+        },
+        'results': [],
+        'schema_version': first['schema_version'],
+    }
+    solver_to_benchmark_to_result = []
+    for s in subset:
+        solver_to_benchmark_to_result.append({
+            r['benchmark']: r for r in index_to_raw_result_infos[s]['results']
+            if 'error' not in r })
+    num_wins = [ 0 ] * len(subset)
+    for benchmark, choice in zip(problem.benchmarks,
+                                 problem.get_virtual_best_choices(subset).tolist()):
+        rank_failure = choice < 0
+        if rank_failure:
+            # No solver in the portfolio solves it. Use the first one that
+            # has a result.
+            choice = next(
+                (i for i, m in enumerate(solver_to_benchmark_to_result) if benchmark in m),
+                None)
+            if choice is None:
+                _logger.warning('No result for "{}"'.format(benchmark))
+                continue
+        else:
+            num_wins[choice] += 1
+        copied_result = copy.deepcopy(solver_to_benchmark_to_result[choice][benchmark])
+        copied_result['rank_failure'] = rank_failure
+        copied_result['rank_winner'] = names[subset[choice]]
+        merged['results'].append(copied_result)
+    for i, s in enumerate(subset):
+        merged['misc']['rank_wins_for_{}'.format(names[s])] = num_wins[i]
+
+    # Validate against schema
+    try:
+        _logger.info('Validating result_infos')
+        validation_digest = ResultInfo.validateResultInfos(merged, returnDigest=True)
+    except ResultInfo.ResultInfoValidationError as e:
+        _logger.error('Validation error:\n{}'.format(e))
+        return 1
+    _logger.info('Validation complete')
+    smtrunner.util.writeYaml(
+        pargs.output,
+        ResultInfo.withValidationDigest(merged, validation_digest))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
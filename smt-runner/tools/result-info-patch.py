@@ -185,13 +185,15 @@ def main(args):
     # Validate against schema
     try:
         _logger.info('Validating result_infos')
-        ResultInfo.validateResultInfos(new_rri)
+        validation_digest = ResultInfo.validateResultInfos(new_rri, returnDigest=True)
     except ResultInfo.ResultInfoValidationError as e:
         _logger.error('Validation error:\n{}'.format(e))
         return 1
     _logger.info('Validation complete')
     _logger.info('Writing to "{}"'.format(pargs.output_result_info.name))
-    smtrunner.util.writeYaml(pargs.output_result_info, new_rri)
+    smtrunner.util.writeYaml(
+        pargs.output_result_info,
+        ResultInfo.withValidationDigest(new_rri, validation_digest))
     _logger.info('Writing done')
 
     # Now create the new working directory by copying from other directories
@@ -7,7 +7,7 @@ Generate quantile plot from one of more result infos
 """
 from load_smtrunner import add_smtrunner_to_module_search_path
 add_smtrunner_to_module_search_path()
-from smtrunner import ResultInfo, DriverUtil, ResultInfoUtil, analysis, event_analysis
+from smtrunner import ResultInfo, DriverUtil, ResultInfoUtil, ResultTable, analysis, quantile
 import smtrunner.util
 import matplotlib.pyplot as plt
 from matplotlib.ticker import LogLocator
@@ -26,6 +26,8 @@ import yaml
 
 _logger = None
 
+TIME_PREFS = ['dsoes_wallclock', 'wallclock']
+
 def round_away_from_zero_to_multiple_of(mult, value):
     assert mult > 0
     if value >= 0:
@@ -386,113 +388,105 @@ class ResultInfoFuzzingThroughputScores(ResultInfoGenericScore):
         return (x_points, y_points, y_errors, point_index_to_benchmark_name_map)
 
 
-class ResultInfoTimeScores(ResultInfoGenericScore):
-    def __init__(self, result_info_to_time_bounds_fn):
-        super(ResultInfoTimeScores, self).__init__()
-        self._result_info_to_time_bounds_fn = result_info_to_time_bounds_fn
-
-    @property
-    def x_label(self):
-        return 'Accumulated score'
-
-    @property
-    def y_label(self):
-        return 'Runtime (s)'
-
-    def _compute_score(self, ri):
-        # Look at the event tag
-        # Merge tags if a merge resutl and
-        # then compute a score.
-        event_tag, conflicts = event_analysis.get_event_tag(ri)
-        _logger.debug('Got "{}" tag for ri {}'.format(event_tag, ri['benchmark']))
-        if conflicts:
-            _logger.warning('Conflicts found when processing {}'.format(ri))
-        if event_tag == 'sat':
-            return 1
-        # elif event_tag == 'unsat':
-        #     return 1
-        # elif event_tag == 'sat_but_expected_unsat':
-        #     return -1
-        # elif event_tag == 'unsat_but_expected_sat':
-        #     return -1
-        # elif event_tag is None:
-        #     raise Exception("Event tag can't be None")
-        else:
-            # Any other event
-            return 0
-
-    def _compute_points(self, **kwargs):
-        """
-        Return tuple
-        ( <x points>, <y points>, <y errors>, <point index to benchmark name map>)
-        """
-        if len(kwargs) > 0:
-            raise Exception('Keyword arguments not accepted')
-        x_points = []
-        y_points = []
-        y_errors = [ [], [] ]
-        point_index_to_benchmark_name_map = []
-
-        positive_ris = self._positive_results.copy()
-        negative_ris = self._negative_results.copy()
-        _logger.info('# {} positive benchmarks'.format(len(positive_ris)))
-        _logger.info('# {} negative benchmarks'.format(len(negative_ris)))
+def make_result_info_score_generator(pargs):
+    # Points of time mode are computed by `quantile.compute_time_points()`
+    if pargs.mode == 'fuzzing_throughput':
+        return ResultInfoFuzzingThroughputScores()
+    else:
+        raise Exception("{} is an unsupported mode".format(pargs.mode))
 
-        # Sort the positive points by execution time
-        # Ignoring bounds.
-        positive_ris.sort(key=lambda ri: self._result_info_to_time_bounds_fn(ri)[1])
+def load_tables(pargs):
+    """
+        Load the result info files as `ResultTable`s. Returns `None` on
+        error.
+    """
+    tables = []
+    for result_infos_file_path in pargs.result_infos:
+        try:
+          with open(result_infos_file_path, 'r') as f:
+            _logger.info('Loading "{}"'.format(f.name))
+            tables.append(ResultTable.load(f))
+        except ResultInfo.ResultInfoValidationError as e:
+            _logger.error('Validation error:\n{}'.format(e))
+            return None
+        except ResultTable.ResultTableError as e:
+            _logger.error('Failed to load "{}": {}'.format(result_infos_file_path, e))
+            return None
+        _logger.info('Loading done')
+    return tables
 
-        x_starting_point = 0 -len(negative_ris)
-        x_accumulating_score = x_starting_point
+def compute_points(pargs):
+    """
+        Load the result info files and compute the points to plot for each
+        of them. Returns a list of `quantile.QuantilePoints` or `None` on
+        error.
+    """
+    if pargs.mode == 'time':
+        # Only the columns are needed
+        tables = load_tables(pargs)
+        if tables is None:
+            return None
+        _logger.info('Computing points')
+        return quantile.compute_time_points(
+            tables,
+            max_time=pargs.max_exec_time,
+            time_prefs=TIME_PREFS,
+            confidence_interval_factor=analysis.CONFIDENCE_INTERVAL_FACTOR_99)
 
-        # First point to handle is the "dummy point" which summarises the number
-        # of negative scores
-        index = 0
-        dummy_point_time = 0.0
-        if len(positive_ris) == 0:
-            _logger.warning('Using {} as dummy point time'.format(dummy_point_time))
-        else:
-            # Use the time of the point of the shortest executing positive score
-            # benchmark. This avoids any big discontinuities at the beginning
-            # (left most region) of the curve
-            dummy_point_time = self._result_info_to_time_bounds_fn(positive_ris[0])[1]
-        x_points.append(x_accumulating_score)
-        y_points.append(dummy_point_time)
-        y_errors[0].append(0.0)
-        y_errors[1].append(0.0)
-        # Doesn't correspond to any one single benchmark so give it a fake name
-        point_index_to_benchmark_name_map.append("dummy_point")
-        x_accumulating_score += 1
+    index_to_raw_result_infos = []
+    for index, result_infos_file_path in enumerate(pargs.result_infos):
+        try:
+          with open(result_infos_file_path, 'r') as f:
+            _logger.info('Loading "{}"'.format(f.name))
+            ris = ResultInfo.loadRawResultInfos(f)
+            index_to_raw_result_infos.append(ris)
+        except ResultInfo.ResultInfoValidationError as e:
+            _logger.error('Validation error:\n{}'.format(e))
+            return None
+        _logger.info('Loading done')
 
-        # Now add the other points corresponding to positively scoring benchmarks
-        for ri in positive_ris:
-            lower_exec_time_bound, avg_exec_time, upper_exec_time_bound = self._result_info_to_time_bounds_fn(ri)
-            x_points.append(x_accumulating_score)
-            y_points.append(avg_exec_time)
-            upper_y_error = abs(upper_exec_time_bound - avg_exec_time)
-            lower_y_error = abs(avg_exec_time - lower_exec_time_bound)
-            y_errors[0].append(lower_y_error)
-            y_errors[1].append(upper_y_error)
-            point_index_to_benchmark_name_map.append(ri['benchmark'])
-            x_accumulating_score += 1
+    # Perform grouping by benchmark name
+    # Technically not necessary but this can be used as a safety check to make sure
+    # all result info files are talking about the same benchmarks
+    key_to_results_infos, rejected_result_infos = ResultInfoUtil.group_result_infos_by(
+            index_to_raw_result_infos)
+    if len(rejected_result_infos) > 0:
+        _logger.warning('There were rejected result infos')
+        num_merge_failures = 0
+        for index, l in enumerate(rejected_result_infos):
+            _logger.warning('Index {} had {} rejections'.format(index, len(l)))
+            num_merge_failures += len(l)
+        if num_merge_failures > 0:
+            if pargs.allow_merge_failures:
+                _logger.warning('Merge failures being allowed')
+            else:
+                _logger.error('Merge failures are not allowed')
+                return None
 
-        return (x_points, y_points, y_errors, point_index_to_benchmark_name_map)
+    _logger.info('Computing points')
+    index_to_ri_scores = compute_scores(pargs, index_to_raw_result_infos)
+    return [ quantile.QuantilePoints.from_scores(ri_scores)
+             for ri_scores in index_to_ri_scores ]
 
-def make_result_info_score_generator(pargs):
-    if pargs.mode == 'time':
-        # For each result info compute the corresponding scores.
-        def result_info_to_time_bounds_fn(ri):
-            return analysis.get_exec_time_with_bounds(
-                ri,
-                max_time=pargs.max_exec_time,
-                bound_fn=analysis.get_arithmetic_mean_and_99_confidence_intervals,
-                time_prefs=['dsoes_wallclock', 'wallclock']
-            )
-        return ResultInfoTimeScores(result_info_to_time_bounds_fn)
-    elif pargs.mode == 'fuzzing_throughput':
-        return ResultInfoFuzzingThroughputScores()
-    else:
-        raise Exception("{} is an unsupported mode".format(pargs.mode))
+def compute_scores(pargs, index_to_raw_result_infos):
+    """
+        Compute points by scoring results one at a time. Returns a list of
+        `ResultInfoGenericScore`.
+    """
+    index_to_ri_scores = []
+    for index, ris in enumerate(index_to_raw_result_infos):
+        ri_scores = make_result_info_score_generator(pargs)
+        index_to_ri_scores.append(ri_scores)
+        ri_scores.addResults(ris['results'])
+    # Do point computations
+    do_global_compute_points_kwargs = {}
+    if pargs.fuzzing_point_ordering:
+        do_global_compute_points_kwargs['point_ordering'] = pargs.fuzzing_point_ordering
+    index_to_ri_scores[0].do_global_compute_points(
+        index_to_ri_scores,
+        **do_global_compute_points_kwargs
+    )
+    return index_to_ri_scores
 
 def main(args):
     global _logger
@@ -538,6 +532,13 @@ def main(args):
         choices=['time', 'fuzzing_throughput'],
         default='time',
     )
+    parser.add_argument('--points-cache',
+        dest='points_cache',
+        default=None,
+        help='Sidecar file to cache the computed points in. If it was '
+             'written for the same result info files and options the '
+             'points are read from it instead of loading the result infos',
+    )
     parser.add_argument('--fuzzing-point-ordering',
         choices=['independent', 'max_score', 'max_throughput', 'max_mean_throughput'],
         dest='fuzzing_point_ordering',
@@ -576,11 +577,9 @@ def main(args):
     if pargs.true_type_fonts:
         smtrunner.util.set_true_type_font()
 
-    index_to_raw_result_infos = []
     index_to_file_name = []
     index_to_abs_file_path = []
     index_to_truncated_file_path = []
-    index_to_ris = []
     index_to_legend_name = []
     if pargs.legend_name_map:
         # Naming is bad here. We actually expect
@@ -596,20 +595,9 @@ def main(args):
                 return 1
             index_to_legend_name = legend_list
 
-    for index, result_infos_file_path in enumerate(pargs.result_infos):
-        try:
-          with open(result_infos_file_path, 'r') as f:
-            _logger.info('Loading "{}"'.format(f.name))
-            ris = ResultInfo.loadRawResultInfos(f)
-            index_to_raw_result_infos.append(ris)
-            index_to_file_name.append(f.name)
-            index_to_abs_file_path.append(os.path.abspath(f.name))
-            index_to_ris.append(ris['results'])
-        except ResultInfo.ResultInfoValidationError as e:
-            _logger.error('Validation error:\n{}'.format(e))
-            return 1
-        _logger.info('Loading done')
-    result_infos = None
+    for result_infos_file_path in pargs.result_infos:
+        index_to_file_name.append(result_infos_file_path)
+        index_to_abs_file_path.append(os.path.abspath(result_infos_file_path))
 
     longest_path_prefix = ResultInfoUtil.compute_longest_common_path_prefix(index_to_abs_file_path)
     index_to_prefix_truncated_path = []
@@ -624,58 +612,37 @@ def main(args):
         index_to_truncated_file_path.append(truncated_path)
         assert index_to_truncated_file_path[index] == truncated_path
 
-    # Perform grouping by benchmark name
-    # Technically not necessary but this can be used as a safety check to make sure
-    # all result info files are talking about the same benchmarks
-    key_to_results_infos, rejected_result_infos = ResultInfoUtil.group_result_infos_by(
-            index_to_raw_result_infos)
-    if len(rejected_result_infos) > 0:
-        _logger.warning('There were rejected result infos')
-        num_merge_failures = 0
-        for index, l in enumerate(rejected_result_infos):
-            _logger.warning('Index {} had {} rejections'.format(index, len(l)))
-            num_merge_failures += len(l)
-        if num_merge_failures > 0:
-            if pargs.allow_merge_failures:
-                _logger.warning('Merge failures being allowed')
-            else:
-                _logger.error('Merge failures are not allowed')
-                return 1
+    # The points only depend on the result info files and these options so
+    # if they haven't changed the cached points can be used.
+    points_cache_inputs = quantile.get_points_cache_inputs(
+        pargs.result_infos,
+        {
+            'mode': pargs.mode,
+            'max_exec_time': pargs.max_exec_time,
+            'fuzzing_point_ordering': pargs.fuzzing_point_ordering,
+            'allow_merge_failures': pargs.allow_merge_failures,
+        })
+    index_to_points = None
+    if pargs.points_cache:
+        index_to_points = quantile.load_points(
+            pargs.points_cache, points_cache_inputs)
+    if index_to_points is None:
+        index_to_points = compute_points(pargs)
+        if index_to_points is None:
+            return 1
+        if pargs.points_cache:
+            quantile.save_points(
+                pargs.points_cache, points_cache_inputs, index_to_points)
 
-    _logger.info('Computing points')
-    index_to_ri_scores = []
-    index_to_x_points = []
-    index_to_y_points = []
-    index_to_y_error_points = []
-    index_to_point_index_to_benchmark_name_map = []
     max_observed_y_value = 0.0
     max_observed_x_value = 0.0
     min_observed_x_value = 0.0
-    for index, ris in enumerate(index_to_raw_result_infos):
-        ri_scores = make_result_info_score_generator(pargs)
-        index_to_ri_scores.append(ri_scores)
-        ri_scores.addResults(ris['results'])
-    # Do point computations
-    do_global_compute_points_kwargs = {}
-    if pargs.fuzzing_point_ordering:
-        do_global_compute_points_kwargs['point_ordering'] = pargs.fuzzing_point_ordering
-    index_to_ri_scores[0].do_global_compute_points(
-        index_to_ri_scores,
-        **do_global_compute_points_kwargs
-    )
-
-    for index, ri_scores in enumerate(index_to_ri_scores):
-        index_to_x_points.append(ri_scores.x_points)
-        index_to_y_points.append(ri_scores.y_points)
-        index_to_y_error_points.append(ri_scores.y_errors)
-        index_to_point_index_to_benchmark_name_map.append(
-            ri_scores.point_index_to_benchmark_name_map)
-
+    for points in index_to_points:
         # See if we've found a larger time.
-        for y_point in ri_scores.y_points:
+        for y_point in points.y_points:
             if y_point is not None and y_point > max_observed_y_value:
                 max_observed_y_value = y_point
-        for x_point in ri_scores.x_points:
+        for x_point in points.x_points:
             if x_point > max_observed_x_value:
                 max_observed_x_value = x_point
             if x_point < min_observed_x_value:
@@ -684,15 +651,20 @@ def main(args):
     _logger.info('min observed x value: {}'.format(min_observed_x_value))
     _logger.info('max observed x value: {}'.format(max_observed_x_value))
     _logger.info('max observed y value: {}'.format(max_observed_y_value))
-    ri_scores = None
 
     # Report means
-    for index, ri_score in enumerate(index_to_ri_scores):
+    for index, points in enumerate(index_to_points):
         name = index_to_truncated_file_path[index]
-        means = ri_score.get_y_mean_bounds()
+        means = points.get_y_mean_bounds()
         _logger.info('Means (<min>, <mean>, <max>) for {} is {}'.format(
             name, means)
         )
+        if pargs.mode == 'time':
+            thresholds = [ t for t in [1.0, 10.0, 100.0] if t < pargs.max_exec_time ]
+            thresholds.append(pargs.max_exec_time)
+            _logger.info('# solved within {} seconds for {} is {}'.format(
+                thresholds, name, points.get_solved_counts(thresholds).tolist())
+            )
 
     # Now try to plot
     fig, ax = plt.subplots()
@@ -702,23 +674,23 @@ def main(args):
         ax.set_title(pargs.title, fontsize=pargs.title_font_size)
 
     # setting label
-    ax.set_xlabel(index_to_ri_scores[0].x_label, fontsize=pargs.label_font_size)
-    ax.set_ylabel(index_to_ri_scores[0].y_label, fontsize=pargs.label_font_size)
+    ax.set_xlabel(index_to_points[0].x_label, fontsize=pargs.label_font_size)
+    ax.set_ylabel(index_to_points[0].y_label, fontsize=pargs.label_font_size)
 
     # Add curves
     curves = [ ]
     legend_names = [ ]
-    for index, _ in enumerate(index_to_ris):
+    for index, points in enumerate(index_to_points):
         _logger.info('"{}" # of benchmarks with {} +ve score, {} -ve score, {} zero score'.format(
             index_to_truncated_file_path[index],
-            index_to_ri_scores[index].num_positive,
-            index_to_ri_scores[index].num_negative,
-            index_to_ri_scores[index].num_zero)
+            points.num_positive,
+            points.num_negative,
+            points.num_zero)
         )
-        x_points = index_to_x_points[index]
-        y_points = index_to_y_points[index]
-        y_errors = index_to_y_error_points[index]
-        point_index_to_benchmark_name_map = index_to_point_index_to_benchmark_name_map[index]
+        x_points = points.x_points
+        y_points = points.y_points
+        y_errors = points.y_errors
+        point_index_to_benchmark_name_map = points.point_index_to_benchmark_name_map
         name_for_legend = None
         result_info_file_name = index_to_file_name[index]
         if pargs.legend_name_map:
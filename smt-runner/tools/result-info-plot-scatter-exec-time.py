@@ -3,19 +3,23 @@
 # This file is covered by the license in LICENSE.txt
 # vim: set sw=4 ts=4 softtabstop=4 expandtab:
 """
-Read two result info files and generate a scatter plot of execution time
+Read two result info files and generate a scatter plot of execution time.
+Use `--plot` (multiple times) to generate many scatter plots at once.
 """
 from load_smtrunner import add_smtrunner_to_module_search_path
 add_smtrunner_to_module_search_path()
 from smtrunner import ResultInfo, DriverUtil, ResultInfoUtil, analysis, event_analysis
 import smtrunner.util
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import FigureCanvasPdf
+from matplotlib.figure import Figure
 import numpy as np
 
 import argparse
 import json
 import logging
 import math
+import multiprocessing
 import os
 import pprint
 import random
@@ -35,200 +39,86 @@ def strip(prefix, path):
         return path[len(prefix):]
 
 
-def main(args):
-    global _logger
-    global _fail_count
-    parser = argparse.ArgumentParser(description=__doc__)
-    DriverUtil.parserAddLoggerArg(parser)
-    parser.add_argument('first_result_info',
-        type=argparse.FileType('r'))
-    parser.add_argument('second_result_info',
-        type=argparse.FileType('r'))
-    parser.add_argument('--base', type=str, default="")
-    parser.add_argument('--point-size', type=float, default=5, dest='point_size')
-    parser.add_argument('--title-switch', dest="title_switch", default=False, action='store_true')
-    parser.add_argument('--title-font-size', dest='title_font_size', default=16, type=int)
-    parser.add_argument('--label-font-size', dest='label_font_size', default=14, type=int)
-    parser.add_argument('--tick-font-size', dest='tick_font_size', default=12, type=int)
-    parser.add_argument('--annotate-font-size', dest='annotate_font_size', default=20, type=int)
-    parser.add_argument('--annotate-size', dest='annotate_size', default=30, type=int)
-    parser.add_argument('--allow-merge-failures',
-        dest='allow_merge_failures',
-        default=False,
-        action='store_true',
-    )
-    parser.add_argument('--max-exec-time',
-        default=None,
-        type=float,
-        dest='max_exec_time',
-    )
-    parser.add_argument('--title',
-        # default="{num_keys} benchmarks, {num_both} jointly SAT, average speedup is {speedup}"
-        default = "{speedup}X speedup"
-    )
-    parser.add_argument("--xlabel",
-        type=str,
-        default=None,
-    )
-    parser.add_argument("--ylabel",
-        type=str,
-        default=None,
-    )
-    parser.add_argument("--axis-label-suffix",
-        type=str,
-        default=" execution time (s)",
-        dest="axis_label_suffix",
-    )
-    parser.add_argument("--axis-label-colour",
-        type=str,
-        default="black",
-        dest="axis_label_colour",
-    )
-    parser.add_argument("--annotate",
-        default=False,
-        action='store_true',
-    )
-    parser.add_argument("--annotate-use-legacy-values",
-        default=False,
-        action='store_true',
-    )
-    parser.add_argument("--output",
-        default=None,
-        type=argparse.FileType('wb'),
-    )
-    parser.add_argument("--error-bars",
-        default=False,
-        action='store_true',
-    )
-    parser.add_argument("--annotate-timeout-point",
-        dest='annotate_timeout_point',
-        default=False,
-        action='store_true',
-    )
-    parser.add_argument("--require-time-abs-diff",
-        dest="require_time_abs_diff",
-        default=0.0,
-        type=float
-    )
-    parser.add_argument('--true-type-fonts',
-        default=False,
-        action='store_true'
-    )
-
-    pargs = parser.parse_args(args)
-    DriverUtil.handleLoggerArgs(pargs, parser)
-    _logger = logging.getLogger(__name__)
-
-    if pargs.max_exec_time is None:
-        _logger.error('--max-exec-time must be specified')
-        return 1
-
-    if pargs.true_type_fonts:
-        smtrunner.util.set_true_type_font()
-
-    index_to_raw_result_infos = []
-    index_to_file_name = []
-    for index, result_infos_file in enumerate([pargs.first_result_info, pargs.second_result_info]):
-        try:
-            _logger.info('Loading "{}"'.format(result_infos_file.name))
-            result_infos = ResultInfo.loadRawResultInfos(result_infos_file)
-            index_to_raw_result_infos.append(result_infos)
-            index_to_file_name.append(result_infos_file.name)
-        except ResultInfo.ResultInfoValidationError as e:
-            _logger.error('Validation error:\n{}'.format(e))
-            return 1
-        _logger.info('Loading done')
-    result_infos = None
-
-    # Perform grouping by benchmark name
-    key_to_results_infos, rejected_result_infos = ResultInfoUtil.group_result_infos_by(
-            index_to_raw_result_infos)
-    if len(rejected_result_infos) > 0:
-        _logger.warning('There were rejected result infos')
-        num_merge_failures = 0
-        for index, l in enumerate(rejected_result_infos):
-            _logger.warning('Index {} had {} rejections'.format(index, len(l)))
-            num_merge_failures += len(l)
-        if num_merge_failures > 0:
-            if pargs.allow_merge_failures:
-                _logger.warning('Merge failures being allowed')
-            else:
-                _logger.error('Merge failures are not allowed')
-                return 1
-
-
-    # Generate scatter points
-    x_scatter_points = []
-    x_scatter_errors = [[], []]
-    y_scatter_points = []
-    y_scatter_errors = [[], []]
-    count_dual_timeout = 0
-    count_x_lt_y_not_dt = 0
-    count_x_gt_y_not_dt = 0
-    count_x_eq_y_not_dt = 0
-
-    # New counting vars
-    bounds_incomparable_keys = set()
-    x_gt_y_keys = set()
-    x_lt_y_keys = set()
-    x_eq_y_keys = set()
-    x_eq_y_and_is_timeout_keys = set()
-    # cnt = 0
-    for key, raw_result_info_list in sorted(key_to_results_infos.items(), key=lambda kv:kv[0]):
-        _logger.info('Ranking on "{}" : '.format(key))
-        indices_to_use = []
-        # Compute indices to use
-        modified_raw_result_info_list = [ ]
-        # Handle "unknown"
-        # Only compare results that gave sat/unsat
-        for index, ri in enumerate(raw_result_info_list):
-            if isinstance(ri['event_tag'], str):
-                # single result
-                event_tag = ri['event_tag']
-            else:
-                assert isinstance(ri['event_tag'], list)
-                event_tag, _ = event_analysis.merge_aggregate_events(
-                    ri['event_tag'])
-
-            # Event must be sat or timeout
-            _logger.info('index {} is {}'.format(index, event_tag))
-            if event_tag not in { 'sat', 'timeout', 'soft_timeout'}:
-                # Skip this. We can't do a meaningful comparison here
-                continue
-            indices_to_use.append(index)
-            # Normalise timeouts to have fixed values for the time.
-            if event_tag in {'timeout', 'soft_timeout'}:
-                modified_ri = analysis.get_result_with_modified_time(
-                    ri,
-                    pargs.max_exec_time)
-                _logger.debug('modified_ri: {}'.format(
-                    pprint.pformat(modified_ri)))
-                _logger.debug(
-                    'Treating index {} for {} due to unknown as having max-time'.format(
-                        index,
-                        key))
-                modified_raw_result_info_list.append(modified_ri)
-            else:
-                modified_raw_result_info_list.append(ri)
-        _logger.debug('used indices_to_use: {}'.format(indices_to_use))
-
-        if len(indices_to_use) != 2:
-            # Skip this one. One of the result infos can't be compared
-            # against.
+def get_key_to_scatter_bounds(result_infos, max_exec_time):
+    """
+        Returns a dictionary mapping the key of each result in
+        `result_infos` that can be compared to the execution time bounds
+        (lower_bound, mean, upper_bound) of the result.
+
+        Only results whose event tag is sat or a timeout can be compared.
+        Timeouts are treated as taking `max_exec_time`.
+    """
+    key_to_bounds = dict()
+    for ri in result_infos['results']:
+        key = ResultInfoUtil.get_result_info_key(ri)
+        if isinstance(ri['event_tag'], str):
+            # single result
+            event_tag = ri['event_tag']
+        else:
+            assert isinstance(ri['event_tag'], list)
+            event_tag, _ = event_analysis.merge_aggregate_events(
+                ri['event_tag'])
+
+        # Event must be sat or timeout
+        _logger.debug('{} is {}'.format(key, event_tag))
+        if event_tag not in { 'sat', 'timeout', 'soft_timeout'}:
+            # Skip this. We can't do a meaningful comparison here
             continue
-
-        assert len(indices_to_use) == 2
-        # Get execution times
-        index_to_execution_time_bounds = analysis.get_index_to_execution_time_bounds(
-            modified_raw_result_info_list,
-            indices_to_use,
-            pargs.max_exec_time,
+        # Normalise timeouts to have fixed values for the time.
+        if event_tag in {'timeout', 'soft_timeout'}:
+            ri = analysis.get_result_with_modified_time(ri, max_exec_time)
+            _logger.debug(
+                'Treating {} due to unknown as having max-time'.format(key))
+        key_to_bounds[key] = analysis.get_exec_time_with_bounds(
+            ri,
+            max_exec_time,
             analysis.get_arithmetic_mean_and_99_confidence_intervals,
             ['dsoes_wallclock', 'wallclock'])
-        assert isinstance(index_to_execution_time_bounds, list)
-        # index_to_execution_time_bounds is a list of tuples  (lower_bound, mean, upper_bound)   99.9% confidence interval
-        x_scatter_point_bounds = index_to_execution_time_bounds[0]
-        y_scatter_point_bounds = index_to_execution_time_bounds[1]
+    return key_to_bounds
+
+class ScatterPoints:
+    """
+        The points of a scatter plot comparing the execution times of two
+        result info files and the counts that are reported for it.
+    """
+    def __init__(self):
+        self.x_points = []
+        self.x_errors = [[], []]
+        self.y_points = []
+        self.y_errors = [[], []]
+        self.count_dual_timeout = 0
+        self.count_x_lt_y_not_dt = 0
+        self.count_x_gt_y_not_dt = 0
+        self.count_x_eq_y_not_dt = 0
+        self.bounds_incomparable_keys = set()
+        self.x_gt_y_keys = set()
+        self.x_lt_y_keys = set()
+        self.x_eq_y_keys = set()
+        self.x_eq_y_and_is_timeout_keys = set()
+        self.num_keys = 0
+        self.x_time_mean = None
+        self.y_time_mean = None
+        self.x_avg = None
+        self.y_avg = None
+        self.num_both = 0
+        self.speedup = None
+
+def compute_scatter_points(x_key_to_bounds, y_key_to_bounds, keys, max_exec_time, require_time_abs_diff):
+    """
+        Compute the `ScatterPoints` for the results in `keys` using the
+        bounds computed by `get_key_to_scatter_bounds()` for the x and y
+        result info files.
+    """
+    points = ScatterPoints()
+    points.num_keys = len(keys)
+    for key in sorted(keys):
+        if key not in x_key_to_bounds or key not in y_key_to_bounds:
+            # Skip this one. One of the result infos can't be compared
+            # against.
+            continue
+        # Bounds are tuples (lower_bound, mean, upper_bound) of the 99.9% confidence interval
+        x_scatter_point_bounds = x_key_to_bounds[key]
+        y_scatter_point_bounds = y_key_to_bounds[key]
         x_scatter_point = x_scatter_point_bounds[1] # mean
         y_scatter_point = y_scatter_point_bounds[1] # mean
         x_scatter_lower_error = x_scatter_point_bounds[1] - x_scatter_point_bounds[0]
@@ -240,95 +130,90 @@ def main(args):
         y_scatter_higher_error = y_scatter_point_bounds[2] - y_scatter_point_bounds[1]
         assert y_scatter_higher_error >= 0
 
-        # print(cnt)
-        # cnt += 1
-        x_scatter_points.append(x_scatter_point)
-        y_scatter_points.append(y_scatter_point)
+        points.x_points.append(x_scatter_point)
+        points.y_points.append(y_scatter_point)
         # Error bar points
-        #x_scatter_errors.append((x_scatter_lower_error, x_scatter_higher_error))
-        x_scatter_errors[0].append(x_scatter_lower_error)
-        x_scatter_errors[1].append(x_scatter_higher_error)
-        #y_scatter_errors.append((y_scatter_lower_error, y_scatter_higher_error))
-        y_scatter_errors[0].append(y_scatter_lower_error)
-        y_scatter_errors[1].append(y_scatter_higher_error)
+        points.x_errors[0].append(x_scatter_lower_error)
+        points.x_errors[1].append(x_scatter_higher_error)
+        points.y_errors[0].append(y_scatter_lower_error)
+        points.y_errors[1].append(y_scatter_higher_error)
 
         # LEGACY: Now do some counting
         if x_scatter_point == y_scatter_point:
-            if x_scatter_point == pargs.max_exec_time:
+            if x_scatter_point == max_exec_time:
                 assert x_scatter_lower_error == 0
                 assert x_scatter_higher_error == 0
                 assert y_scatter_lower_error == 0
                 assert y_scatter_higher_error == 0
-                count_dual_timeout += 1
+                points.count_dual_timeout += 1
             else:
                 _logger.info('Found count_x_eq_y_not_dt: x: {}, key: {}'.format(
                     x_scatter_point,
                     key))
-                count_x_eq_y_not_dt += 1
+                points.count_x_eq_y_not_dt += 1
         elif x_scatter_point > y_scatter_point:
-            count_x_gt_y_not_dt += 1
+            points.count_x_gt_y_not_dt += 1
         else:
             assert x_scatter_point < y_scatter_point
-            count_x_lt_y_not_dt += 1
+            points.count_x_lt_y_not_dt += 1
 
         # SMARTER counting: uses error bounds
         if analysis.bounds_overlap(x_scatter_point_bounds, y_scatter_point_bounds):
             # Bounds overlap, we can't compare the execution times in a meaningful way
-            bounds_incomparable_keys.add(key)
+            points.bounds_incomparable_keys.add(key)
             # However if both are timeouts we can note this
-            if x_scatter_point == pargs.max_exec_time:
-                x_eq_y_and_is_timeout_keys.add(key)
-            # else:
-            #     print(x_scatter_points, y_scatter_points)
+            if x_scatter_point == max_exec_time:
+                points.x_eq_y_and_is_timeout_keys.add(key)
         else:
             # Compare the means
-            if x_scatter_point > y_scatter_point and abs(x_scatter_point - y_scatter_point) > pargs.require_time_abs_diff:
-                x_gt_y_keys.add(key)
-            elif x_scatter_point < y_scatter_point and abs(x_scatter_point - y_scatter_point) > pargs.require_time_abs_diff:
-                x_lt_y_keys.add(key)
+            if x_scatter_point > y_scatter_point and abs(x_scatter_point - y_scatter_point) > require_time_abs_diff:
+                points.x_gt_y_keys.add(key)
+            elif x_scatter_point < y_scatter_point and abs(x_scatter_point - y_scatter_point) > require_time_abs_diff:
+                points.x_lt_y_keys.add(key)
             else:
-                if pargs.require_time_abs_diff == 0.0:
+                if require_time_abs_diff == 0.0:
                     assert x_scatter_point == y_scatter_point
-                x_eq_y_keys.add(key)
-
-    # Report counts
-    print("# of points : {}".format(len(x_scatter_points)))
-    print("LEGACY: count_dual_timeout: {}".format(count_dual_timeout))
-    print("LEGACY: count_x_eq_y_not_dt: {}".format(count_x_eq_y_not_dt))
-    print("LEGACY: count_x_gt_y_not_dt: {}".format(count_x_gt_y_not_dt))
-    print("LEGACY: count_x_lt_y_not_dt: {}".format(count_x_lt_y_not_dt))
-    print("")
-    print("# x > y and no bound overlap: {}".format(len(x_gt_y_keys)))
-    print("# x < y and no bound overlap: {}".format(len(x_lt_y_keys)))
-    print("# x = y and no bound overlap: {}".format(len(x_eq_y_keys)))
-    print("# incomparable: {}".format(len(bounds_incomparable_keys)))
-    print("# of x = y and is timeout: {}".format(len(x_eq_y_and_is_timeout_keys)))
-
-    # print(x_scatter_points)
-    # print(y_scatter_points)
-    # print(len(x_scatter_points),len(y_scatter_points))
-    x_time_mean = np.mean(x_scatter_points, 0)
-    y_time_mean = np.mean(y_scatter_points, 0)
-    print(x_time_mean, y_time_mean, y_time_mean/x_time_mean)
+                points.x_eq_y_keys.add(key)
+
+    points.x_time_mean = np.mean(points.x_points, 0)
+    points.y_time_mean = np.mean(points.y_points, 0)
     x_a = 0
     y_a = 0
     cnt = 0
-    for i,v in enumerate(x_scatter_points):
-        x_v = x_scatter_points[i]
-        y_v = y_scatter_points[i]
+    for i,v in enumerate(points.x_points):
+        x_v = points.x_points[i]
+        y_v = points.y_points[i]
         if x_v>=60 or y_v>=60:
             continue
         x_a += x_v
         y_a += y_v
         cnt += 1
-    # xx_a = np.power(x_a, len(x_scatter_points))
-    # yy_a = np.power(y_a, len(y_scatter_points))
-    x_avg = x_a/cnt
-    y_avg = y_a/cnt
-    speed_up = round(y_avg/x_avg, 2)
-    print(x_avg, y_avg, speed_up)
-
-    # Now plot
+    points.x_avg = x_a/cnt
+    points.y_avg = y_a/cnt
+    points.num_both = cnt
+    points.speedup = round(points.y_avg/points.x_avg, 2)
+    return points
+
+def report_scatter_points(points):
+    print("# of points : {}".format(len(points.x_points)))
+    print("LEGACY: count_dual_timeout: {}".format(points.count_dual_timeout))
+    print("LEGACY: count_x_eq_y_not_dt: {}".format(points.count_x_eq_y_not_dt))
+    print("LEGACY: count_x_gt_y_not_dt: {}".format(points.count_x_gt_y_not_dt))
+    print("LEGACY: count_x_lt_y_not_dt: {}".format(points.count_x_lt_y_not_dt))
+    print("")
+    print("# x > y and no bound overlap: {}".format(len(points.x_gt_y_keys)))
+    print("# x < y and no bound overlap: {}".format(len(points.x_lt_y_keys)))
+    print("# x = y and no bound overlap: {}".format(len(points.x_eq_y_keys)))
+    print("# incomparable: {}".format(len(points.bounds_incomparable_keys)))
+    print("# of x = y and is timeout: {}".format(len(points.x_eq_y_and_is_timeout_keys)))
+    print(points.x_time_mean, points.y_time_mean, points.y_time_mean/points.x_time_mean)
+    print(points.x_avg, points.y_avg, points.speedup)
+
+def render_scatter_plot(pargs, points, xlabel, ylabel, fig, ax):
+    """
+        Draw the scatter plot of `points` (a `ScatterPoints`) on `ax`
+        using the style options in `pargs`.
+    """
     extend = 5
     tickFreq = 5
     if pargs.max_exec_time == 60:
@@ -337,28 +222,26 @@ def main(args):
     elif pargs.max_exec_time == 600:
         extend = 50 # modify yangxu
         tickFreq = 50 # modify yangxu
-    assert len(x_scatter_points) == len(y_scatter_points)
-    fig, ax = plt.subplots(figsize=(4, 3))
-    # fig, ax = plt.subplots()
+    assert len(points.x_points) == len(points.y_points)
     fig.patch.set_alpha(0.0) # Transparent
     if pargs.error_bars:
         ax.errorbar(
-            x_scatter_points,
-            y_scatter_points,
-            xerr=x_scatter_errors,
-            yerr=y_scatter_errors,
+            points.x_points,
+            points.y_points,
+            xerr=points.x_errors,
+            yerr=points.y_errors,
             fmt='o',
             picker=5,
             ms=pargs.point_size/2.0, # HACK
             ecolor='black',
             capsize=5,
             #capthick=10,
+            rasterized=pargs.rasterize_points,
         )
     else:
-        ax.scatter(x_scatter_points, y_scatter_points, picker=5, s=pargs.point_size)
+        ax.scatter(points.x_points, points.y_points, picker=5, s=pargs.point_size,
+            rasterized=pargs.rasterize_points)
 
-    xlabel = index_to_file_name[0] if pargs.xlabel is None else pargs.xlabel
-    ylabel = index_to_file_name[1] if pargs.ylabel is None else pargs.ylabel
     # xlabel += pargs.axis_label_suffix
     # ylabel += pargs.axis_label_suffix
     ax.xaxis.label.set_color(pargs.axis_label_colour)
@@ -393,12 +276,12 @@ def main(args):
     # Construct title keyword args
     if pargs.title_switch:
         title_kwargs = {
-            'num_points': len(x_scatter_points),
-            'num_both': cnt,
-            'speedup': speed_up,
+            'num_points': len(points.x_points),
+            'num_both': points.num_both,
+            'speedup': points.speedup,
             'xlabel': xlabel,
             'ylabel': ylabel,
-            'num_keys': len(key_to_results_infos.keys()),
+            'num_keys': points.num_keys,
             'timeout': int(pargs.max_exec_time)
         }
         ax.set_title(pargs.title.format(**title_kwargs), fontsize=pargs.title_font_size)
@@ -409,12 +292,12 @@ def main(args):
     if pargs.annotate:
         if pargs.annotate_use_legacy_values:
             _logger.warning('Displaying legacy values')
-            x_lt_value_to_display = count_x_lt_y_not_dt
-            x_gt_value_to_display = count_x_gt_y_not_dt
+            x_lt_value_to_display = points.count_x_lt_y_not_dt
+            x_gt_value_to_display = points.count_x_gt_y_not_dt
         else:
             _logger.info('Displaying new values')
-            x_lt_value_to_display = len(x_lt_y_keys)
-            x_gt_value_to_display = len(x_gt_y_keys)
+            x_lt_value_to_display = len(points.x_lt_y_keys)
+            x_gt_value_to_display = len(points.x_gt_y_keys)
 
         # 添加左上中间的注释
         ax.annotate(
@@ -463,7 +346,7 @@ def main(args):
 
     # timeout point annotation
     if pargs.annotate_timeout_point:
-        num_dual_timeouts = len(x_eq_y_and_is_timeout_keys)
+        num_dual_timeouts = len(points.x_eq_y_and_is_timeout_keys)
         dual_timeout_txt = None
         # dual_timeout_txt = '{} dual timeout'.format(num_dual_timeouts)
         if num_dual_timeouts == 1:
@@ -480,13 +363,269 @@ def main(args):
             bbox=dict(boxstyle='round',fc='None'),
             fontsize=pargs.annotate_font_size)
 
+def save_scatter_plot(pargs, fig, output):
+    dpi = 30
+    if pargs.rasterize_points:
+        # Only the points are rasterized so this only affects them.
+        dpi = pargs.raster_dpi
+    fig.savefig(output, format='pdf', bbox_inches='tight', pad_inches=0.01, dpi=dpi)
+
+def _render_plot_in_worker(task):
+    pargs, points, xlabel, ylabel, output_path = task
+    # Don't use pyplot so that no GUI backend is involved and figures
+    # don't need to be closed.
+    fig = Figure(figsize=(4, 3))
+    FigureCanvasPdf(fig)
+    ax = fig.add_subplot(111)
+    render_scatter_plot(pargs, points, xlabel, ylabel, fig, ax)
+    save_scatter_plot(pargs, fig, output_path)
+    return output_path
+
+def load_result_infos(result_infos_file, allow_merge_failures):
+    """
+        Load the result infos in the open file `result_infos_file`. Returns
+        `None` on error.
+    """
+    try:
+        _logger.info('Loading "{}"'.format(result_infos_file.name))
+        result_infos = ResultInfo.loadRawResultInfos(result_infos_file)
+    except ResultInfo.ResultInfoValidationError as e:
+        _logger.error('Validation error:\n{}'.format(e))
+        return None
+    _logger.info('Loading done')
+    # Grouping rejects results that appear more than once
+    _, rejected_result_infos = ResultInfoUtil.group_result_infos_by([result_infos])
+    num_merge_failures = len(rejected_result_infos[0])
+    if num_merge_failures > 0:
+        _logger.warning('"{}" had {} rejections'.format(
+            result_infos_file.name, num_merge_failures))
+        if allow_merge_failures:
+            _logger.warning('Merge failures being allowed')
+        else:
+            _logger.error('Merge failures are not allowed')
+            return None
+    return result_infos
+
+def main(args):
+    global _logger
+    global _fail_count
+    parser = argparse.ArgumentParser(description=__doc__)
+    DriverUtil.parserAddLoggerArg(parser)
+    parser.add_argument('first_result_info',
+        type=argparse.FileType('r'),
+        nargs='?')
+    parser.add_argument('second_result_info',
+        type=argparse.FileType('r'),
+        nargs='?')
+    parser.add_argument('--plot',
+        dest='plots',
+        nargs=5,
+        action='append',
+        default=[],
+        metavar=('X_RESULT_INFO', 'Y_RESULT_INFO', 'OUTPUT', 'XLABEL', 'YLABEL'),
+        help='Write a scatter plot to OUTPUT. Can be given multiple times '
+             'to write many plots from a single invocation. Each result '
+             'info is only loaded once. Cannot be used with the positional '
+             'arguments or --output',
+    )
+    parser.add_argument('-j', '--jobs',
+        type=int,
+        default=1,
+        help='Number of processes to render plots given by --plot with (default: %(default)s)',
+    )
+    parser.add_argument('--rasterize-points',
+        dest='rasterize_points',
+        default=False,
+        action='store_true',
+        help='Rasterize the points (and error bars) so that plots with many '
+             'points are small and fast to open. Everything else stays vector graphics',
+    )
+    parser.add_argument('--raster-dpi',
+        dest='raster_dpi',
+        default=300,
+        type=int,
+        help='Resolution of rasterized points (default: %(default)s)',
+    )
+    parser.add_argument('--base', type=str, default="")
+    parser.add_argument('--point-size', type=float, default=5, dest='point_size')
+    parser.add_argument('--title-switch', dest="title_switch", default=False, action='store_true')
+    parser.add_argument('--title-font-size', dest='title_font_size', default=16, type=int)
+    parser.add_argument('--label-font-size', dest='label_font_size', default=14, type=int)
+    parser.add_argument('--tick-font-size', dest='tick_font_size', default=12, type=int)
+    parser.add_argument('--annotate-font-size', dest='annotate_font_size', default=20, type=int)
+    parser.add_argument('--annotate-size', dest='annotate_size', default=30, type=int)
+    parser.add_argument('--allow-merge-failures',
+        dest='allow_merge_failures',
+        default=False,
+        action='store_true',
+    )
+    parser.add_argument('--max-exec-time',
+        default=None,
+        type=float,
+        dest='max_exec_time',
+    )
+    parser.add_argument('--title',
+        # default="{num_keys} benchmarks, {num_both} jointly SAT, average speedup is {speedup}"
+        default = "{speedup}X speedup"
+    )
+    parser.add_argument("--xlabel",
+        type=str,
+        default=None,
+    )
+    parser.add_argument("--ylabel",
+        type=str,
+        default=None,
+    )
+    parser.add_argument("--axis-label-suffix",
+        type=str,
+        default=" execution time (s)",
+        dest="axis_label_suffix",
+    )
+    parser.add_argument("--axis-label-colour",
+        type=str,
+        default="black",
+        dest="axis_label_colour",
+    )
+    parser.add_argument("--annotate",
+        default=False,
+        action='store_true',
+    )
+    parser.add_argument("--annotate-use-legacy-values",
+        default=False,
+        action='store_true',
+    )
+    parser.add_argument("--output",
+        default=None,
+        type=argparse.FileType('wb'),
+    )
+    parser.add_argument("--error-bars",
+        default=False,
+        action='store_true',
+    )
+    parser.add_argument("--annotate-timeout-point",
+        dest='annotate_timeout_point',
+        default=False,
+        action='store_true',
+    )
+    parser.add_argument("--require-time-abs-diff",
+        dest="require_time_abs_diff",
+        default=0.0,
+        type=float
+    )
+    parser.add_argument('--true-type-fonts',
+        default=False,
+        action='store_true'
+    )
+
+    pargs = parser.parse_args(args)
+    DriverUtil.handleLoggerArgs(pargs, parser)
+    _logger = logging.getLogger(__name__)
+
+    if pargs.max_exec_time is None:
+        _logger.error('--max-exec-time must be specified')
+        return 1
+
+    if pargs.jobs <= 0:
+        _logger.error('jobs must be > 0')
+        return 1
+
+    if len(pargs.plots) > 0:
+        if (pargs.first_result_info is not None or
+                pargs.second_result_info is not None or
+                pargs.output is not None):
+            _logger.error('--plot cannot be used with positional arguments or --output')
+            return 1
+    elif pargs.first_result_info is None or pargs.second_result_info is None:
+        _logger.error('Two result infos or --plot must be specified')
+        return 1
+
+    if pargs.true_type_fonts:
+        smtrunner.util.set_true_type_font()
+
+    if len(pargs.plots) > 0:
+        return plot_many(pargs)
+
+    index_to_key_to_bounds = []
+    keys = set()
+    for result_infos_file in [pargs.first_result_info, pargs.second_result_info]:
+        result_infos = load_result_infos(
+            result_infos_file, pargs.allow_merge_failures)
+        if result_infos is None:
+            return 1
+        index_to_key_to_bounds.append(
+            get_key_to_scatter_bounds(result_infos, pargs.max_exec_time))
+        keys.update(ResultInfoUtil.get_result_info_key(ri)
+                    for ri in result_infos['results'])
+
+    # Generate scatter points
+    points = compute_scatter_points(
+        index_to_key_to_bounds[0],
+        index_to_key_to_bounds[1],
+        keys,
+        pargs.max_exec_time,
+        pargs.require_time_abs_diff)
+    report_scatter_points(points)
+
+    # Now plot
+    xlabel = pargs.first_result_info.name if pargs.xlabel is None else pargs.xlabel
+    ylabel = pargs.second_result_info.name if pargs.ylabel is None else pargs.ylabel
+    fig, ax = plt.subplots(figsize=(4, 3))
+    render_scatter_plot(pargs, points, xlabel, ylabel, fig, ax)
+
     # Finally show
     if pargs.output is None:
         plt.show()
     else:
         # For command line usage
         fig.show()
-        fig.savefig(pargs.output, format='pdf', bbox_inches='tight', pad_inches=0.01, dpi=30)
+        save_scatter_plot(pargs, fig, pargs.output)
+    return 0
+
+def plot_many(pargs):
+    """
+        Write the plots given by `--plot`. Each result info file is loaded
+        and has its bounds computed once no matter how many plots it is
+        used in. Plots are rendered by `pargs.jobs` processes.
+    """
+    path_to_key_to_bounds = dict()
+    path_to_keys = dict()
+    for plot in pargs.plots:
+        for path in plot[:2]:
+            path = os.path.realpath(path)
+            if path in path_to_key_to_bounds:
+                continue
+            with open(path, 'r') as f:
+                result_infos = load_result_infos(f, pargs.allow_merge_failures)
+            if result_infos is None:
+                return 1
+            path_to_key_to_bounds[path] = get_key_to_scatter_bounds(
+                result_infos, pargs.max_exec_time)
+            path_to_keys[path] = { ResultInfoUtil.get_result_info_key(ri)
+                                   for ri in result_infos['results'] }
+
+    tasks = []
+    for x_path, y_path, output_path, xlabel, ylabel in pargs.plots:
+        x_path = os.path.realpath(x_path)
+        y_path = os.path.realpath(y_path)
+        points = compute_scatter_points(
+            path_to_key_to_bounds[x_path],
+            path_to_key_to_bounds[y_path],
+            path_to_keys[x_path] | path_to_keys[y_path],
+            pargs.max_exec_time,
+            pargs.require_time_abs_diff)
+        print('{}:'.format(output_path))
+        report_scatter_points(points)
+        print('')
+        tasks.append((pargs, points, xlabel, ylabel, output_path))
+
+    _logger.info('Rendering {} plots using {} jobs'.format(len(tasks), pargs.jobs))
+    if pargs.jobs == 1 or len(tasks) <= 1:
+        for task in tasks:
+            _logger.info('Wrote "{}"'.format(_render_plot_in_worker(task)))
+        return 0
+    with multiprocessing.Pool(processes=min(pargs.jobs, len(tasks))) as pool:
+        for output_path in pool.imap_unordered(_render_plot_in_worker, tasks):
+            _logger.info('Wrote "{}"'.format(output_path))
     return 0
 
 if __name__ == '__main__':
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Read a result info file and annotate every result with all the derived
+fields in a single pass. This does the work of
+
+* result-info-extract-satisfiability-result.py (`sat`)
+* result-info-extract-stat-shim-wallclock.py (`dsoes_wallclock_time`)
+* result-info-annotate-with-event.py (`event_tag`)
+* result-info-annotate-with-fuzzing-throughput.py (JFS runs only)
+
+but only loads, validates and writes the result info file once and visits
+each working directory once.
+
+If `--cache` is used results whose inputs (the raw result info and the
+files the fields are derived from) and analyser code are unchanged since
+the last run are taken from the cache rather than recomputed.
+"""
+from load_smtrunner import add_smtrunner_to_module_search_path
+add_smtrunner_to_module_search_path()
+from smtrunner import ResultInfo, DriverUtil, ResultInfoUtil, event_analysis
+from smtrunner import DerivedFieldCache, solver_output
+import smtrunner.util
+
+import argparse
+import hashlib
+import inspect
+import json
+import logging
+import multiprocessing
+import os
+import pprint
+import sys
+
+_logger = None
+
+# Per process state used by `postprocess_result()`.
+_event_analyser = None
+_options = None
+
+def init_worker(runner, analyser_kwargs, options):
+    global _event_analyser, _options
+    _event_analyser = event_analysis.get_event_analyser_from_runner_name(
+        runner, **analyser_kwargs)
+    _options = options
+
+def add_fuzzing_throughput(new_ri, geti, tag):
+    key = ResultInfoUtil.get_result_info_key(new_ri)
+    wd = ResultInfoUtil.get_result_info_wd(new_ri)
+    num_inputs, num_wrong_sized_inputs, fuzzing_wallclock_time = (
+        _event_analyser.get_fuzzing_throughput_fields(geti))
+    new_ri['libfuzzer_average_exec_per_sec'] = (
+        _event_analyser.get_libfuzzer_stat_average_exec_per_sec(geti))
+    if tag in {'sat', 'unsat', 'sat_but_expected_unsat', 'unsat_but_expected_sat'}:
+        # See result-info-annotate-with-fuzzing-throughput.py
+        if num_inputs is None:
+            _logger.info('num_inputs should not be None for {} ({})'.format(key, wd))
+            num_inputs = 1
+        if num_wrong_sized_inputs is None:
+            _logger.info('num_wrong_sized_inputs should not be None for {} ({})'.format(key, wd))
+            num_wrong_sized_inputs = 1
+        if fuzzing_wallclock_time is None:
+            _logger.info('fuzzing_wallclock_time should not be None for {} ({})'.format(key, wd))
+            fuzzing_wallclock_time = 0
+    new_ri['jfs_stat_num_inputs'] = num_inputs
+    new_ri['jfs_stat_num_wrong_sized_inputs'] = num_wrong_sized_inputs
+    new_ri['jfs_stat_fuzzing_wallclock_time'] = fuzzing_wallclock_time
+
+def postprocess_result(ri):
+    """
+        Returns the tuple (<new_ri>, <num_failures>). `new_ri` has no
+        `event_tag` if the event could not be determined.
+    """
+    num_failures = 0
+    new_ri = ri.copy()
+    new_ri['sat'], failed = solver_output.get_sat(
+        solver_output.join_path(_options['wd_base'], ri['stdout_log_file']))
+    num_failures += int(failed)
+    if _options['dsoes']:
+        new_ri['dsoes_wallclock_time'], failed = solver_output.get_dsoes_wallclock_time(
+            solver_output.join_path(_options['wd_base'], ri['working_directory']))
+        num_failures += int(failed)
+    geti = event_analysis.GETInfo(
+        ri=new_ri,
+        wd_base=_options['wd_base'],
+        benchmark_base=_options['benchmark_base'],
+        backend=_options['backend']
+    )
+    tag = _event_analyser.get_event_tag(geti)
+    if tag is None:
+        return (new_ri, num_failures)
+    new_ri['event_tag'] = tag
+    if isinstance(_event_analyser, event_analysis.JFSRunnerEventAnalyser):
+        add_fuzzing_throughput(new_ri, geti, tag)
+    return (new_ri, num_failures)
+
+def get_fingerprint():
+    """
+        Returns a digest of the code used by `postprocess_result()`.
+    """
+    h = hashlib.sha1()
+    h.update(event_analysis.get_event_analyser_fingerprint(_event_analyser).encode('utf-8'))
+    h.update(inspect.getsource(solver_output).encode('utf-8'))
+    for fn in [add_fuzzing_throughput, postprocess_result]:
+        h.update(inspect.getsource(fn).encode('utf-8'))
+    h.update(repr(sorted(_options.items())).encode('utf-8'))
+    return h.hexdigest()
+
+def get_inputs(ri):
+    """
+        Returns the signature of everything `postprocess_result(ri)`
+        depends on other than code.
+    """
+    geti = event_analysis.GETInfo(
+        ri=ri,
+        wd_base=_options['wd_base'],
+        benchmark_base=_options['benchmark_base'],
+        backend=_options['backend']
+    )
+    paths = _event_analyser.get_input_paths(geti)
+    if _options['dsoes']:
+        paths.append(os.path.join(
+            solver_output.join_path(_options['wd_base'], ri['working_directory']),
+            'exit_stats.json'))
+    return [
+        DerivedFieldCache.get_data_signature(ri),
+        [DerivedFieldCache.get_file_signature(p) for p in paths],
+    ]
+
+def main(args):
+    global _logger
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    DriverUtil.parserAddLoggerArg(parser)
+    parser.add_argument('result_infos',
+                        type=argparse.FileType('r'))
+    parser.add_argument('--benchmark-base',
+        dest="benchmark_base",
+        default="",
+        type=str)
+    parser.add_argument('--wd-base',
+        dest="wd_base",
+        default="",
+        type=str)
+    parser.add_argument('--timeout',
+        type=float,
+        default=None,
+        help='Timeout to assume when creating tags',
+    )
+    parser.add_argument('--use-dsoes-wallclock-time',
+        action='store_true',
+        default=False,
+    )
+    parser.add_argument('--no-dsoes',
+        dest='dsoes',
+        action='store_false',
+        default=True,
+        help='Do not extract dsoes_wallclock_time (e.g. for non Docker runs)',
+    )
+    parser.add_argument('-j', '--jobs',
+        type=int,
+        default=1,
+        help='Number of processes to use (default: %(default)s)',
+    )
+    parser.add_argument('-o', '--output',
+        type=argparse.FileType('w'),
+        default=sys.stdout,
+        help='Output location (default stdout)')
+    parser.add_argument('--cache',
+        default=None,
+        help='Path to derived field cache to use and update',
+    )
+    pargs = parser.parse_args(args)
+    DriverUtil.handleLoggerArgs(pargs, parser)
+    _logger = logging.getLogger(__name__)
+    _logger.info('Using benchmark base of "{}"'.format(pargs.benchmark_base))
+    _logger.info('Using working directory base of "{}"'.format(pargs.wd_base))
+    if pargs.jobs <= 0:
+        _logger.error('jobs must be > 0')
+        return 1
+    if pargs.use_dsoes_wallclock_time and not pargs.dsoes:
+        _logger.error('--use-dsoes-wallclock-time cannot be used with --no-dsoes')
+        return 1
+
+    try:
+        _logger.info('Loading "{}"'.format(pargs.result_infos.name))
+        result_infos = ResultInfo.loadRawResultInfos(pargs.result_infos)
+    except ResultInfo.ResultInfoValidationError as e:
+        _logger.error('Validation error:\n{}'.format(e))
+        return 1
+    _logger.info('Loading done')
+
+    runner = result_infos['misc']['runner']
+    _logger.info('Found runner "{}"'.format(runner))
+    backend = None
+    if 'backend' in result_infos['misc']:
+        backend = result_infos['misc']['backend']
+    _logger.info('Backend was "{}"'.format(backend))
+
+    analyser_kwargs = {
+        'soft_timeout': pargs.timeout,
+        'use_dsoes_wallclock_time': pargs.use_dsoes_wallclock_time,
+    }
+    options = {
+        'wd_base': pargs.wd_base,
+        'benchmark_base': pargs.benchmark_base,
+        'backend': backend,
+        'dsoes': pargs.dsoes,
+    }
+    results = result_infos['results']
+    init_worker(runner, analyser_kwargs, options)
+
+    # Take what we can from the cache
+    new_results = [None] * len(results)
+    fail_count = 0
+    cache = None
+    to_process = list(range(0, len(results)))
+    if pargs.cache is not None:
+        cache = DerivedFieldCache.DerivedFieldCache(
+            pargs.cache, 'result-info-postprocess')
+        fingerprint = get_fingerprint()
+        result_inputs = [ get_inputs(ri) for ri in results ]
+        to_process = []
+        for index, ri in enumerate(results):
+            key = ResultInfoUtil.get_result_info_key(ri)
+            cached = cache.lookup(key, fingerprint, result_inputs[index])
+            if cached is None:
+                to_process.append(index)
+                continue
+            new_ri = ri.copy()
+            new_ri.update(cached['fields'])
+            new_results[index] = new_ri
+            fail_count += cached['num_failures']
+        _logger.info('Using {} cached results, {} to compute'.format(
+            cache.hits, len(to_process)))
+
+    if pargs.jobs == 1 or len(to_process) <= 1:
+        processed = map(postprocess_result, [results[i] for i in to_process])
+        pool = None
+    else:
+        _logger.info('Post processing using {} jobs'.format(pargs.jobs))
+        pool = multiprocessing.Pool(
+            processes=pargs.jobs,
+            initializer=init_worker,
+            initargs=(runner, analyser_kwargs, options))
+        chunk_size = max(1, len(to_process) // (pargs.jobs * 8))
+        processed = pool.imap(
+            postprocess_result, [results[i] for i in to_process], chunk_size)
+
+    try:
+        for index, (new_ri, num_failures) in zip(to_process, processed):
+            fail_count += num_failures
+            if 'event_tag' not in new_ri:
+                key = ResultInfoUtil.get_result_info_key(new_ri)
+                _logger.error('Unhandled event for "{}"'.format(key))
+                _logger.error(pprint.pformat(new_ri))
+                return 1
+            new_results[index] = new_ri
+            if cache is not None:
+                ri = results[index]
+                derived_fields = {
+                    k: v for k, v in new_ri.items() if k not in ri or ri[k] != v
+                }
+                cache.store(
+                    ResultInfoUtil.get_result_info_key(ri),
+                    fingerprint,
+                    result_inputs[index],
+                    { 'fields': derived_fields, 'num_failures': num_failures })
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        if cache is not None:
+            cache.save()
+
+    if fail_count > 0:
+        _logger.warning('Failed to parse "{}" files'.format(fail_count))
+
+    new_result_infos = result_infos
+    new_result_infos['results'] = new_results
+
+    # Validate against schema
+    try:
+        _logger.info('Validating result_infos')
+        validation_digest = ResultInfo.validateResultInfos(new_result_infos, returnDigest=True)
+    except ResultInfo.ResultInfoValidationError as e:
+        _logger.error('Validation error:\n{}'.format(e))
+        return 1
+    _logger.info('Validation complete')
+
+    smtrunner.util.writeYaml(
+        pargs.output,
+        ResultInfo.withValidationDigest(new_result_infos, validation_digest))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
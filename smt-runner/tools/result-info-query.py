@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Query a SQLite result index created by `result-info-index.py`.
+
+Either run a SQL query and print the rows as CSV, e.g.
+
+  result-info-query.py index.db --sql "SELECT DISTINCT benchmark
+    FROM sat_disagreements WHERE benchmark_set = 'smtlib_qf_fp_600'
+    AND solver_a = 'cvc5' AND solver_b = 'bitwuzla'"
+
+or export the results of a solver on a benchmark set as a result info
+file, optionally only keeping results with a run that matches a SQL
+expression over the columns of the `runs` table, e.g.
+
+  result-info-query.py index.db --export cvc5 smtlib_qf_fp_600
+    --where "event_tag = 'timeout'" -o cvc5_timeouts.yml
+
+`--export` can be repeated to export the results of several solvers or
+benchmark sets into one file (in the order given). The top level data
+(e.g. `misc`) is taken from the first of them.
+"""
+from load_smtrunner import add_smtrunner_to_module_search_path
+add_smtrunner_to_module_search_path()
+from smtrunner import ResultInfo, DriverUtil, ResultIndex
+import smtrunner.util
+
+import argparse
+import csv
+import itertools
+import logging
+import os
+import sqlite3
+import sys
+
+_logger = None
+
+def get_export_header(index, exports):
+    """
+    Returns the top level data of the result info file that exports the
+    results of the list of (<solver>, <benchmark_set>) tuples `exports`.
+    """
+    headers = [ index.get_result_infos_header(solver, benchmark_set)
+                for solver, benchmark_set in exports ]
+    header = headers[0]
+    for (solver, benchmark_set), other in zip(exports[1:], headers[1:]):
+        if other.get('schema_version', None) != header.get('schema_version', None):
+            raise ResultIndex.ResultIndexError(
+                'Schema version of {}/{} does not match {}/{}'.format(
+                    benchmark_set, solver, exports[0][1], exports[0][0]))
+    return header
+
+def main(args):
+    global _logger
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    DriverUtil.parserAddLoggerArg(parser)
+    parser.add_argument('index',
+                        help='Path to SQLite database')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--sql',
+                       default=None,
+                       help='SQL query to run')
+    group.add_argument('--export',
+                       nargs=2,
+                       metavar=('SOLVER', 'BENCHMARK_SET'),
+                       action='append',
+                       default=None,
+                       help='Export results as a result info file. Can be repeated')
+    group.add_argument('--list-files',
+                       dest='list_files',
+                       default=False,
+                       action='store_true',
+                       help='List the indexed files')
+    parser.add_argument('--where',
+                        default=None,
+                        help='SQL expression over `runs` used to select exported results')
+    parser.add_argument('--no-header',
+                        dest='no_header',
+                        default=False,
+                        action='store_true',
+                        help='Do not print column names for --sql')
+    parser.add_argument('-o', '--output',
+                        type=argparse.FileType('w'),
+                        default=sys.stdout,
+                        help='Output location (default stdout)')
+    pargs = parser.parse_args(args)
+    DriverUtil.handleLoggerArgs(pargs, parser)
+    _logger = logging.getLogger(__name__)
+
+    if not os.path.exists(pargs.index):
+        _logger.error('"{}" does not exist'.format(pargs.index))
+        return 1
+    if pargs.where is not None and pargs.export is None:
+        _logger.error('--where can only be used with --export')
+        return 1
+    try:
+        index = ResultIndex.ResultIndex(pargs.index)
+    except ResultIndex.ResultIndexError as e:
+        _logger.error(e)
+        return 1
+
+    try:
+        if pargs.list_files:
+            writer = csv.writer(pargs.output)
+            if not pargs.no_header:
+                writer.writerow(['path', 'solver', 'benchmark_set'])
+            writer.writerows(index.get_files())
+        elif pargs.sql is not None:
+            cursor = index.query(pargs.sql)
+            writer = csv.writer(pargs.output)
+            if not pargs.no_header and cursor.description is not None:
+                writer.writerow([d[0] for d in cursor.description])
+            writer.writerows(cursor)
+        else:
+            exports = []
+            for solver, benchmark_set in pargs.export:
+                if (solver, benchmark_set) in exports:
+                    _logger.error('{}/{} is exported more than once'.format(
+                        benchmark_set, solver))
+                    return 1
+                exports.append((solver, benchmark_set))
+            header = get_export_header(index, exports)
+            ResultInfo.getCompiledSchema().validateHeader(
+                dict(header, results=[]))
+            num_results = smtrunner.util.writeYamlStream(
+                pargs.output,
+                header,
+                itertools.chain.from_iterable(
+                    index.iter_results(solver, benchmark_set, pargs.where)
+                    for solver, benchmark_set in exports),
+                ResultInfo.validateResultInfoRecord)
+            _logger.info('Exported {} results'.format(num_results))
+    except sqlite3.Error as e:
+        _logger.error('SQL error: {}'.format(e))
+        return 1
+    except (ResultIndex.ResultIndexError,
+            ResultInfo.ResultInfoValidationError) as e:
+        _logger.error(e)
+        return 1
+    finally:
+        index.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
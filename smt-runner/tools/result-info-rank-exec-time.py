@@ -107,58 +107,31 @@ def main(args):
                 return 1
 
 
-    failed_to_rank=set()
-    for key, raw_result_info_list in sorted(key_to_results_infos.items(), key=lambda kv:kv[0]):
-        _logger.info('Ranking on "{}" : '.format(key))
-        indices_to_use = []
-        # Compute indices to use
-        modified_raw_result_info_list = [ ]
-
-        # Handle "unknown"
-        # Only compare results that gave sat/unsat
-        for index, ri in enumerate(raw_result_info_list):
-            sat, _ = analysis.get_sat_from_result_info(ri)
-            _logger.info('index {} {}'.format(index, sat))
-            if sat != 'unknown':
-                indices_to_use.append(index)
-                modified_raw_result_info_list.append(ri)
-            else:
-                if pargs.no_rank_unknown:
-                    # Legacy
-                    modified_raw_result_info_list.append(ri)
-                    _logger.debug('Not using index {} for {} due to unknown'.format(
-                        index,
-                        key))
-                else:
-                    modified_ri = analysis.get_result_with_modified_time(
-                        ri,
-                        pargs.max_exec_time)
-                    _logger.debug('modified_ri: {}'.format(pprint.pformat(modified_ri)))
-                    _logger.debug('Treating index {} for {} due to unknown as having max-time'.format(
-                        index,
-                        key))
-                    indices_to_use.append(index)
-                    modified_raw_result_info_list.append(modified_ri)
-        _logger.debug('used indices_to_use: {}'.format(indices_to_use))
+    # Rank all benchmarks at once
+    keys = sorted(key_to_results_infos.keys())
+    rankings = analysis.rank_result_info_groups_by_execution_time(
+        [ key_to_results_infos[key] for key in keys ],
+        pargs.max_exec_time,
+        analysis.CONFIDENCE_INTERVAL_FACTOR_99,
+        ['dsoes_wallclock', 'wallclock'],
+        rank_unknown=not pargs.no_rank_unknown)
 
-        if len(indices_to_use) == 0:
+    failed_to_rank=set()
+    for key, ranking in zip(keys, rankings):
+        if ranking is None:
             # Can't rank
             failed_to_rank.add(key)
             continue
 
-        ranked_indices, ordered_bounds = analysis.rank_by_execution_time(
-            modified_raw_result_info_list,
-            indices_to_use,
-            pargs.max_exec_time,
-            analysis.get_arithmetic_mean_and_99_confidence_intervals,
-            ['dsoes_wallclock', 'wallclock'])
-        _logger.info('Ranking on "{}" : {}'.format(key, ranked_indices))
-        _logger.info('Ranking on "{}" : {}'.format(key, ordered_bounds))
+        ranked_indices, ordered_bounds = ranking
+        if _logger.isEnabledFor(logging.DEBUG):
+            _logger.debug('Ranking on "{}" : {}'.format(key, ranked_indices))
+            _logger.debug('Ranking on "{}" : {}'.format(key, ordered_bounds))
         # Record win
         if len(ranked_indices[0]) == 1:
             # Winner
             winner_index = ranked_indices[0][0]
-            _logger.info('Recorded win for {}'.format(
+            _logger.debug('Recorded win for {}'.format(
                 index_to_file_name[winner_index]))
             index_to_wins[winner_index].add(key)
         else:
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# vim: set sw=4 ts=4 softtabstop=4 expandtab:
+"""
+Simulate static solver schedules on a fixed number of cores using the
+results of each solver (one result info file per solver) and search for
+good schedules.
+
+Each `--schedule` gives the steps of one core as a comma separated list
+of `<solver>:<time slice>` (the time slice of the last step can be
+omitted to use the rest of the time limit). For example
+
+  --schedule optsat:10,bitwuzla --schedule cvc5
+
+runs optsat for 10 seconds followed by bitwuzla on one core and cvc5 on
+another core.
+
+`--search-sequential` searches for a good single core schedule and
+`--search-parallel <k>` for the best schedule that runs one solver on
+each of `k` cores.
+"""
+from load_smtrunner import add_smtrunner_to_module_search_path
+add_smtrunner_to_module_search_path()
+from smtrunner import ResultInfo, DriverUtil, ResultTable, ResultInfoUtil, portfolio
+
+import argparse
+import logging
+import sys
+import time
+
+_logger = None
+
+class ScheduleSpecError(Exception):
+    pass
+
+def parse_schedule_core(spec, name_to_index, time_limit):
+    core = []
+    used_time = 0.0
+    steps = spec.split(',')
+    for index, step in enumerate(steps):
+        if ':' in step:
+            name, time_slice = step.rsplit(':', 1)
+            try:
+                time_slice = float(time_slice)
+            except ValueError:
+                raise ScheduleSpecError('Invalid time slice in "{}"'.format(step))
+        elif index + 1 == len(steps):
+            name, time_slice = step, time_limit - used_time
+        else:
+            raise ScheduleSpecError('Missing time slice in "{}"'.format(step))
+        if name not in name_to_index:
+            raise ScheduleSpecError('Unknown solver "{}"'.format(name))
+        if time_slice <= 0.0:
+            raise ScheduleSpecError('Time slice must be > 0 in "{}"'.format(step))
+        core.append((name_to_index[name], time_slice))
+        used_time += time_slice
+    if used_time > time_limit:
+        _logger.warning('Core "{}" exceeds the time limit'.format(spec))
+    return core
+
+def describe_schedule(schedule, names):
+    return ' | '.join(
+        ', '.join('{}:{:g}'.format(names[solver], t) for solver, t in core)
+        for core in schedule)
+
+def print_schedule(title, problem, schedule, time_limit):
+    num_solved, par2 = portfolio.evaluate_schedule(problem, schedule, time_limit)
+    print('{}: {} cores [{}] solved {} PAR-2 {:.2f}'.format(
+        title,
+        len(schedule),
+        describe_schedule(schedule, problem.names),
+        num_solved,
+        par2))
+
+def main(args):
+    global _logger
+    parser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    DriverUtil.parserAddLoggerArg(parser)
+    parser.add_argument('result_infos',
+                        type=argparse.FileType('r'),
+                        nargs='+')
+    parser.add_argument('--names',
+                        nargs='+',
+                        help='Solver names (default: name of the directory of each file)')
+    parser.add_argument('--time-limit',
+                        dest='time_limit',
+                        type=float,
+                        required=True,
+                        help='Wallclock time limit of a schedule')
+    parser.add_argument('--schedule',
+                        action='append',
+                        default=[],
+                        help='Steps run on one core (can be repeated)')
+    parser.add_argument('--search-sequential',
+                        dest='search_sequential',
+                        default=False,
+                        action='store_true',
+                        help='Search for a good single core schedule')
+    parser.add_argument('--search-parallel',
+                        dest='search_parallel',
+                        type=int,
+                        default=None,
+                        metavar='CORES',
+                        help='Search for the best schedule with one solver per core')
+    parser.add_argument('--max-steps',
+                        dest='max_steps',
+                        type=int,
+                        default=4,
+                        help='Maximum number of steps for --search-sequential')
+    parser.add_argument('--time-slices',
+                        dest='time_slices',
+                        type=float,
+                        nargs='+',
+                        default=[ 1.0/32, 1.0/16, 1.0/8, 1.0/4, 1.0/2 ],
+                        help='Time slices (as fractions of the time limit) '
+                             'considered by --search-sequential')
+    parser.add_argument('--max-nodes',
+                        dest='max_nodes',
+                        type=int,
+                        default=1000000,
+                        help='Maximum number of nodes visited by --search-parallel')
+    pargs = parser.parse_args(args)
+    DriverUtil.handleLoggerArgs(pargs, parser)
+    _logger = logging.getLogger(__name__)
+
+    if pargs.time_limit <= 0.0:
+        _logger.error('Time limit must be > 0')
+        return 1
+    if pargs.names is None:
+        names = [ ResultInfoUtil.get_default_names(f.name)[0] for f in pargs.result_infos ]
+    else:
+        names = pargs.names
+    if len(names) != len(pargs.result_infos):
+        _logger.error('Number of names must match number of result info files')
+        return 1
+    if len(set(names)) != len(names):
+        _logger.error('Solver names must be unique')
+        return 1
+    if (len(pargs.schedule) == 0 and not pargs.search_sequential and
+            pargs.search_parallel is None):
+        _logger.error('Nothing to do. Give --schedule, --search-sequential '
+                      'or --search-parallel')
+        return 1
+    name_to_index = { name: index for index, name in enumerate(names) }
+    schedule = None
+    try:
+        if len(pargs.schedule) > 0:
+            schedule = [ parse_schedule_core(spec, name_to_index, pargs.time_limit)
+                         for spec in pargs.schedule ]
+    except ScheduleSpecError as e:
+        _logger.error(e)
+        return 1
+
+    tables = []
+    for result_infos_file in pargs.result_infos:
+        try:
+            _logger.info('Loading "{}"'.format(result_infos_file.name))
+            tables.append(ResultTable.load(result_infos_file))
+        except ResultInfo.ResultInfoValidationError as e:
+            _logger.error('Validation error:\n{}'.format(e))
+            return 1
+        except ResultTable.ResultTableError as e:
+            _logger.error('Failed to load "{}": {}'.format(result_infos_file.name, e))
+            return 1
+        _logger.info('Loading done')
+    problem = portfolio.PortfolioProblem.from_tables(
+        names, tables, pargs.time_limit)
+    tables = None
+    print('# benchmarks: {}'.format(len(problem.benchmarks)))
+
+    if schedule is not None:
+        print_schedule('Schedule', problem, schedule, pargs.time_limit)
+
+    if pargs.search_sequential:
+        start_time = time.perf_counter()
+        time_slices = [ f * pargs.time_limit for f in pargs.time_slices ]
+        greedy = portfolio.greedy_sequential_schedule(
+            problem, pargs.time_limit, time_slices, pargs.max_steps)
+        print_schedule('Greedy sequential schedule', problem, greedy, pargs.time_limit)
+        improved = portfolio.improve_sequential_schedule(
+            problem, pargs.time_limit, greedy, time_slices, pargs.max_steps)
+        print_schedule('Improved sequential schedule', problem, improved,
+                       pargs.time_limit)
+        _logger.info('Sequential search took {:.2f}s'.format(
+            time.perf_counter() - start_time))
+
+    if pargs.search_parallel is not None:
+        if pargs.search_parallel < 1:
+            _logger.error('Number of cores must be >= 1')
+            return 1
+        parallel, result = portfolio.best_parallel_schedule(
+            problem, pargs.search_parallel, pargs.time_limit, pargs.max_nodes)
+        print_schedule('Best parallel schedule', problem, parallel, pargs.time_limit)
+        if not result.optimal:
+            _logger.warning('Node limit reached, schedule might not be optimal')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))